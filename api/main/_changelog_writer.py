@@ -0,0 +1,81 @@
+# This file is outside the `api/main/rest/` folder to avoid the imports in that module's __init__.py
+import datetime
+import json
+import logging
+import os
+
+try:
+    import django
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tator_online.settings")
+    django.setup()
+except Exception:
+    pass
+
+from django.db import transaction
+from redis.exceptions import LockNotOwnedError
+
+from main.cache import TatorCache
+from main.models import ChangeLog, ChangeToObject
+from main.rest._util import bulk_copy_create
+
+logger = logging.getLogger(__name__)
+
+CHANGELOG_BATCH_SIZE = int(os.getenv("TATOR_CHANGELOG_BATCH_SIZE", 10000))
+CHANGELOG_LOCK_TIMEOUT = 600
+
+
+def _write_batch(entries):
+    changelogs = (
+        ChangeLog(
+            project_id=entry["project"],
+            user_id=entry["user"],
+            modified_datetime=datetime.datetime.fromtimestamp(entry["time"], datetime.timezone.utc),
+            description_of_change=entry["description"],
+        )
+        for entry in entries
+    )
+    with transaction.atomic():
+        changelogs = bulk_copy_create(changelogs, ChangeLog)
+        objs = (
+            ChangeToObject(ref_table_id=entry["ref_table"], ref_id=ref_id, change_id=changelog)
+            for entry, changelog in zip(entries, changelogs)
+            for ref_id in entry["ref_ids"]
+        )
+        bulk_copy_create(objs, ChangeToObject)
+
+
+def write_changelogs(blocking=False):
+    """
+    Writes changelogs queued in the outbox with COPY, in batches of `TATOR_CHANGELOG_BATCH_SIZE`.
+    Entries are removed from the outbox only after their batch is committed. The lock timeout is
+    restarted before each batch so it cannot expire mid-drain and let a second writer copy the
+    same entries. If `blocking` is False and another process is already writing, returns
+    immediately since that process will drain the outbox. Returns the number of changelogs
+    written.
+    """
+    cache = TatorCache()
+    written = 0
+    while True:
+        lock = cache.changelog_lock(CHANGELOG_LOCK_TIMEOUT)
+        if not lock.acquire(blocking=blocking):
+            return written
+        try:
+            while True:
+                lock.reacquire()
+                raw_entries = cache.peek_changelogs(CHANGELOG_BATCH_SIZE)
+                if not raw_entries:
+                    break
+                _write_batch([json.loads(raw_entry) for raw_entry in raw_entries])
+                cache.trim_changelogs(len(raw_entries))
+                written += len(raw_entries)
+        except LockNotOwnedError:
+            logger.warning("Changelog lock expired, leaving the outbox to the next writer.")
+            return written
+        finally:
+            if lock.owned():
+                lock.release()
+        # Entries pushed while the lock was being released would otherwise wait for the next job.
+        if cache.get_changelog_backlog()[0] == 0:
+            logger.info(f"Wrote {written} changelogs from the outbox.")
+            return written
@@ -18,12 +18,22 @@ from django.contrib.postgres.expressions import ArraySubquery
 from django.db.models.functions import Coalesce, Cast
 from django.db.models import JSONField, Lookup, IntegerField, Case, When
 from main.models import *
+from main.cache import TatorCache
 
+from collections import OrderedDict
 import logging
+import os
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
 CHILD_SHIFT = 8
+PERMISSION_CACHE_TTL = int(os.getenv("TATOR_PERMISSION_CACHE_TTL", 300))
+PERMISSION_CACHE_SIZE = int(os.getenv("TATOR_PERMISSION_CACHE_SIZE", 4096))
+# Read permissions from the trigger maintained EffectivePermission table. Only enable once the
+# table has been populated with `manage.py rebuildpermissions`.
+MATERIALIZED_PERMISSIONS = os.getenv("TATOR_MATERIALIZED_PERMISSIONS", "false").lower() == "true"
 
 
 class ColBitAnd(Func):
@@ -136,10 +146,176 @@ def shift_permission(model, source_model):
         assert False, f"Unhandled model {model}"
 
 
+class _PermissionMaskCache:
+    """Per process LRU cache of effective permission masks. Entries are tagged with the
+    permission generation they were computed for, so bumping the generation in redis
+    invalidates them in every process."""
+
+    def __init__(self, max_entries):
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key, generation):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry_generation, expires, masks = entry
+            if entry_generation != generation or expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return masks
+
+    def set(self, key, generation, masks):
+        with self._lock:
+            self._entries[key] = (generation, time.monotonic() + PERMISSION_CACHE_TTL, masks)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_permission_mask_cache = _PermissionMaskCache(PERMISSION_CACHE_SIZE)
+
+
+def _subject_filter(user):
+    """Matches row protections that apply to a user directly, through a group or through an
+    organization affiliation."""
+    return (
+        Q(user=user)
+        | Q(group__in=user.groupmembership_set.values("group"))
+        | Q(organization__in=user.affiliation_set.values("organization"))
+    )
+
+
+def compute_effective_permissions(user):
+    """Returns a dict mapping (scope, target) to the OR of the row protections that apply to a
+    user, for every scope materialized in `EffectivePermission`."""
+    fields = {
+        "project": "project",
+        "section": "section",
+        "version": "version",
+        "organization": "target_organization",
+        "group": "target_group",
+    }
+    rows = RowProtection.objects.filter(_subject_filter(user)).values_list(
+        *fields.values(), "permission"
+    )
+    permissions = {}
+    for row in rows:
+        for scope, target in zip(fields.keys(), row[:-1]):
+            if target is not None:
+                permissions[(scope, target)] = permissions.get((scope, target), 0) | row[-1]
+    return permissions
+
+
+def get_scope_permissions(user, scope, targets):
+    """Returns a dict mapping target ids of the given scope to the OR of the row protections
+    that apply to a user.
+
+    :param scope: One of `project`, `organization` or `group`.
+    :param targets: Queryset or list of target ids.
+    """
+    if MATERIALIZED_PERMISSIONS:
+        rows = EffectivePermission.objects.filter(user=user, scope=scope, target__in=targets)
+        return dict(rows.values_list("target", "permission"))
+    field = {"project": "project", "organization": "target_organization", "group": "target_group"}[
+        scope
+    ]
+    rows = (
+        RowProtection.objects.filter(**{f"{field}__in": targets})
+        .filter(_subject_filter(user))
+        .values(field)
+        .annotate(calc_perm=BitOr("permission"))
+        .values_list(field, "calc_perm")
+    )
+    return dict(rows)
+
+
+def _compute_project_permissions(user, project_id):
+    masks = {"project": 0, "sections": {}, "versions": {}}
+    if MATERIALIZED_PERMISSIONS:
+        rows = EffectivePermission.objects.filter(user=user, project=project_id).values_list(
+            "scope", "target", "permission"
+        )
+        for scope, target, permission in rows:
+            if scope == "project":
+                masks["project"] = permission
+            elif scope in ["section", "version"]:
+                masks[f"{scope}s"][target] = permission
+        return masks
+    rows = (
+        RowProtection.objects.filter(
+            Q(project=project_id) | Q(section__project=project_id) | Q(version__project=project_id)
+        )
+        .filter(_subject_filter(user))
+        .values_list("project", "section", "version", "permission")
+    )
+    for project, section, version, permission in rows:
+        if project is not None:
+            masks["project"] |= permission
+        elif section is not None:
+            masks["sections"][section] = masks["sections"].get(section, 0) | permission
+        elif version is not None:
+            masks["versions"][version] = masks["versions"].get(version, 0) | permission
+    return masks
+
+
+def get_project_permissions(user, project_id):
+    """Returns the effective permission masks of a user within a project as a dict with keys
+    `project` (the OR of all project level row protections), `sections` and `versions` (dicts
+    mapping ids to the OR of their row protections).
+
+    Results are cached in process and in redis until row protections, group memberships or
+    affiliations change.
+    """
+    tator_cache = TatorCache()
+    generation = tator_cache.get_permission_generation()
+    key = (user.pk, project_id)
+    masks = _permission_mask_cache.get(key, generation)
+    if masks is not None:
+        return masks
+    masks = tator_cache.get_permission_masks(generation, user.pk, project_id)
+    if masks is not None:
+        # JSON object keys are strings.
+        masks["sections"] = {int(k): v for k, v in masks["sections"].items()}
+        masks["versions"] = {int(k): v for k, v in masks["versions"].items()}
+    else:
+        masks = _compute_project_permissions(user, project_id)
+        tator_cache.set_permission_masks(
+            generation, user.pk, project_id, masks, PERMISSION_CACHE_TTL
+        )
+    _permission_mask_cache.set(key, generation, masks)
+    return masks
+
+
 def augment_permission(user, qs):
     # Add effective_permission to the queryset
-    if qs.exists():
-        model = qs.model
+    model = qs.model
+    project_scoped = model not in [
+        Project,
+        Organization,
+        Group,
+        JobCluster,
+        Bucket,
+        HostedTemplate,
+        Affiliation,
+        Invitation,
+        Announcement,
+    ]
+    if project_scoped:
+        # This assumes all checks are scoped to the same project (expensive to check in runtime)
+        # Fetching the project of the first row also tells us whether the queryset is empty.
+        project = next(iter(qs.values_list("project", flat=True)[:1]), None)
+        exists = project is not None
+    else:
+        exists = qs.exists()
+    if exists:
         # handle shift due to underlying model
         # children are shifted by 8 bits, grandchildren by 16, etc.
         bit_shift = shift_permission(model, Project)
@@ -148,32 +324,11 @@ def augment_permission(user, qs):
         organizations = user.affiliation_set.all().values("organization")
 
         # Exclude projects + organizational level objects
-        if not model in [
-            Project,
-            Organization,
-            Group,
-            JobCluster,
-            Bucket,
-            HostedTemplate,
-            Affiliation,
-            Invitation,
-        ]:
-            # This assumes all checks are scoped to the same project (expensive to check in runtime)
-            project = qs[0].project
-
-            # Filter for all relevant permissions the user has and OR them together
-            # If someone is in a group with a permission, you can't remove it via a user-level
-            # permission
-            project_permission_query = RowProtection.objects.filter(project=project).filter(
-                Q(user=user) | Q(group__in=groups) | Q(organization__in=organizations)
-            )
-            if project_permission_query.exists():
-                project_permission_query = project_permission_query.aggregate(
-                    computed_permission=BitOr("permission")
-                )
-                project_permission = project_permission_query["computed_permission"]
-            else:
-                project_permission = 0
+        if project_scoped:
+            # All relevant permissions the user has OR'd together. If someone is in a group with
+            # a permission, you can't remove it via a user-level permission
+            project_masks = get_project_permissions(user, project)
+            project_permission = project_masks["project"]
 
             qs = qs.alias(
                 project_permission=Value(project_permission >> bit_shift),
@@ -181,18 +336,9 @@ def augment_permission(user, qs):
         elif model in [Group, JobCluster, Bucket, HostedTemplate, Affiliation, Invitation]:
             # This calculates the default permission for an object based on what organization it is in
             org_qs = qs.values("organization")
-            org_rp = RowProtection.objects.filter(target_organization__in=org_qs).filter(
-                Q(user=user) | Q(group__in=groups) | Q(organization__in=organizations)
-            )
-            org_rp = org_rp.annotate(
-                calc_perm=Window(
-                    expression=BitOr(F("permission")), partition_by=[F("target_organization")]
-                )
-            )
             org_perm_dict = {
-                entry["target_organization"]: entry["calc_perm"]
-                >> shift_permission(model, Organization)
-                for entry in org_rp.values("target_organization", "calc_perm")
+                target_org: perm >> shift_permission(model, Organization)
+                for target_org, perm in get_scope_permissions(user, "organization", org_qs).items()
             }
             org_cases = [
                 When(organization=target_org, then=Value(perm))
@@ -201,13 +347,16 @@ def augment_permission(user, qs):
             qs = qs.annotate(
                 org_permission=Case(*org_cases, default=Value(0), output_field=BigIntegerField())
             )
-        elif model in [Project, Organization]:
+        elif model in [Project, Organization, Announcement]:
             pass  # Project/ Organization permissions are handled below (for self)
         else:
             # This will make for clearer error messages if we don't have a model handled correctly (unlikely)
             assert False, f"Unhandled model {model} (no permission logic for org/project)"
     else:
-        # If an object doesn't exist, we can't annotate it
+        # If an object doesn't exist, we can't annotate it. Sliced querysets are replaced by an
+        # unsliced empty one so callers can still filter on the permission.
+        if qs.query.is_sliced:
+            qs = model.objects.none()
         return qs.annotate(effective_permission=Value(0))
 
     if qs.query.low_mark != 0 or qs.query.high_mark is not None:
@@ -277,18 +426,7 @@ def augment_permission(user, qs):
         qs = qs.annotate(effective_permission=F("org_permission"))
     elif model in [Project]:
         # These models are only protected by project-level permissions
-        raw_rp = RowProtection.objects.filter(project__in=qs.values("pk"))
-        project_rp = raw_rp.filter(
-            Q(user=user) | Q(group__in=groups) | Q(organization__in=organizations)
-        )
-        project_rp = project_rp.annotate(
-            calc_perm=Window(expression=BitOr(F("permission")), partition_by=[F("project")])
-        )
-        project_perm_dict = {
-            entry["project"]: entry["calc_perm"]
-            for entry in project_rp.values("project", "calc_perm")
-        }
-
+        project_perm_dict = get_scope_permissions(user, "project", qs.values("pk"))
         project_cases = [
             When(pk=project, then=Value(perm)) for project, perm in project_perm_dict.items()
         ]
@@ -300,19 +438,7 @@ def augment_permission(user, qs):
             ),
         )
     elif model in [Organization]:
-        raw_rp = RowProtection.objects.filter(target_organization__in=qs.values("pk"))
-        org_rp = raw_rp.filter(
-            Q(user=user) | Q(group__in=groups) | Q(organization__in=organizations)
-        )
-        org_rp = org_rp.annotate(
-            calc_perm=Window(
-                expression=BitOr(F("permission")), partition_by=[F("target_organization")]
-            )
-        )
-        org_perm_dict = {
-            entry["target_organization"]: entry["calc_perm"]
-            for entry in org_rp.values("target_organization", "calc_perm")
-        }
+        org_perm_dict = get_scope_permissions(user, "organization", qs.values("pk"))
         org_cases = [
             When(pk=target_org, then=Value(perm)) for target_org, perm in org_perm_dict.items()
         ]
@@ -447,17 +573,7 @@ def augment_permission(user, qs):
         # Make the appropriate subquery for individual protection, then coalesce with
         # project-level permissions
 
-        # First get all sections including parents (this includes self)
-        section_rp = RowProtection.objects.filter(section__pk__in=qs.values("pk")).filter(
-            Q(user=user) | Q(group__in=groups) | Q(organization__in=organizations)
-        )
-        section_rp = section_rp.annotate(
-            calc_perm=Window(expression=BitOr(F("permission")), partition_by=[F("section")])
-        )
-        section_perm_dict = {
-            entry["section"]: entry["calc_perm"]
-            for entry in section_rp.values("section", "calc_perm")
-        }
+        section_perm_dict = project_masks["sections"]
         section_cases = [
             When(pk=section, then=Value(perm)) for section, perm in section_perm_dict.items()
         ]
@@ -471,17 +587,8 @@ def augment_permission(user, qs):
     elif model in [Media]:
         # For these models, we can use the section+project to determine permissions
         #
-        effected_sections = qs.values("primary_section__pk")
-
-        section_rp = RowProtection.objects.filter(section__in=effected_sections).filter(
-            Q(user=user) | Q(group__in=groups) | Q(organization__in=organizations)
-        )
-        section_rp = section_rp.annotate(
-            calc_perm=Window(expression=BitOr(F("permission")), partition_by=[F("section")])
-        )
         section_perm_dict = {
-            entry["section"]: (entry["calc_perm"] >> CHILD_SHIFT)
-            for entry in section_rp.values("section", "calc_perm")
+            section: perm >> CHILD_SHIFT for section, perm in project_masks["sections"].items()
         }
         section_cases = [
             When(primary_section=section, then=Value(perm))
@@ -506,35 +613,13 @@ def augment_permission(user, qs):
             )
             qs = qs.annotate(section=sb)
 
-        # Calculate a dictionary for permissions by section and version in this set
-        effected_media = qs.values("media__pk")
-        effected_sections = (
-            Section.objects.filter(project=project, media__in=effected_media)
-            .values("pk")
-            .distinct()
-        )
-        effected_versions = qs.values("version__pk")
-
-        section_rp = RowProtection.objects.filter(section__in=effected_sections).filter(
-            Q(user=user) | Q(group__in=groups) | Q(organization__in=organizations)
-        )
-        section_rp = section_rp.annotate(
-            calc_perm=Window(expression=BitOr(F("permission")), partition_by=[F("section")])
-        )
-        version_rp = RowProtection.objects.filter(version__in=effected_versions).filter(
-            Q(user=user) | Q(group__in=groups) | Q(organization__in=organizations)
-        )
-        version_rp = version_rp.annotate(
-            calc_perm=Window(expression=BitOr(F("permission")), partition_by=[F("version")])
-        )
-
+        # Permissions by section and version in this project
         section_perm_dict = {
-            entry["section"]: (entry["calc_perm"] >> (CHILD_SHIFT * 2))
-            for entry in section_rp.values("section", "calc_perm")
+            section: perm >> (CHILD_SHIFT * 2)
+            for section, perm in project_masks["sections"].items()
         }
         version_perm_dict = {
-            entry["version"]: (entry["calc_perm"] >> CHILD_SHIFT)
-            for entry in version_rp.values("version", "calc_perm")
+            version: perm >> CHILD_SHIFT for version, perm in project_masks["versions"].items()
         }
 
         section_cases = [
@@ -9,6 +9,7 @@ from redis.exceptions import (
 import json
 import os
 import logging
+import time
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.backends import default_backend
 
@@ -19,6 +20,12 @@ REDIS_USE_SSL = os.getenv("REDIS_USE_SSL", "FALSE").lower() == "true"
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", None)
+PERMISSION_GENERATION_KEY = "permission_generation"
+CRED_CACHE_TTL = int(os.getenv("TATOR_CRED_CACHE_TTL", 600))
+CHANGELOG_OUTBOX_KEY = "changelog_outbox"
+CHANGELOG_LOCK_KEY = "changelog_outbox_lock"
+ATTRIBUTE_USAGE_KEY = "attribute_usage"
+ATTRIBUTE_USAGE_SAMPLE_RATE = float(os.getenv("TATOR_ATTRIBUTE_USAGE_SAMPLE_RATE", 0.01))
 
 
 class TatorCache:
@@ -38,21 +45,29 @@ class TatorCache:
         )
 
     def get_cred_cache(self, user_id, project_id):
+        """Returns the cached project access decision for a user, or None if not cached."""
         group = f"creds_{project_id}"
         key = f"creds_{project_id}_{user_id}"
-        val = None
-        if self.rds.hexists(group, key):
-            val = self.rds.hget(group, key)
-            if val == "True":
-                val = True
-            else:
-                val = False
-        return val
-
-    def set_cred_cache(self, user_id, project_id, val):
+        val = self.rds.hget(group, key)
+        if val is None:
+            return None
+        # Values are stored with their own expiration time, since the group is shared.
+        decision, _, expires = val.decode().partition(":")
+        if not expires or float(expires) < time.time():
+            return None
+        return decision == "True"
+
+    def set_cred_cache(self, user_id, project_id, val, ttl=CRED_CACHE_TTL):
+        """Caches a project access decision for a user for `ttl` seconds. The group of
+        decisions for a project is removed when a membership of the project changes."""
         group = f"creds_{project_id}"
         key = f"creds_{project_id}_{user_id}"
-        self.rds.hset(group, key, str(val))
+        pipe = self.rds.pipeline(transaction=False)
+        pipe.hset(group, key, f"{bool(val)}:{time.time() + ttl}")
+        # Refreshing the group is harmless because expired decisions are ignored, and it holds
+        # at most one field per user.
+        pipe.expire(group, ttl)
+        pipe.execute()
 
     def invalidate_cred_cache(self, project_id):
         group = f"creds_{project_id}"
@@ -80,6 +95,86 @@ class TatorCache:
             url = url.decode()
         return url
 
+    def mget_presigned(self, user, keys):
+        """Retrieves presigned urls for multiple keys in a single round trip. Returns a dict
+        mapping keys to urls; keys without a cached url are omitted.
+        """
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        urls = self.rds.mget([f"{user}__{key}" for key in keys])
+        return {key: url.decode() for key, url in zip(keys, urls) if url is not None}
+
+    def mset_presigned(self, user, urls, ttl=3600):
+        """Stores a dict of presigned urls keyed by path in a single pipelined round trip."""
+        if not urls:
+            return
+        pipe = self.rds.pipeline(transaction=False)
+        for key, url in urls.items():
+            pipe.set(f"{user}__{key}", url, ex=ttl)
+        pipe.execute()
+
+    def get_permission_generation(self):
+        """Returns the counter that is incremented whenever permissions change."""
+        generation = self.rds.get(PERMISSION_GENERATION_KEY)
+        return int(generation) if generation is not None else 0
+
+    def bump_permission_generation(self):
+        """Invalidates all cached effective permissions."""
+        return self.rds.incr(PERMISSION_GENERATION_KEY)
+
+    def get_permission_masks(self, generation, user_id, project_id):
+        """Retrieves effective permission masks computed for the given generation."""
+        masks = self.rds.get(f"perm_{generation}_{project_id}_{user_id}")
+        if masks is not None:
+            masks = json.loads(masks)
+        return masks
+
+    def set_permission_masks(self, generation, user_id, project_id, masks, ttl):
+        """Stores effective permission masks computed for the given generation."""
+        self.rds.set(f"perm_{generation}_{project_id}_{user_id}", json.dumps(masks), ex=ttl)
+
+    def push_changelogs(self, entries, chunk_size=10000):
+        """Appends serialized changelog entries to the outbox. Returns the outbox length."""
+        length = self.rds.llen(CHANGELOG_OUTBOX_KEY)
+        for start in range(0, len(entries), chunk_size):
+            length = self.rds.rpush(CHANGELOG_OUTBOX_KEY, *entries[start : start + chunk_size])
+        return length
+
+    def peek_changelogs(self, count):
+        """Returns up to `count` of the oldest entries in the outbox without removing them."""
+        return self.rds.lrange(CHANGELOG_OUTBOX_KEY, 0, count - 1)
+
+    def trim_changelogs(self, count):
+        """Removes the `count` oldest entries from the outbox."""
+        self.rds.ltrim(CHANGELOG_OUTBOX_KEY, count, -1)
+
+    def get_changelog_backlog(self):
+        """Returns the number of entries in the outbox and the oldest entry, or None."""
+        pipe = self.rds.pipeline(transaction=False)
+        pipe.llen(CHANGELOG_OUTBOX_KEY)
+        pipe.lindex(CHANGELOG_OUTBOX_KEY, 0)
+        return tuple(pipe.execute())
+
+    def changelog_lock(self, timeout):
+        """Returns the lock held while writing entries from the outbox."""
+        return self.rds.lock(CHANGELOG_LOCK_KEY, timeout=timeout)
+
+    def record_attribute_usage(self, fields):
+        """Increments the sampled filter count of each `<type model>:<type id>:<attribute>`."""
+        pipe = self.rds.pipeline(transaction=False)
+        for field in fields:
+            pipe.hincrby(ATTRIBUTE_USAGE_KEY, field, 1)
+        pipe.execute()
+
+    def get_attribute_usage(self):
+        """Returns sampled filter counts keyed by `(type model, type id, attribute)`."""
+        usage = {}
+        for field, count in self.rds.hgetall(ATTRIBUTE_USAGE_KEY).items():
+            model, type_id, name = field.decode().split(":", 2)
+            usage[(model, int(type_id), name)] = int(count)
+        return usage
+
     def invalidate_all(self):
         """Invalidates all caches."""
         for prefix in ["creds_"]:
@@ -87,6 +182,7 @@ class TatorCache:
                 logger.info(f"Deleting cache key {key}...")
                 self.rds.delete(key)
         self.rds.delete("keycloak_public_key")
+        self.bump_permission_generation()
         logger.info("Cache cleared!")
 
 
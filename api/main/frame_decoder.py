@@ -0,0 +1,142 @@
+"""In-memory video frame decoding backed by a pool of long-lived worker processes.
+
+This module is imported by the worker processes, so it must not depend on Django.
+"""
+
+import importlib.util
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+FRAME_DECODER_WORKERS = int(os.getenv("TATOR_FRAME_DECODER_WORKERS", 0))
+JPEG_QUALITY = 90
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def decoder_enabled():
+    """Returns True if frames should be decoded by the worker pool instead of ffmpeg."""
+    return FRAME_DECODER_WORKERS > 0 and importlib.util.find_spec("av") is not None
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Use forkserver so workers are not forked from a multi-threaded server process.
+            _pool = ProcessPoolExecutor(
+                max_workers=FRAME_DECODER_WORKERS,
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _render(img, crop=None, scale=None, render_format="jpg"):
+    """Crops, scales and encodes a PIL image.
+
+    :param crop: Tuple of (width, height, x, y) in pixels, as used by the ffmpeg crop filter.
+    :param scale: Tuple of (width, height) in pixels.
+    :param render_format: One of `jpg` or `png`.
+    """
+    if crop is not None:
+        width, height, x, y = crop
+        img = img.crop((x, y, min(x + width, img.width), min(y + height, img.height)))
+    if scale is not None:
+        img = img.resize((int(scale[0]), int(scale[1])))
+    buf = io.BytesIO()
+    if render_format == "png":
+        img.save(buf, "png")
+    else:
+        img.convert("RGB").save(buf, "jpeg", quality=JPEG_QUALITY)
+    return buf.getvalue()
+
+
+def decode_frame(data, frame_offset, crop=None, scale=None, render_format="jpg"):
+    """Decodes a single frame from an in-memory (fragmented) mp4 and returns it encoded.
+
+    :param data: Bytes of an mp4 containing the header and the fragments holding the frame.
+    :param frame_offset: Index of the frame relative to the first frame in `data`.
+    """
+    import av  # pylint: disable=import-outside-toplevel
+
+    with av.open(io.BytesIO(data), mode="r") as container:
+        stream = container.streams.video[0]
+        stream.thread_type = "AUTO"
+        decoded = None
+        idx = -1
+        for idx, frame in enumerate(container.decode(stream)):
+            decoded = frame
+            if idx >= frame_offset:
+                break
+        if decoded is None:
+            raise ValueError("Failed to decode any frames from video segment!")
+        if idx < frame_offset:
+            raise ValueError(
+                f"Frame offset {frame_offset} is past the last frame ({idx}) of video segment!"
+            )
+        img = decoded.to_image()
+    return _render(img, crop, scale, render_format)
+
+
+def decode_image(data, crop=None, scale=None, render_format="jpg"):
+    """Decodes an encoded image and returns it cropped, scaled and re-encoded."""
+    with Image.open(io.BytesIO(data)) as img:
+        img.load()
+        return _render(img, crop, scale, render_format)
+
+
+def _map(function, jobs):
+    try:
+        pool = _get_pool()
+        futures = [pool.submit(function, *job) for job in jobs]
+        return [future.result() for future in futures]
+    except BrokenProcessPool:
+        logger.error("Frame decoder pool is broken, it will be recreated on next use.")
+        _reset_pool()
+        raise
+
+
+def decode_frames(jobs):
+    """Decodes frames concurrently. Each job is a tuple of arguments to `decode_frame`.
+    Returns a list of encoded images in job order.
+    """
+    return _map(decode_frame, jobs)
+
+
+def decode_images(jobs):
+    """Decodes images concurrently. Each job is a tuple of arguments to `decode_image`."""
+    return _map(decode_image, jobs)
+
+
+def tile_images(images, tile_size, render_format="jpg"):
+    """Arranges encoded images left to right, top to bottom on a grid like the ffmpeg tile
+    filter and returns the encoded result.
+
+    :param tile_size: String of the form `<columns>x<rows>`.
+    """
+    columns, rows = [int(comp) for comp in tile_size.split("x")]
+    decoded = [Image.open(io.BytesIO(image)) for image in images]
+    cell_width = max(img.width for img in decoded)
+    cell_height = max(img.height for img in decoded)
+    mode = "RGBA" if render_format == "png" else "RGB"
+    tile = Image.new(mode, (columns * cell_width, rows * cell_height))
+    for idx, img in enumerate(decoded):
+        tile.paste(img, ((idx % columns) * cell_width, (idx // columns) * cell_height))
+    return _render(tile, render_format=render_format)
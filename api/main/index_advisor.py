@@ -0,0 +1,132 @@
+""" Recommends, creates and drops attribute indices based on how they are used. """
+
+import logging
+
+from django.db import connection
+
+from .cache import ATTRIBUTE_USAGE_SAMPLE_RATE, TatorCache
+from .models import (
+    IndexDecision,
+    Leaf,
+    LeafType,
+    Localization,
+    LocalizationType,
+    Media,
+    MediaType,
+    State,
+    StateType,
+)
+from .search import TatorSearch
+
+logger = logging.getLogger(__name__)
+
+ENTITY_LOOKUP = {
+    MediaType: Media,
+    LocalizationType: Localization,
+    StateType: State,
+    LeafType: Leaf,
+}
+
+# Vector indices serve nearest neighbor searches rather than filters, and dropping them also
+# clears the vector side table, so they are left alone.
+EXCLUDED_DTYPES = ["float_array"]
+
+
+def get_index_scans(project_id):
+    """Returns the number of scans of each index of a project since statistics were reset."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexrelname, idx_scan FROM pg_stat_user_indexes WHERE indexrelname LIKE %s",
+            (f"tator_proj_{project_id}_%",),
+        )
+        return dict(cursor.fetchall())
+
+
+def _decide(present, row_count, scans, estimated, population_limit, min_scans, min_filters):
+    """Returns the action and reason for a single attribute index. An unknown (None) number
+    of filters always keeps the current state.
+    """
+    if estimated is None:
+        return "keep", "No attribute usage has been sampled."
+    used = estimated >= min_filters
+    if present:
+        if not used and scans < min_scans:
+            if row_count < population_limit:
+                return (
+                    "drop",
+                    f"Type has {row_count} rows, the index was scanned {scans} times and the "
+                    "attribute is rarely filtered on.",
+                )
+            return (
+                "drop",
+                f"Index was scanned {scans} times and the attribute is rarely filtered on.",
+            )
+        return "keep", "Index is in use."
+    if used and row_count >= population_limit:
+        return "create", f"Attribute was filtered on about {estimated} times without an index."
+    return "keep", "No index is needed."
+
+
+def advise_indices(project_id, apply=False, population_limit=10000, min_scans=1, min_filters=1):
+    """Compares attribute indices of a project against their usage and records the
+    recommended action for each attribute in the `IndexDecision` history.
+
+    :param project_id: Project to check.
+    :param apply: If true, create and drop indices as recommended. Otherwise this is a dry run.
+    :param population_limit: Types with fewer rows than this are not worth indexing.
+    :param min_scans: Indices scanned fewer times than this are considered unused.
+    :param min_filters: Attributes estimated to be filtered on fewer times than this are
+        considered unused.
+    :returns: List of `IndexDecision` objects, one per attribute. Without any sampled usage
+        every index is kept.
+    """
+    ts = TatorSearch()
+    scans_by_name = get_index_scans(project_id)
+    usage = TatorCache().get_attribute_usage()
+    decisions = []
+    for type_model, entity_model in ENTITY_LOOKUP.items():
+        model_name = type_model.__name__.lower()
+        for entity_type in type_model.objects.filter(project=project_id):
+            row_count = entity_model.objects.filter(project=project_id, type=entity_type).count()
+            for attribute in entity_type.attribute_types:
+                if attribute["dtype"] in EXCLUDED_DTYPES:
+                    continue
+                if attribute["dtype"] not in ts.index_map:
+                    continue
+                index_names = [
+                    name for name in ts.index_names(entity_type, attribute) if name in scans_by_name
+                ]
+                present = bool(index_names)
+                scans = sum(scans_by_name[name] for name in index_names) if present else None
+                if usage and ATTRIBUTE_USAGE_SAMPLE_RATE:
+                    sampled = usage.get((model_name, entity_type.pk, attribute["name"]), 0)
+                    estimated = int(sampled / ATTRIBUTE_USAGE_SAMPLE_RATE)
+                else:
+                    estimated = None
+                action, reason = _decide(
+                    present, row_count, scans, estimated, population_limit, min_scans, min_filters
+                )
+                if apply and action == "create":
+                    ts.create_psql_index(entity_type, attribute)
+                elif apply and action == "drop":
+                    ts.delete_index(entity_type, attribute)
+                decisions.append(
+                    IndexDecision(
+                        project_id=project_id,
+                        entity_type=model_name,
+                        type_id=entity_type.pk,
+                        attribute=attribute["name"],
+                        index_name=ts.index_names(entity_type, attribute)[0],
+                        action=action,
+                        reason=reason,
+                        row_count=row_count,
+                        index_scans=scans,
+                        estimated_filters=estimated,
+                        applied=apply and action != "keep",
+                    )
+                )
+    IndexDecision.objects.bulk_create(decisions)
+    logger.info(
+        f"Index advisor made {len(decisions)} decisions for project {project_id} (apply={apply})."
+    )
+    return decisions
@@ -0,0 +1,43 @@
+import logging
+
+from django.core.management.base import BaseCommand
+from main.index_advisor import advise_indices
+from main.models import Project
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Recommends attribute indices to create or drop based on index scans and sampled "
+        "attribute filters. Only reports recommendations unless --apply is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--project", type=int, help="Only check this project.")
+        parser.add_argument("--apply", action="store_true", help="Create and drop indices.")
+        parser.add_argument("--population_limit", type=int, default=10000)
+        parser.add_argument("--min_scans", type=int, default=1)
+        parser.add_argument("--min_filters", type=int, default=1)
+
+    def handle(self, **options):
+        if options["project"]:
+            project_ids = [options["project"]]
+        else:
+            project_ids = Project.objects.values_list("id", flat=True)
+        for project_id in project_ids:
+            decisions = advise_indices(
+                project_id,
+                apply=options["apply"],
+                population_limit=options["population_limit"],
+                min_scans=options["min_scans"],
+                min_filters=options["min_filters"],
+            )
+            for decision in decisions:
+                if decision.action == "keep":
+                    continue
+                self.stdout.write(
+                    f"{decision.action.upper():<6} {decision.index_name} "
+                    f"(rows={decision.row_count}, scans={decision.index_scans}, "
+                    f"filters~{decision.estimated_filters}): {decision.reason}"
+                )
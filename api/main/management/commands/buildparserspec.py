@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from main.schema import write_parser_spec
+
+
+class Command(BaseCommand):
+    help = "Generates and serializes the OpenAPI spec used to parse requests."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path", type=str, help="Output path, defaults to the parser spec path."
+        )
+
+    def handle(self, **options):
+        kwargs = {"path": options["path"]} if options["path"] else {}
+        path = write_parser_spec(**kwargs)
+        self.stdout.write(f"Wrote parser spec to {path}")
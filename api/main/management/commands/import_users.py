@@ -4,6 +4,7 @@ import csv
 
 from django.core.management.base import BaseCommand
 from django.utils.crypto import get_random_string
+from main.cache import TatorCache
 from main.models import User
 from main.models import Affiliation
 from main.models import Membership
@@ -148,6 +149,8 @@ def _create_affiliations(options, existing, num_new, users):
             f"Incorrect number of affiliations to be created (got {len(new)}, expected {num_new}!"
         )
     created = Affiliation.objects.bulk_create(new)
+    # bulk_create does not send signals, so invalidate cached permissions explicitly.
+    TatorCache().bump_permission_generation()
     print(f"Created {len(created)} new affiliations!")
     return list(created)
 
@@ -0,0 +1,43 @@
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from main.models import IndexBuild
+from main.search import schedule_index_builds
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Shows the progress of queued index builds and requeues failed ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--project", type=int, help="Only show builds of this project.")
+        parser.add_argument(
+            "--retry", action="store_true", help="Requeue failed builds and schedule them."
+        )
+
+    def handle(self, **options):
+        builds = IndexBuild.objects.all()
+        if options["project"]:
+            builds = builds.filter(project=options["project"])
+
+        if options["retry"]:
+            count = builds.filter(status="failed").update(status="queued", error=None)
+            logger.info(f"Requeued {count} failed index builds.")
+            if count:
+                schedule_index_builds(connection.settings_dict["NAME"])
+
+        counts = builds.values("project", "table_name", "status").annotate(count=Count("id"))
+        for row in counts.order_by("project", "table_name", "status"):
+            self.stdout.write(
+                f"project={row['project']} table={row['table_name']} "
+                f"{row['status']}={row['count']}"
+            )
+        for build in builds.filter(status="running").order_by("started_datetime"):
+            self.stdout.write(f"RUNNING {build.index_name} since {build.started_datetime}")
+        for build in builds.filter(status="failed").order_by("-finished_datetime"):
+            self.stdout.write(
+                f"FAILED {build.index_name} after {build.attempts} attempts: {build.error}"
+            )
@@ -0,0 +1,66 @@
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from main.models import (
+    EFFECTIVE_PERMISSION_INSERT,
+    Affiliation,
+    EffectivePermission,
+    GroupMembership,
+    RowProtection,
+    User,
+)
+from main._permission_util import compute_effective_permissions
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the materialized effective permission table and verifies its contents."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify_only",
+            action="store_true",
+            help="Only compare the table against permissions computed from row protections.",
+        )
+
+    def handle(self, **options):
+        if not options["verify_only"]:
+            with transaction.atomic():
+                # Block concurrent changes so triggers cannot interleave with the rebuild.
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "LOCK TABLE main_rowprotection, main_groupmembership, main_affiliation "
+                        "IN SHARE ROW EXCLUSIVE MODE"
+                    )
+                    cursor.execute("DELETE FROM main_effectivepermission")
+                    cursor.execute(EFFECTIVE_PERMISSION_INSERT.format(condition="TRUE"))
+            logger.info(f"Rebuilt {EffectivePermission.objects.count()} effective permissions.")
+
+        user_ids = (
+            set(RowProtection.objects.filter(user__isnull=False).values_list("user", flat=True))
+            | set(GroupMembership.objects.values_list("user", flat=True))
+            | set(Affiliation.objects.values_list("user", flat=True))
+            | set(EffectivePermission.objects.values_list("user", flat=True))
+        )
+        num_mismatched = 0
+        for user in User.objects.filter(pk__in=user_ids).iterator():
+            expected = compute_effective_permissions(user)
+            actual = {
+                (scope, target): permission
+                for scope, target, permission in EffectivePermission.objects.filter(
+                    user=user
+                ).values_list("scope", "target", "permission")
+            }
+            if expected != actual:
+                num_mismatched += 1
+                for key in set(expected) | set(actual):
+                    if expected.get(key) != actual.get(key):
+                        logger.warning(
+                            f"User {user.pk} {key[0]} {key[1]}: expected {expected.get(key)}, "
+                            f"got {actual.get(key)}"
+                        )
+        if num_mismatched:
+            raise CommandError(f"Effective permissions of {num_mismatched} users do not match!")
+        logger.info(f"Verified effective permissions of {len(user_ids)} users.")
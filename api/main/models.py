@@ -47,6 +47,8 @@ from django.db import transaction, connection
 from django.db.backends.signals import connection_created
 from django.dispatch import receiver
 from django.db.models import UniqueConstraint
+from django.db.models import Index
+from pgvector.django import VectorField
 
 from .backup import TatorBackupManager
 from .search import TatorSearch
@@ -55,12 +57,14 @@ from .download import download_file
 from .encoders import TatorJSONEncoder
 from .store import (
     get_tator_store,
+    invalidate_tator_store_cache,
     ObjectStore,
     get_storage_lookup,
     DEFAULT_STORAGE_CLASSES,
     VALID_STORAGE_CLASSES,
 )
 from .cognito import TatorCognito
+from .cache import TatorCache
 
 from collections import UserDict
 from urllib.parse import urlparse
@@ -79,26 +83,51 @@ from .middleware import get_http_method
 # Load the main.view logger
 logger = logging.getLogger(__name__)
 
-BEFORE_MARK_TRIGGER_FUNC = """
-IF NEW.elemental_id IS NULL THEN
+HNSW_EF_SEARCH = int(os.getenv("TATOR_HNSW_EF_SEARCH", 0))
+
+# Assigns marks and latest marks to every row inserted by a statement at once. Marks within an
+# (elemental_id, version) are assigned in id order, counting only rows that are not deleted, which
+# gives the same result as computing COALESCE(MAX(mark)+1,0) one row at a time.
+STATEMENT_MARK_TRIGGER_FUNC = """
+IF EXISTS (SELECT 1 FROM new_rows WHERE elemental_id IS NULL) THEN
             RAISE EXCEPTION 'elemental_id cannot be null';
 END IF;
-IF NEW.version IS NULL THEN
+IF EXISTS (SELECT 1 FROM new_rows WHERE version IS NULL) THEN
             RAISE EXCEPTION 'version cannot be null';
 END IF;
 
-EXECUTE format('SELECT * FROM %I.%I  WHERE elemental_id=%L AND version=%s FOR UPDATE',TG_TABLE_SCHEMA, TG_TABLE_NAME, NEW.elemental_id, NEW.version);
-
-IF (SELECT COUNT(name) FROM pg_prepared_statements WHERE name='get_next_mark_localization')  THEN
-    SET plan_cache_mode=force_generic_plan;
-    EXECUTE format('EXECUTE get_next_mark_{0}(%L,%s)', NEW.elemental_id::uuid, NEW.version::integer) INTO _var;
-    SET plan_cache_mode=auto;
-ELSE
-    EXECUTE format('SELECT COALESCE(MAX(mark)+1,0) FROM %I.%I WHERE elemental_id=%L AND version=%s AND deleted=FALSE', TG_TABLE_SCHEMA, TG_TABLE_NAME, NEW.elemental_id, NEW.version) INTO _var;
-END  IF;
+PERFORM 1 FROM main_{0} t
+WHERE (t.elemental_id, t.version) IN (SELECT elemental_id, version FROM new_rows)
+ORDER BY t.id
+FOR UPDATE OF t;
+
+WITH next_marks AS (
+    SELECT elements.elemental_id, elements.version, COALESCE(MAX(t.mark)+1,0) AS next_mark
+    FROM (SELECT DISTINCT elemental_id, version FROM new_rows) elements
+    LEFT JOIN main_{0} t
+        ON t.elemental_id=elements.elemental_id AND t.version=elements.version AND t.deleted=FALSE
+        AND NOT EXISTS (SELECT 1 FROM new_rows n WHERE n.id=t.id)
+    GROUP BY elements.elemental_id, elements.version
+), marks AS (
+    SELECT n.id, next_marks.next_mark + COUNT(*) FILTER (WHERE n.deleted=FALSE) OVER (
+        PARTITION BY n.elemental_id, n.version ORDER BY n.id
+        ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+    ) AS mark
+    FROM new_rows n
+    JOIN next_marks ON next_marks.elemental_id=n.elemental_id AND next_marks.version=n.version
+)
+UPDATE main_{0} t SET mark=marks.mark FROM marks WHERE t.id=marks.id AND t.mark<>marks.mark;
 
-NEW.mark = _var;
-RETURN NEW;
+WITH latest_marks AS (
+    SELECT t.elemental_id, t.version, COALESCE(MAX(t.mark) FILTER (WHERE t.deleted=FALSE),0) AS latest_mark
+    FROM main_{0} t
+    WHERE (t.elemental_id, t.version) IN (SELECT elemental_id, version FROM new_rows)
+    GROUP BY t.elemental_id, t.version
+)
+UPDATE main_{0} t SET latest_mark=latest_marks.latest_mark FROM latest_marks
+WHERE t.elemental_id=latest_marks.elemental_id AND t.version=latest_marks.version
+AND t.latest_mark IS DISTINCT FROM latest_marks.latest_mark;
+RETURN NULL;
 """
 
 
@@ -115,10 +144,202 @@ END  IF;
 RETURN NEW;
 """
 
+# Selects the OR of the row protections that apply to each user for each materialized scope. A
+# user is subject to a row protection directly, through a group membership or through an
+# affiliation with an organization.
+EFFECTIVE_PERMISSION_SELECT = """
+SELECT subjects.user_id, targets.scope, targets.target, targets.project_id, bit_or(rp.permission)
+FROM main_rowprotection rp
+CROSS JOIN LATERAL (
+    SELECT rp.user_id WHERE rp.user_id IS NOT NULL
+    UNION ALL
+    SELECT gm.user_id FROM main_groupmembership gm WHERE gm.group_id = rp.group_id
+    UNION ALL
+    SELECT af.user_id FROM main_affiliation af WHERE af.organization_id = rp.organization_id
+) AS subjects(user_id)
+CROSS JOIN LATERAL (
+    SELECT 'project', rp.project_id, rp.project_id WHERE rp.project_id IS NOT NULL
+    UNION ALL
+    SELECT 'section', rp.section_id, sec.project FROM main_section sec WHERE sec.id = rp.section_id
+    UNION ALL
+    SELECT 'version', rp.version_id, ver.project_id FROM main_version ver WHERE ver.id = rp.version_id
+    UNION ALL
+    SELECT 'organization', rp.target_organization_id, NULL::integer
+    WHERE rp.target_organization_id IS NOT NULL
+    UNION ALL
+    SELECT 'group', rp.target_group_id, NULL::integer WHERE rp.target_group_id IS NOT NULL
+) AS targets(scope, target, project_id)
+WHERE {condition}
+GROUP BY subjects.user_id, targets.scope, targets.target, targets.project_id
+"""
+
+EFFECTIVE_PERMISSION_INSERT = (
+    "INSERT INTO main_effectivepermission (user_id, scope, target, project_id, permission)"
+    + EFFECTIVE_PERMISSION_SELECT
+    + """ON CONFLICT (user_id, scope, target)
+DO UPDATE SET project_id = EXCLUDED.project_id, permission = EXCLUDED.permission;
+"""
+)
+
+# Transaction advisory lock taken before any refresh of materialized permissions. Under READ
+# COMMITTED a refresh could otherwise read the rows of a concurrent transaction that is about to
+# remove them, and keep a grant that no longer applies once both commit. Waiting for the lock
+# means each refresh reads every earlier refresh's committed changes.
+EFFECTIVE_PERMISSION_LOCK = 7303
+REFRESH_PERMISSION_LOCK = f"""
+PERFORM pg_advisory_xact_lock({EFFECTIVE_PERMISSION_LOCK});"""
+
+# Refreshes the materialized permissions of every target referenced by the old or new row
+REFRESH_PERMISSION_TARGET_TRIGGER_FUNC = (
+    REFRESH_PERMISSION_LOCK
+    + """
+FOR _scope, _target IN
+    SELECT t.scope, t.target FROM (VALUES
+        ('project', OLD.project_id), ('section', OLD.section_id), ('version', OLD.version_id),
+        ('organization', OLD.target_organization_id), ('group', OLD.target_group_id),
+        ('project', NEW.project_id), ('section', NEW.section_id), ('version', NEW.version_id),
+        ('organization', NEW.target_organization_id), ('group', NEW.target_group_id)
+    ) AS t(scope, target)
+    WHERE t.target IS NOT NULL
+    GROUP BY t.scope, t.target
+LOOP
+    DELETE FROM main_effectivepermission WHERE scope = _scope AND target = _target;
+"""
+    + EFFECTIVE_PERMISSION_INSERT.format(
+        condition="""targets.scope = _scope AND targets.target = _target AND (
+    rp.project_id = _target OR rp.section_id = _target OR rp.version_id = _target
+    OR rp.target_organization_id = _target OR rp.target_group_id = _target
+)"""
+    )
+    + """
+END LOOP;
+RETURN NULL;
+"""
+)
+
+# Refreshes all materialized permissions of the user referenced by the old or new row
+REFRESH_PERMISSION_USER_TRIGGER_FUNC = (
+    REFRESH_PERMISSION_LOCK
+    + """
+FOR _user IN
+    SELECT t.user_id FROM (VALUES (OLD.user_id), (NEW.user_id)) AS t(user_id)
+    WHERE t.user_id IS NOT NULL
+    GROUP BY t.user_id
+LOOP
+    DELETE FROM main_effectivepermission WHERE user_id = _user;
+"""
+    + EFFECTIVE_PERMISSION_INSERT.format(
+        condition="""subjects.user_id = _user AND (
+    rp.user_id = _user
+    OR rp.group_id IN (SELECT group_id FROM main_groupmembership WHERE user_id = _user)
+    OR rp.organization_id IN (SELECT organization_id FROM main_affiliation WHERE user_id = _user)
+)"""
+    )
+    + """
+END LOOP;
+RETURN NULL;
+"""
+)
+
+
+def _refresh_permission_user_trigger(name):
+    return pgtrigger.Trigger(
+        name=name,
+        operation=pgtrigger.Insert | pgtrigger.Update | pgtrigger.Delete,
+        when=pgtrigger.After,
+        declare=[("_user", "integer")],
+        func=REFRESH_PERMISSION_USER_TRIGGER_FUNC,
+    )
+
+
+# Skips vector maintenance for statements that only touch types without float_array attributes.
+VECTOR_TYPE_CHECK = """
+IF NOT EXISTS (
+    SELECT 1 FROM main_{0}type t
+    WHERE t.id IN (SELECT meta FROM {1})
+    AND t.attribute_types @> '[{{{{"dtype": "float_array"}}}}]'::jsonb
+) THEN
+    RETURN NULL;
+END IF;
+"""
+
+# Selects one row per float_array attribute value of the entities in `{1}`. Empty arrays are
+# skipped as they cannot be cast to a vector.
+VECTOR_SELECT = """
+SELECT n.id AS entity, n.meta, a.attr->>'name' AS name,
+       (n.attributes->>(a.attr->>'name'))::vector AS embedding
+FROM {1} n
+JOIN main_{0}type t ON t.id = n.meta
+CROSS JOIN LATERAL jsonb_array_elements(t.attribute_types) AS a(attr)
+WHERE a.attr->>'dtype' = 'float_array'
+AND jsonb_typeof(n.attributes->(a.attr->>'name')) = 'array'
+AND n.attributes->(a.attr->>'name') <> '[]'::jsonb
+"""
+
+VECTOR_UPSERT = """
+ON CONFLICT (entity, name) DO UPDATE SET meta = EXCLUDED.meta, embedding = EXCLUDED.embedding;
+"""
+
+# Copies float_array attributes of inserted rows into the vector side table.
+VECTOR_INSERT_TRIGGER_FUNC = (
+    VECTOR_TYPE_CHECK.format("{0}", "new_rows")
+    + "INSERT INTO main_{0}vector (entity, meta, name, embedding)"
+    + VECTOR_SELECT.format("{0}", "new_rows")
+    + VECTOR_UPSERT
+    + "RETURN NULL;\n"
+)
+
+# Rewrites the vectors of updated rows whose attributes or type changed, removing vectors of
+# attributes that were deleted or set to null.
+VECTOR_UPDATE_TRIGGER_FUNC = (
+    VECTOR_TYPE_CHECK.format("{0}", "(SELECT meta FROM new_rows UNION SELECT meta FROM old_rows) m")
+    + """
+WITH changed AS (
+    SELECT n.* FROM new_rows n JOIN old_rows o ON o.id = n.id
+    WHERE n.attributes IS DISTINCT FROM o.attributes OR n.meta IS DISTINCT FROM o.meta
+), vectors AS ("""
+    + VECTOR_SELECT.format("{0}", "changed")
+    + """), removed AS (
+    DELETE FROM main_{0}vector v USING changed c
+    WHERE v.entity = c.id
+    AND NOT EXISTS (SELECT 1 FROM vectors WHERE vectors.entity = v.entity AND vectors.name = v.name)
+)
+INSERT INTO main_{0}vector (entity, meta, name, embedding)
+SELECT entity, meta, name, embedding FROM vectors"""
+    + VECTOR_UPSERT
+    + "RETURN NULL;\n"
+)
+
+
+def _vector_triggers(table):
+    """Returns triggers that keep the vector side table of `main_<table>` in sync."""
+    return [
+        pgtrigger.Trigger(
+            name=f"post_{table}_vector_trigger_insert",
+            operation=pgtrigger.Insert,
+            when=pgtrigger.After,
+            level=pgtrigger.Statement,
+            referencing=pgtrigger.Referencing(new="new_rows"),
+            func=VECTOR_INSERT_TRIGGER_FUNC.format(table),
+        ),
+        pgtrigger.Trigger(
+            name=f"post_{table}_vector_trigger_update",
+            operation=pgtrigger.Update,
+            when=pgtrigger.After,
+            level=pgtrigger.Statement,
+            referencing=pgtrigger.Referencing(old="old_rows", new="new_rows"),
+            func=VECTOR_UPDATE_TRIGGER_FUNC.format(table),
+        ),
+    ]
+
 
 # Register prepared statements for the triggers to optimize performance on creation of a database  connection
 @receiver(connection_created)
 def on_connection_created(sender, connection, **kwargs):
+    if HNSW_EF_SEARCH:
+        # Size of the candidate list used by HNSW vector searches, trading speed for recall.
+        with connection.cursor() as cursor:
+            cursor.execute("SET hnsw.ef_search = %s", (HNSW_EF_SEARCH,))
     http_method = get_http_method()
     if http_method in ["PATCH", "POST"]:
         logger.info(
@@ -599,6 +820,9 @@ class Invitation(Model):
 class Affiliation(Model):
     """Stores a user and their permissions in an organization."""
 
+    class Meta:
+        triggers = [_refresh_permission_user_trigger("affiliation_effective_permission_trigger")]
+
     organization = ForeignKey(Organization, on_delete=CASCADE)
     user = ForeignKey(User, on_delete=CASCADE)
     permission = CharField(
@@ -718,6 +942,12 @@ class Bucket(Model):
         return new_params
 
 
+@receiver(post_save, sender=Bucket)
+@receiver(post_delete, sender=Bucket)
+def bucket_changed(sender, instance, **kwargs):
+    invalidate_tator_store_cache(instance.pk)
+
+
 class Project(Model):
     name = CharField(max_length=128)
     creator = ForeignKey(User, on_delete=PROTECT, related_name="creator", db_column="creator")
@@ -909,6 +1139,13 @@ class Membership(Model):
         return f"{self.user} | {self.permission} | {self.project}"
 
 
+@receiver(post_save, sender=Membership)
+@receiver(post_delete, sender=Membership)
+def membership_changed(sender, instance, **kwargs):
+    project_id = instance.project_id
+    transaction.on_commit(lambda: TatorCache().invalidate_cred_cache(project_id))
+
+
 @receiver(post_save, sender=Membership)
 def membership_save(sender, instance, created, **kwargs):
     email_service = get_email_service()
@@ -1390,6 +1627,9 @@ class Media(Model, ModelDiffMixin):
 
     """
 
+    class Meta:
+        triggers = _vector_triggers("media")
+
     project = ForeignKey(
         Project,
         on_delete=SET_NULL,
@@ -1846,18 +2086,12 @@ class Localization(Model, ModelDiffMixin):
     class Meta:
         triggers = [
             pgtrigger.Trigger(
-                name="localization_mark_trigger",
-                operation=pgtrigger.Insert,
-                when=pgtrigger.Before,
-                declare=[("_var", "integer")],
-                func=BEFORE_MARK_TRIGGER_FUNC.format("localization"),
-            ),
-            pgtrigger.Trigger(
-                name="post_localization_mark_trigger",
+                name="post_localization_mark_trigger_statement",
                 operation=pgtrigger.Insert,
                 when=pgtrigger.After,
-                declare=[("_var", "integer")],
-                func=AFTER_MARK_TRIGGER_FUNC.format("localization"),
+                level=pgtrigger.Statement,
+                referencing=pgtrigger.Referencing(new="new_rows"),
+                func=STATEMENT_MARK_TRIGGER_FUNC.format("localization"),
             ),
             pgtrigger.Trigger(
                 name="post_localization_mark_trigger_update",
@@ -1867,6 +2101,7 @@ class Localization(Model, ModelDiffMixin):
                 declare=[("_var", "integer")],
                 func=AFTER_MARK_TRIGGER_FUNC.format("localization"),
             ),
+            *_vector_triggers("localization"),
         ]
 
     project = ForeignKey(Project, on_delete=SET_NULL, null=True, blank=True, db_column="project")
@@ -1951,18 +2186,12 @@ class State(Model, ModelDiffMixin):
     class Meta:
         triggers = [
             pgtrigger.Trigger(
-                name="state_mark_trigger",
-                operation=pgtrigger.Insert,
-                when=pgtrigger.Before,
-                declare=[("_var", "integer")],
-                func=BEFORE_MARK_TRIGGER_FUNC.format("state"),
-            ),
-            pgtrigger.Trigger(
-                name="post_state_mark_trigger",
+                name="post_state_mark_trigger_statement",
                 operation=pgtrigger.Insert,
                 when=pgtrigger.After,
-                declare=[("_var", "integer")],
-                func=AFTER_MARK_TRIGGER_FUNC.format("state"),
+                level=pgtrigger.Statement,
+                referencing=pgtrigger.Referencing(new="new_rows"),
+                func=STATEMENT_MARK_TRIGGER_FUNC.format("state"),
             ),
             pgtrigger.Trigger(
                 name="post_state_mark_trigger_update",
@@ -1972,6 +2201,7 @@ class State(Model, ModelDiffMixin):
                 declare=[("_var", "integer")],
                 func=AFTER_MARK_TRIGGER_FUNC.format("state"),
             ),
+            *_vector_triggers("state"),
         ]
 
     project = ForeignKey(Project, on_delete=SET_NULL, null=True, blank=True, db_column="project")
@@ -2097,6 +2327,7 @@ class Leaf(Model, ModelDiffMixin):
 
     class Meta:
         verbose_name_plural = "Leaves"
+        triggers = _vector_triggers("leaf")
 
     def __str__(self):
         return str(self.path)
@@ -2125,6 +2356,75 @@ class Leaf(Model, ModelDiffMixin):
         return pathStr
 
 
+class AttributeVector(Model):
+    """Typed copy of a `float_array` attribute value, maintained by triggers on the entity
+    table. Vectors of all attributes share one column so that each (type, attribute) pair can
+    have its own partial HNSW index on `embedding::vector(size)`.
+    """
+
+    name = CharField(max_length=256)
+    """ Name of the float_array attribute. """
+    embedding = VectorField()
+
+    class Meta:
+        abstract = True
+
+
+class MediaVector(AttributeVector):
+    # Entities are deleted with raw SQL in some places, so cascade without a constraint.
+    entity = ForeignKey(
+        Media, on_delete=CASCADE, db_constraint=False, related_name="vectors", db_column="entity"
+    )
+    type = ForeignKey(MediaType, on_delete=CASCADE, db_constraint=False, db_column="meta")
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=["entity", "name"], name="mediavector_entity_name_unique")
+        ]
+
+
+class LocalizationVector(AttributeVector):
+    entity = ForeignKey(
+        Localization,
+        on_delete=CASCADE,
+        db_constraint=False,
+        related_name="vectors",
+        db_column="entity",
+    )
+    type = ForeignKey(LocalizationType, on_delete=CASCADE, db_constraint=False, db_column="meta")
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=["entity", "name"], name="localizationvector_entity_name_unique"
+            )
+        ]
+
+
+class StateVector(AttributeVector):
+    entity = ForeignKey(
+        State, on_delete=CASCADE, db_constraint=False, related_name="vectors", db_column="entity"
+    )
+    type = ForeignKey(StateType, on_delete=CASCADE, db_constraint=False, db_column="meta")
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=["entity", "name"], name="statevector_entity_name_unique")
+        ]
+
+
+class LeafVector(AttributeVector):
+    entity = ForeignKey(
+        Leaf, on_delete=CASCADE, db_constraint=False, related_name="vectors", db_column="entity"
+    )
+    type = ForeignKey(LeafType, on_delete=CASCADE, db_constraint=False, db_column="meta")
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=["entity", "name"], name="leafvector_entity_name_unique")
+        ]
+
+
 class Section(Model):
     project = ForeignKey(Project, on_delete=CASCADE, db_column="project")
     name = CharField(max_length=128)
@@ -2259,6 +2559,73 @@ class ChangeToObject(Model):
     """ The change that affected the object """
 
 
+class IndexDecision(Model):
+    """History of the recommendations made by the attribute index advisor."""
+
+    project = ForeignKey(Project, on_delete=CASCADE, db_column="project")
+    entity_type = CharField(max_length=32)
+    """ Model name of the type owning the attribute, e.g. `localizationtype`. """
+    type_id = IntegerField()
+    """ ID of the type owning the attribute. """
+    attribute = CharField(max_length=256)
+    """ Name of the attribute. """
+    index_name = CharField(max_length=256)
+    """ Base name of the index, as given by the search module. """
+    action = CharField(
+        max_length=16, choices=[("create", "create"), ("drop", "drop"), ("keep", "keep")]
+    )
+    reason = TextField()
+    """ Explanation of the decision. """
+    row_count = BigIntegerField()
+    """ Number of objects of the type when the decision was made. """
+    index_scans = BigIntegerField(null=True, blank=True)
+    """ Scans of the index reported by `pg_stat_user_indexes`, null if it did not exist. """
+    estimated_filters = BigIntegerField(null=True, blank=True)
+    """ Filters on the attribute estimated from sampled queries, null if none were sampled. """
+    applied = BooleanField(default=False)
+    """ Whether the action was carried out, false for dry runs. """
+    created_datetime = DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [Index(fields=["project", "entity_type", "type_id", "attribute"])]
+
+
+class IndexBuild(Model):
+    """Index build queued by the search module. Builds of the same table run one at a time,
+    in order of priority.
+    """
+
+    project = ForeignKey(Project, on_delete=CASCADE, db_column="project")
+    table_name = CharField(max_length=64)
+    """ Table the index is built on. """
+    index_name = CharField(max_length=256)
+    function = CharField(max_length=64)
+    """ Name of the function in the search module that builds the index. """
+    args = JSONField()
+    """ Arguments of `function` following the database name. """
+    priority = IntegerField(default=1)
+    """ Builds with lower values run first. """
+    status = CharField(
+        max_length=16,
+        choices=[
+            ("queued", "queued"),
+            ("running", "running"),
+            ("succeeded", "succeeded"),
+            ("failed", "failed"),
+        ],
+        default="queued",
+    )
+    attempts = IntegerField(default=0)
+    error = TextField(null=True, blank=True)
+    """ Error raised by the last failed attempt. """
+    created_datetime = DateTimeField(auto_now_add=True)
+    started_datetime = DateTimeField(null=True, blank=True)
+    finished_datetime = DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [Index(fields=["table_name", "status", "priority"])]
+
+
 class Announcement(Model):
     """Message that may be displayed to users."""
 
@@ -2371,6 +2738,11 @@ class Group(Model):
 class GroupMembership(Model):
     """Associates a user to a group"""
 
+    class Meta:
+        triggers = [
+            _refresh_permission_user_trigger("group_membership_effective_permission_trigger")
+        ]
+
     project = ForeignKey(Project, on_delete=CASCADE, null=True, blank=True)
     """ Project that the group membership belongs to (DISREGARD THIS FIELD)"""
     user = ForeignKey(User, on_delete=CASCADE)
@@ -2475,6 +2847,61 @@ class RowProtection(Model):
                 name="permission_uniqueness_check",
             )
         ]
+        triggers = [
+            pgtrigger.Trigger(
+                name="row_protection_effective_permission_trigger",
+                operation=pgtrigger.Insert | pgtrigger.Update | pgtrigger.Delete,
+                when=pgtrigger.After,
+                declare=[("_scope", "text"), ("_target", "integer")],
+                func=REFRESH_PERMISSION_TARGET_TRIGGER_FUNC,
+            ),
+        ]
+
+
+@receiver(post_save, sender=RowProtection)
+@receiver(post_delete, sender=RowProtection)
+@receiver(post_save, sender=GroupMembership)
+@receiver(post_delete, sender=GroupMembership)
+@receiver(post_save, sender=Affiliation)
+@receiver(post_delete, sender=Affiliation)
+def permission_changed(sender, instance, **kwargs):
+    # Bump after commit so other processes cannot cache permissions computed from stale rows.
+    transaction.on_commit(lambda: TatorCache().bump_permission_generation())
+
+
+class EffectivePermission(Model):
+    """Materialized OR of the row protections that apply to a user for a project, section,
+    version, organization or group. Rows are maintained by triggers on `RowProtection`,
+    `GroupMembership` and `Affiliation`; use the `rebuildpermissions` management command to
+    rebuild or verify the table.
+    """
+
+    user = ForeignKey(User, on_delete=CASCADE, db_constraint=False)
+    scope = CharField(
+        max_length=16,
+        choices=[
+            ("project", "project"),
+            ("section", "section"),
+            ("version", "version"),
+            ("organization", "organization"),
+            ("group", "group"),
+        ],
+    )
+    """ Type of the object the permission applies to """
+    target = IntegerField()
+    """ ID of the object the permission applies to """
+    project = ForeignKey(Project, on_delete=CASCADE, null=True, blank=True, db_constraint=False)
+    """ Project containing the target, null for organizations and groups """
+    permission = BigIntegerField(default=0)
+    """ OR of all row protections that apply, see PermissionMask """
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=["user", "scope", "target"], name="effective_permission_uniqueness"
+            )
+        ]
+        indexes = [Index(fields=["user", "project"]), Index(fields=["scope", "target"])]
 
 
 # Structure to handle identifying columns with project-scoped indices
@@ -2496,6 +2923,7 @@ BUILT_IN_INDICES = {
         {"name": "$id", "dtype": "native"},
         {"name": "$created_datetime", "dtype": "native"},
         {"name": "$modified_datetime", "dtype": "native"},
+        {"name": "$media_frame", "dtype": "media_frame"},
     ],
     StateType: [
         {"name": "$id", "dtype": "native"},
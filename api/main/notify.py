@@ -1,6 +1,10 @@
 from django.conf import settings
 
+from concurrent.futures import ThreadPoolExecutor
 import logging
+import os
+import threading
+import time
 import slack
 
 logger = logging.getLogger(__name__)
@@ -11,7 +15,14 @@ TODO: Handle other forms of notify in here too (e.g. SMTP)
 """
 
 
+NOTIFY_DEDUP_SECONDS = int(os.getenv("TATOR_NOTIFY_DEDUP_SECONDS", 300))
+
+
 class Notify:
+    _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="notify")
+    _lock = threading.Lock()
+    _last_sent = {}
+
     @staticmethod
     def notification_enabled():
         """Returns true if notification is enabled"""
@@ -30,6 +41,30 @@ class Notify:
 
         return False
 
+    @classmethod
+    def notify_admin_msg_async(cls, msg, dedup_key=None):
+        """Sends a message to administrators from a background thread. Messages with the same
+        `dedup_key` (defaults to the message) are sent at most once every
+        `TATOR_NOTIFY_DEDUP_SECONDS`. Returns True if the message was queued."""
+        if not cls.notification_enabled():
+            return False
+        if dedup_key is None:
+            dedup_key = msg
+        now = time.monotonic()
+        with cls._lock:
+            last_sent = cls._last_sent.get(dedup_key)
+            if last_sent is not None and now - last_sent < NOTIFY_DEDUP_SECONDS:
+                return False
+            if len(cls._last_sent) > 10000:
+                cls._last_sent = {
+                    key: sent
+                    for key, sent in cls._last_sent.items()
+                    if now - sent < NOTIFY_DEDUP_SECONDS
+                }
+            cls._last_sent[dedup_key] = now
+        cls._executor.submit(cls.notify_admin_msg, msg)
+        return True
+
     @classmethod
     def notify_admin_file(cls, title, content):
         """Send a given file to administrators"""
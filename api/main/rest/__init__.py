@@ -49,6 +49,7 @@ from .localization import LocalizationListAPI
 from .localization import LocalizationDetailAPI
 from .localization import LocalizationDetailByElementalIdAPI
 from .localization_count import LocalizationCountAPI
+from .localization_neighbors import LocalizationNeighborsAPI
 from .localization_type import LocalizationTypeListAPI
 from .localization_type import LocalizationTypeDetailAPI
 from .localization_graphic import LocalizationGraphicAPI
@@ -78,6 +79,7 @@ from .state import StateListAPI
 from .state import StateDetailAPI
 from .state import StateDetailByElementalIdAPI
 from .state_count import StateCountAPI
+from .state_neighbors import StateNeighborsAPI
 from .state import MergeStatesAPI
 from .state import TrimStateEndAPI
 from .state_graphic import StateGraphicAPI
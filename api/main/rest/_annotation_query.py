@@ -7,9 +7,8 @@ import base64
 import uuid
 
 from django.db.models import Subquery
-from django.db.models.functions import Coalesce, Cast
+from django.db.models.functions import Coalesce
 from django.db.models import Q, F
-from django.db.models import BigIntegerField, ExpressionWrapper
 
 from ..models import Localization, LocalizationType, Media, MediaType, Section, State, StateType
 
@@ -17,7 +16,10 @@ from ..schema._attributes import related_keys
 
 from ._media_query import _related_search
 
+from ._cursor import paginate
 from ._attribute_query import (
+    MediaFieldExpression,
+    _coincident_exists,
     get_attribute_filter_ops,
     get_attribute_psql_queryset,
     get_attribute_psql_queryset_from_query_obj,
@@ -63,8 +65,6 @@ def _get_annotation_psql_queryset(project, filter_ops, params, annotation_type):
     frame = params.get("frame")
     after = params.get("after")
     apply_merge = params.get("merge")
-    start = params.get("start")
-    stop = params.get("stop")
     elemental_id = params.get("elemental_id")
 
     qs = ANNOTATION_LOOKUP[annotation_type].objects.filter(project=project, deleted=False)
@@ -97,25 +97,10 @@ def _get_annotation_psql_queryset(project, filter_ops, params, annotation_type):
         qs = qs.filter(pk__in=set(state_ids))
 
     if frame_state_ids and (annotation_type == "localization"):
-        # Combine media and frame from states then find localizations that match
-        expression = ExpressionWrapper(
-            Cast("media", output_field=BigIntegerField()).bitleftshift(32).bitor(F("frame")),
-            output_field=BigIntegerField(),
-        )
-        media_frames = (
-            State.objects.filter(
-                pk__in=set(frame_state_ids),
-                media__isnull=False,
-                frame__isnull=False,
-                variant_deleted=False,
-            )
-            .values_list(expression, flat=True)
-            .distinct()
-        )
-        qs = (
-            qs.filter(media__isnull=False, frame__isnull=False)
-            .alias(media_frame=expression)
-            .filter(media_frame__in=media_frames)
+        # Find localizations on the media and frame of any of the states
+        states = State.objects.filter(pk__in=set(frame_state_ids), variant_deleted=False)
+        qs = qs.alias(media_frame=MediaFieldExpression.get_wrapper()).filter(
+            _coincident_exists(states)
         )
 
     if elemental_ids:
@@ -276,12 +261,7 @@ def _get_annotation_psql_queryset(project, filter_ops, params, annotation_type):
     if params.get("show_all_marks", 0) == 0:
         qs = qs.filter(mark=F("latest_mark"))
 
-    if (start is not None) and (stop is not None):
-        qs = qs[start:stop]
-    elif start is not None:
-        qs = qs[start:]
-    elif stop is not None:
-        qs = qs[:stop]
+    qs = paginate(qs, params)
 
     return qs
 
@@ -1,6 +1,7 @@
 """ TODO: add documentation for this """
 
 import logging
+import random
 
 from dateutil.parser import parse as dateutil_parse
 import pytz
@@ -9,6 +10,8 @@ import uuid
 
 from django.db.models.functions import Cast, Greatest
 from django.db.models import (
+    Exists,
+    FilteredRelation,
     Func,
     F,
     Q,
@@ -36,6 +39,7 @@ from django.contrib.gis.measure import Distance
 from django.http import Http404
 from pgvector.django import L2Distance, MaxInnerProduct, CosineDistance, VectorField
 
+from ..cache import ATTRIBUTE_USAGE_SAMPLE_RATE, TatorCache
 from ..models import (
     File,
     FileType,
@@ -83,6 +87,40 @@ class MediaFieldExpression:
         )
 
 
+def _sample_attribute_usage(entity_types, names):
+    """Records a sample of the user-defined attributes filtered on for each entity type.
+
+    Counts are read by the index advisor to decide which attributes deserve an index.
+    """
+    if random.random() >= ATTRIBUTE_USAGE_SAMPLE_RATE:
+        return
+    fields = [
+        f"{type(entity_type).__name__.lower()}:{entity_type.pk}:{name}"
+        for entity_type in entity_types
+        for name in names
+        if not name.startswith("$")
+        and any(attr["name"] == name for attr in entity_type.attribute_types)
+    ]
+    if fields:
+        try:
+            TatorCache().record_attribute_usage(fields)
+        except Exception:
+            logger.warning("Failed to record attribute usage!", exc_info=True)
+
+
+def _coincident_exists(qs):
+    """Returns a semi-join matching objects on the same media and frame as any object in `qs`.
+
+    Requires the outer queryset to alias `media_frame`. Unlike `IN (subquery)`, a correlated
+    EXISTS lets the planner probe the media/frame expression index of localizations.
+    """
+    return Exists(
+        qs.alias(coincident_media_frame=MediaFieldExpression.get_wrapper()).filter(
+            coincident_media_frame=OuterRef("media_frame")
+        )
+    )
+
+
 def _sanitize(name):
     return re.sub(r"[^a-zA-Z]", "_", name)
 
@@ -259,6 +297,7 @@ def get_attribute_filter_ops(params, data_type):
             key, value, _ = _convert_attribute_filter_value(kv, data_type, op)
             if key:
                 filter_ops.append((key, value, op))
+    _sample_attribute_usage([data_type], {key for key, _, _ in filter_ops})
     return filter_ops
 
 
@@ -339,11 +378,7 @@ def build_query_recursively(query_object, castLookup, is_media, project, all_cas
             proj_states = State.objects.filter(project=project)
             proj_states = get_attribute_psql_queryset_from_query_obj(proj_states, value)
 
-            # Have to annotate to get it accessible to query object
-            proj_states = proj_states.annotate(
-                **{f"media_frame": MediaFieldExpression.get_wrapper()}
-            )
-            query = Q(media_frame__in=proj_states.values("media_frame"))
+            query = Q(_coincident_exists(proj_states))
 
             all_casts.add("$coincident")
         elif attr_name == "$coincident_localizations":
@@ -356,11 +391,7 @@ def build_query_recursively(query_object, castLookup, is_media, project, all_cas
             proj_locals = Localization.objects.filter(project=project)
             proj_locals = get_attribute_psql_queryset_from_query_obj(proj_locals, value)
 
-            # Have to annotate to get it accessible to query object
-            proj_locals = proj_locals.annotate(
-                **{f"media_frame": MediaFieldExpression.get_wrapper()}
-            )
-            query = Q(media_frame__in=proj_locals.values("media_frame"))
+            query = Q(_coincident_exists(proj_locals))
 
             all_casts.add("$coincident")
         elif attr_name == "$track_membership":
@@ -536,6 +567,8 @@ def get_attribute_psql_queryset_from_query_obj(qs, query_object):
         query_object, attributeCast, is_media, qs[0].project, set()
     )
 
+    _sample_attribute_usage(typeObjects, required_annotations)
+
     logger.info(f"Q_Object = {q_object} Model = {qs.model}")
     logger.info(f"Query requires the following annotations: {required_annotations}")
     for annotation in required_annotations:
@@ -666,10 +699,31 @@ def get_attribute_psql_queryset(entity_type, qs, params, filter_ops):
         if field_type:
             found_queryset = True
             qs = qs.filter(type=params["type"])
-            qs = qs.annotate(**{f"{name}_char": Cast(f"attributes__{name}", CharField())})
-            qs = qs.annotate(
-                **{f"{name}_typed": Cast(f"{name}_char", VectorField(dimensions=size))}
-            )
+            if hasattr(qs.model, "vectors"):
+                # Read typed vectors from the side table so the HNSW index of this attribute
+                # can be used instead of casting the JSON value of every row.
+                relation = f"{_sanitize(name)}_vector"
+                qs = qs.alias(
+                    **{
+                        relation: FilteredRelation(
+                            "vectors",
+                            condition=Q(vectors__type=params["type"], vectors__name=name),
+                        )
+                    }
+                )
+                qs = qs.filter(**{f"{relation}__isnull": False})
+                qs = qs.annotate(
+                    **{
+                        f"{name}_typed": Cast(
+                            f"{relation}__embedding", VectorField(dimensions=size)
+                        )
+                    }
+                )
+            else:
+                qs = qs.annotate(**{f"{name}_char": Cast(f"attributes__{name}", CharField())})
+                qs = qs.annotate(
+                    **{f"{name}_typed": Cast(f"{name}_char", VectorField(dimensions=size))}
+                )
             if metric == "l2norm":
                 qs = qs.annotate(**{f"{name}_distance": L2Distance(f"{name}_typed", center)})
             elif metric == "cosine":
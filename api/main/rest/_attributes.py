@@ -1,7 +1,13 @@
 """ TODO: add documentation for this """
 
-from typing import List
+from collections import OrderedDict
+import datetime
+import hashlib
+import json
 import logging
+import os
+import threading
+from typing import List
 
 from django.db.models.expressions import Func
 from django.db.models import Case, When, F
@@ -15,6 +21,8 @@ logger = logging.getLogger(__name__)
 # Separator for key value pairs in attribute queries
 KV_SEPARATOR = "::"
 
+ATTRIBUTE_VALIDATOR_CACHE_SIZE = int(os.getenv("TATOR_ATTRIBUTE_VALIDATOR_CACHE_SIZE", 1024))
+
 
 class ReplaceValue(Func):  # pylint: disable=abstract-method
     """
@@ -84,6 +92,33 @@ class DeleteKey(Func):  # pylint: disable=abstract-method
         )
 
 
+class RenameKeys(Func):  # pylint: disable=abstract-method
+    """
+    Renames every attribute field named by a key of `renames` to the corresponding value without
+    modifying its value, in a single expression. Keys that are not present are not created. See
+    https://www.postgresql.org/docs/current/functions-json.html for documentation on the
+    operators used.
+    """
+
+    arity = 1
+
+    def __init__(self, expression: str, renames: dict, **extra):
+        keys = {}
+        removed = "(%(expressions)s"
+        added = []
+        for idx, (old_key, new_key) in enumerate(renames.items()):
+            keys[f"old{idx}"] = old_key
+            keys[f"new{idx}"] = new_key
+            removed += f" - '%(old{idx})s'"
+            added.append(
+                f"CASE WHEN %(expressions)s ? '%(old{idx})s' "
+                f"THEN jsonb_build_object('%(new{idx})s', %(expressions)s -> '%(old{idx})s') "
+                f"ELSE '{{}}'::jsonb END"
+            )
+        template = " || ".join([removed + ")"] + added)
+        super().__init__(expression, template=template, **keys, **extra)
+
+
 def convert_attribute(attr_type, attr_val):  # pylint: disable=too-many-branches
     """Attempts to convert an attribute to its expected datatype. Raises an
     exception if conversion fails.
@@ -213,28 +248,219 @@ def convert_attribute(attr_type, attr_val):  # pylint: disable=too-many-branches
     return val
 
 
+def _parse_datetime(attr_val):
+    """Returns the isoformat of a datetime string, trying the much faster `fromisoformat` before
+    falling back to dateutil for other formats."""
+    if isinstance(attr_val, str):
+        try:
+            return datetime.datetime.fromisoformat(attr_val).isoformat()
+        except ValueError:
+            pass
+    return dateutil_parse(attr_val).isoformat()
+
+
+def _compile_converter(attr_type):  # pylint: disable=too-many-return-statements
+    """Returns a function equivalent to `convert_attribute` for a single attribute type, with
+    limits and choices looked up once.
+    """
+    dtype = attr_type["dtype"]
+    name = attr_type["name"]
+    if dtype == "bool":
+
+        def convert(attr_val):
+            if isinstance(attr_val, bool):
+                return attr_val
+            return convert_attribute(attr_type, attr_val)
+
+        return convert
+    if dtype in ["int", "float"]:
+        cast = int if dtype == "int" else float
+        label = "integer" if dtype == "int" else "float"
+        minimum = attr_type.get("minimum")
+        maximum = attr_type.get("maximum")
+
+        def convert(attr_val):
+            try:
+                val = cast(attr_val)
+            except:
+                raise Exception(  # pylint: disable=raise-missing-from
+                    f"Invalid attribute value {attr_val} for {label} attribute {name}"
+                )
+            if minimum is not None and val < minimum:
+                raise Exception(
+                    f"{attr_val} is below minimum {minimum} for {dtype} attribute {name}!"
+                )
+            if maximum is not None and val > maximum:
+                raise Exception(
+                    f"{attr_val} is above maximum {maximum} for {dtype} attribute {name}!"
+                )
+            return val
+
+        return convert
+    if dtype == "enum":
+        try:
+            choices = frozenset(attr_type["choices"])
+        except TypeError:
+            # Unhashable choices, use the list.
+            return lambda attr_val: convert_attribute(attr_type, attr_val)
+
+        def convert(attr_val):
+            try:
+                if attr_val in choices:
+                    return attr_val
+            except TypeError:
+                pass
+            return convert_attribute(attr_type, attr_val)
+
+        return convert
+    if dtype in ["string", "blob"]:
+        return lambda attr_val: attr_val
+    if dtype == "datetime":
+
+        def convert(attr_val):
+            try:
+                return _parse_datetime(attr_val)
+            except:
+                raise Exception(  # pylint: disable=raise-missing-from
+                    f"Invalid attribute value {attr_val} for datetime attribute {name}"
+                )
+
+        return convert
+    return lambda attr_val: convert_attribute(attr_type, attr_val)
+
+
+class AttributeValidator:
+    """Attribute types of an entity type compiled for validating many objects. Use
+    `get_attribute_validator` to share validators between requests.
+    """
+
+    def __init__(self, attribute_types):
+        self.attr_types = {attr_type["name"]: attr_type for attr_type in attribute_types or []}
+        self._converters = {
+            name: _compile_converter(attr_type) for name, attr_type in self.attr_types.items()
+        }
+
+    def convert(self, attr_name, attr_val):
+        """Converts a single attribute value, see `convert_attribute`."""
+        return self._converters[attr_name](attr_val)
+
+    def check_required(self, bodies):
+        """Validates the attributes of a batch of request bodies one attribute at a time and fills
+        in defaults, with the same rules as `check_required_fields`. Returns a list of attribute
+        dictionaries in the order of `bodies`.
+        """
+        attribute_bodies = [body.get("attributes") or {} for body in bodies]
+        attrs_list = [{} for _ in bodies]
+        now = None
+        for field, attr_type in self.attr_types.items():
+            convert = self._converters[field]
+            converted = {}
+            for attrs, attribute_body in zip(attrs_list, attribute_bodies):
+                if field in attribute_body:
+                    raw = attribute_body[field]
+                    # Values within a column often repeat, so convert each distinct value once.
+                    # Keys include the type because True == 1 but they do not convert alike.
+                    key = (type(raw), raw)
+                    try:
+                        val = converted[key]
+                    except (KeyError, TypeError):
+                        val = convert(raw)
+                        try:
+                            converted[key] = val
+                        except TypeError:
+                            pass
+                    attribute_body[field] = val
+                    attrs[field] = val
+                elif attr_type["dtype"] == "datetime":
+                    if attr_type.get("use_current"):
+                        if now is None:
+                            now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+                        attrs[field] = now
+                    elif attr_type.get("required", True):
+                        raise ValueError(
+                            f'Missing attribute value for "{field}". Set `use_current` to '
+                            f"True or supply a value."
+                        )
+                elif "default" in attr_type:
+                    attrs[field] = attr_type["default"]
+                elif attr_type.get("required", True):
+                    raise ValueError(
+                        f'Missing attribute value for "{field}". Set a `default` on '
+                        f"the attribute type or supply a value."
+                    )
+        return attrs_list
+
+
+class _AttributeValidatorCache:
+    """Per process LRU cache of attribute validators keyed by type and attribute types."""
+
+    def __init__(self, max_entries):
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            validator = self._entries.get(key)
+            if validator is not None:
+                self._entries.move_to_end(key)
+            return validator
+
+    def set(self, key, validator):
+        if self._max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = validator
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_attribute_validator_cache = _AttributeValidatorCache(ATTRIBUTE_VALIDATOR_CACHE_SIZE)
+
+
+def get_attribute_validator(type_obj):
+    """Returns the `AttributeValidator` for an entity type (or any object with `attribute_types`).
+    Validators are cached by type and a hash of its attribute types, so edits to the type take
+    effect immediately.
+    """
+    attribute_types = type_obj.attribute_types or []
+    digest = hashlib.sha1(
+        json.dumps(attribute_types, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    key = (type_obj._meta.label, type_obj.pk, digest)
+    validator = _attribute_validator_cache.get(key)
+    if validator is None:
+        validator = AttributeValidator(attribute_types)
+        _attribute_validator_cache.set(key, validator)
+    return validator
+
+
 def validate_attributes(params, obj, attribute_types=None):
     """Validates attributes by looking up attribute type and attempting
     a type conversion.
     """
     if attribute_types is None:
-        attribute_types = obj.type.attribute_types
+        validator = get_attribute_validator(obj.type)
         obj_type_name = obj.type.name
     else:
+        validator = AttributeValidator(attribute_types)
         obj_type_name = f"Section of {obj.project.name}"
 
     attributes = params.get("attributes", {})
-    attr_types = {a["name"]: a for a in attribute_types}
+    attr_types = validator.attr_types
     if attributes:
         for attr_name in attributes:
             if attr_name == "tator_user_sections":
                 # This is a built-in attribute used for organizing media sections.
                 continue
-            if attr_name in attr_types:
-                attr_type = attr_types[attr_name]
-            else:
+            if attr_name not in attr_types:
                 raise Exception(f"Invalid attribute {attr_name} for entity type {obj_type_name}")
-            attributes[attr_name] = convert_attribute(attr_type, attributes[attr_name])
+            attributes[attr_name] = validator.convert(attr_name, attributes[attr_name])
     for attr in params.get("reset_attributes", []):
         attributes[attr] = attr_types[attr].get("default", None)
     for attr in params.get("null_attributes", []):
@@ -277,45 +503,46 @@ def _process_for_bulk_op(raw_value):
 
 def bulk_patch_attributes(new_attrs, q_s):
     """
-    Updates attribute values.
+    Updates attribute values. All keys are set with a single UPDATE so each row is rewritten once.
     """
+    if not new_attrs:
+        return
+    expression = F("attributes")
     for key, raw_val in new_attrs.items():
-        q_s.update(
-            attributes=ReplaceValue(
-                "attributes",
-                keyname=key.replace("%", "%%"),
-                new_value=_process_for_bulk_op(raw_val),
-                create_missing=True,
-            )
+        expression = ReplaceValue(
+            expression,
+            keyname=key.replace("%", "%%"),
+            new_value=_process_for_bulk_op(raw_val),
+            create_missing=True,
         )
+    q_s.update(attributes=expression)
 
 
 def bulk_rename_attributes(new_attrs, q_s):
     """
-    Updates attribute keys.
+    Updates attribute keys. All keys are renamed with a single UPDATE, and only rows containing
+    at least one of the old keys are rewritten. Renames are applied simultaneously rather than in
+    sequence.
     """
-    for old_key, new_key in new_attrs.items():
-        old = old_key.replace("%", "%%")
-        new = new_key.replace("%", "%%")
-        q_s.update(
-            attributes=Case(
-                When(
-                    attributes__has_key=old,
-                    then=ReplaceKey(
-                        "attributes",
-                        old_key=old,
-                        new_key=new,
-                        create_missing=True,
-                    ),
-                ),
-                default=F("attributes"),
-            )
-        )
+    if not new_attrs:
+        return
+    renames = {
+        old_key.replace("%", "%%").replace("'", "''"): new_key.replace("%", "%%").replace("'", "''")
+        for old_key, new_key in new_attrs.items()
+    }
+    q_s.filter(attributes__has_any_keys=list(new_attrs.keys())).update(
+        attributes=RenameKeys("attributes", renames)
+    )
 
 
 def bulk_delete_attributes(attrs_to_delete: List[str], q_s):
     """
-    Removes attribute keys.
+    Removes attribute keys. All keys are removed with a single UPDATE, and only rows containing at
+    least one of the keys are rewritten.
     """
+    if not attrs_to_delete:
+        return
+    expression = F("attributes")
     for attr in attrs_to_delete:
-        q_s.update(attributes=DeleteKey("attributes", key=attr.replace("%", "%%")))
+        expression = DeleteKey(expression, key=attr.replace("%", "%%"))
+    q_s.filter(attributes__has_any_keys=list(attrs_to_delete)).update(attributes=expression)
@@ -11,6 +11,7 @@ from django.core.exceptions import PermissionDenied
 from rest_framework import status
 from django.core.exceptions import ObjectDoesNotExist
 from django.http import response
+from django.http import HttpResponseBase
 from django.conf import settings
 from django.db.models import F, Value
 
@@ -22,6 +23,7 @@ from ._permissions import *
 from main.models import *
 
 from ._attribute_query import supplied_name_to_field
+from ._cursor import NEXT_CURSOR_HEADER
 
 logger = logging.getLogger(__name__)
 
@@ -105,26 +107,25 @@ class TatorAPIView(APIView):
         if os.getenv("TATOR_FINE_GRAIN_PERMISSION", None) == "true":
             user = self.request.user
             if isinstance(self.request.user, AnonymousUser):
-                anonymous_qs = User.objects.filter(username="anonymous")
-                if anonymous_qs.exists():
-                    user = anonymous_qs[0]
-                else:
+                user = User.objects.filter(username="anonymous").first()
+                if user is None:
                     return qs.none()
+            # Empty querysets, including empty pages, are annotated with a zero permission, so
+            # filtering them is safe.
             qs = augment_permission(user, qs)
-            if qs.exists():
-                qs = qs.annotate(is_viewable=ColBitAnd(F("effective_permission"), required_mask))
-                qs = qs.filter(is_viewable__exact=required_mask)
-                if self.params.get("float_array", None) == None and self.request.method in [
-                    "GET",
-                    "PUT",
-                ]:
-                    if self.params.get("sort_by", None):
-                        sortables = [supplied_name_to_field(x) for x in self.params.get("sort_by")]
-                        qs = qs.order_by(*sortables)
-                    elif qs.model == Media:
-                        qs = qs.order_by("name", "id")
-                    else:
-                        qs = qs.order_by("id")
+            qs = qs.annotate(is_viewable=ColBitAnd(F("effective_permission"), required_mask))
+            qs = qs.filter(is_viewable__exact=required_mask)
+            if self.params.get("float_array", None) == None and self.request.method in [
+                "GET",
+                "PUT",
+            ]:
+                if self.params.get("sort_by", None):
+                    sortables = [supplied_name_to_field(x) for x in self.params.get("sort_by")]
+                    qs = qs.order_by(*sortables)
+                elif qs.model == Media:
+                    qs = qs.order_by("name", "id")
+                else:
+                    qs = qs.order_by("id")
         else:
             qs = qs.annotate(effective_permission=Value(0))
         return qs
@@ -138,7 +139,13 @@ class GetMixin:
         """TODO: add documentation for this"""
         resp = Response({})
         response_data = self._get(self.params)
+        if isinstance(response_data, HttpResponseBase):
+            # Views may return a fully formed (e.g. streaming) response.
+            return response_data
         resp = Response(response_data, status=status.HTTP_200_OK)
+        cursor = getattr(self, "next_page_cursor", None)
+        if cursor:
+            resp[NEXT_CURSOR_HEADER] = cursor
         return resp
 
 
@@ -179,6 +186,8 @@ class DeleteMixin:
 class PutMixin:
     def put(self, request, format=None, **kwargs):
         response_data = self._put(self.params)
+        if isinstance(response_data, HttpResponseBase):
+            return response_data
         resp = Response(response_data, status=status.HTTP_200_OK)
         return resp
 
@@ -0,0 +1,181 @@
+""" Keyset (cursor) pagination of list querysets. """
+
+import base64
+import binascii
+import json
+import logging
+
+from django.db.models import BooleanField, ExpressionWrapper, F, Q
+
+from ..encoders import TatorJSONEncoder
+
+logger = logging.getLogger(__name__)
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Sort key value of an attribute that is set to null, as opposed to a missing attribute (None).
+# PostgreSQL sorts JSON null before any other JSON value but a missing key as SQL NULL.
+JSON_NULL = object()
+
+
+def keyset_filter(order_by, values, reverse=False):
+    """Builds a filter selecting rows that come after the row with the given sort key values
+    when ordered by `order_by`. PostgreSQL sorts nulls as larger than any other value and JSON
+    nulls as smaller than any other JSON value, so both are handled explicitly.
+    """
+    query = Q(pk__in=[])
+    equal = Q()
+    for field in order_by:
+        desc = field.startswith("-")
+        name = field.lstrip("-")
+        value = values[name]
+        if desc == reverse:
+            # Ascending in traversal order, nulls last.
+            if value is None:
+                after = Q(pk__in=[])
+            elif value is JSON_NULL:
+                after = ~Q(**{name: None}) | Q(**{f"{name}__isnull": True})
+            else:
+                after = Q(**{f"{name}__gt": value}) | Q(**{f"{name}__isnull": True})
+        else:
+            # Descending in traversal order, nulls first.
+            if value is None:
+                after = Q(**{f"{name}__isnull": False})
+            elif value is JSON_NULL:
+                after = Q(pk__in=[])
+            else:
+                after = Q(**{f"{name}__lt": value})
+        query |= equal & after
+        if value is None:
+            equal &= Q(**{f"{name}__isnull": True})
+        elif value is JSON_NULL:
+            equal &= Q(**{name: None})
+        else:
+            equal &= Q(**{name: value})
+    return query
+
+
+def keyset_order(qs):
+    """Returns the order_by fields of `qs` with id appended as a tie breaker, so the ordering
+    is total. Raises ValueError if `qs` is unordered or ordered by an expression.
+    """
+    if not supports_keyset(qs):
+        raise ValueError("Keyset pagination requires a field ordering!")
+    order_by = list(qs.query.order_by)
+    if not any(field.lstrip("-") in ["id", "pk"] for field in order_by):
+        order_by.append("id")
+    return order_by
+
+
+def supports_keyset(qs):
+    """Returns True if `qs` is ordered by fields only. Orderings by expressions, such as
+    distance to a float array, cannot be resumed with a keyset filter.
+    """
+    order_by = qs.query.order_by
+    return bool(order_by) and all(isinstance(field, str) for field in order_by)
+
+
+def sort_key_values(qs, pk, order_by):
+    """Returns a dict of the values of the `order_by` fields of the row in `qs` with primary
+    key `pk`, or None if there is no such row. Attributes set to null are returned as
+    `JSON_NULL` and missing attributes as None.
+    """
+    # Use generated aliases as attribute names may not be valid column aliases.
+    names = [field.lstrip("-") for field in order_by]
+    keys = {f"key{idx}": F(name) for idx, name in enumerate(names)}
+    for idx, name in enumerate(names):
+        if name.startswith("attributes__"):
+            keys[f"has{idx}"] = ExpressionWrapper(
+                Q(**{f"{name}__isnull": False}), output_field=BooleanField()
+            )
+    current = qs.filter(pk=pk).values(**keys).first()
+    if current is None:
+        return None
+    values = {}
+    for idx, name in enumerate(names):
+        value = current[f"key{idx}"]
+        if value is None and current.get(f"has{idx}"):
+            value = JSON_NULL
+        values[name] = value
+    return values
+
+
+def encode_cursor(order_by, values):
+    """Returns an opaque token for resuming a listing after the row with the given sort key
+    values.
+    """
+    names = [field.lstrip("-") for field in order_by]
+    payload = json.dumps(
+        {
+            "order_by": order_by,
+            "values": [None if values[name] is JSON_NULL else values[name] for name in names],
+            "json_nulls": [idx for idx, name in enumerate(names) if values[name] is JSON_NULL],
+        },
+        cls=TatorJSONEncoder,
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Returns the order_by fields and sort key values encoded in a cursor token."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        order_by = payload["order_by"]
+        names = [field.lstrip("-") for field in order_by]
+        values = dict(zip(names, payload["values"]))
+        for idx in payload.get("json_nulls", []):
+            values[names[idx]] = JSON_NULL
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError, IndexError) as exc:
+        raise ValueError("Invalid pagination cursor!") from exc
+    if len(values) != len(order_by):
+        raise ValueError("Invalid pagination cursor!")
+    return order_by, values
+
+
+def paginate(qs, params):
+    """Applies the `cursor`, `start` and `stop` parameters to an ordered queryset.
+
+    With a cursor, results begin immediately after the row the cursor was created from and
+    `start` is ignored, so `stop` is the page size. Unlike `start`, which becomes an OFFSET,
+    the cursor is applied as a keyset filter so every page costs the same as the first.
+    """
+    start = params.get("start")
+    stop = params.get("stop")
+    cursor = params.get("cursor")
+    if cursor:
+        if not supports_keyset(qs):
+            raise ValueError("Pagination cursors require an explicit field ordering!")
+        order_by = keyset_order(qs)
+        cursor_order_by, values = decode_cursor(cursor)
+        if cursor_order_by != order_by:
+            raise ValueError("Pagination cursor does not match the requested sort order!")
+        qs = qs.filter(keyset_filter(order_by, values)).order_by(*order_by)
+        start = None
+
+    if (start is not None) and (stop is not None):
+        qs = qs[start:stop]
+    elif start is not None:
+        qs = qs[start:]
+    elif stop is not None:
+        qs = qs[:stop]
+    return qs
+
+
+def next_cursor(qs, params, response_data):
+    """Returns the cursor for the page following `response_data`, or None if this is the last
+    page. `qs` is the (sliced) queryset the page was read from.
+    """
+    stop = params.get("stop")
+    if stop is None or not response_data or not supports_keyset(qs):
+        return None
+    page_size = stop
+    if not params.get("cursor"):
+        page_size -= params.get("start") or 0
+    if len(response_data) < page_size:
+        return None
+    order_by = keyset_order(qs)
+    values = sort_key_values(qs.model.objects, response_data[-1]["id"], order_by)
+    if values is None:
+        return None
+    return encode_cursor(order_by, values)
@@ -10,6 +10,7 @@ from django.db.models import Q
 
 from ..models import File, FileType
 
+from ._cursor import paginate
 from ._attribute_query import (
     get_attribute_filter_ops,
     get_attribute_psql_queryset,
@@ -27,8 +28,6 @@ def _get_file_psql_queryset(project, filter_ops, params):
     file_id_put = params.get("ids", None)  # PUT request only
     filter_type = params.get("type")
     name = params.get("name")
-    start = params.get("start")
-    stop = params.get("stop")
     elemental_id = params.get("elemental_id", None)
 
     qs = File.objects.filter(project=project, deleted=False)
@@ -87,12 +86,7 @@ def _get_file_psql_queryset(project, filter_ops, params):
     else:
         qs = qs.order_by("id")
 
-    if start is not None and stop is not None:
-        qs = qs[start:stop]
-    elif start is not None:
-        qs = qs[start:]
-    elif stop is not None:
-        qs = qs[:stop]
+    qs = paginate(qs, params)
 
     return qs
 
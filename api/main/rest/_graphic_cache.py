@@ -0,0 +1,180 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+
+from ..store import get_tator_store
+
+logger = logging.getLogger(__name__)
+
+GRAPHIC_CACHE_DIR = os.getenv("TATOR_GRAPHIC_CACHE_DIR")
+GRAPHIC_CACHE_MAX_BYTES = int(os.getenv("TATOR_GRAPHIC_CACHE_MAX_BYTES", 1024**3))
+GRAPHIC_CACHE_OBJECT_STORE = os.getenv("TATOR_GRAPHIC_CACHE_OBJECT_STORE", "").lower() == "true"
+GRAPHIC_CACHE_PREFIX = "_graphic_cache"
+# Hit rates are logged after this many lookups.
+GRAPHIC_CACHE_LOG_INTERVAL = 1000
+# Prefix of files being written, which are not cache entries yet.
+TEMP_PREFIX = ".tmp_"
+
+
+def graphic_cache_key(media, **components):
+    """Returns a content address for a rendered graphic of `media`. The media's modification
+    time is always part of the key, so edits to the media invalidate cached graphics.
+    """
+    components["media"] = media.pk
+    components["media_modified"] = media.modified_datetime.isoformat()
+    encoded = json.dumps(components, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class GraphicCache:
+    """Two tier cache of rendered frames and graphics.
+
+    The first tier is a size bounded LRU cache on local disk, enabled by setting
+    `TATOR_GRAPHIC_CACHE_DIR`. Recency is tracked with file modification times so the cache is
+    shared by all server processes on a host. The optional second tier stores graphics in the
+    default object store under `_graphic_cache/`; expiration of that tier is left to the bucket
+    lifecycle policy.
+    """
+
+    _lock = threading.Lock()
+    _size = None
+    _unsynced = 0
+    stats = {"local_hits": 0, "store_hits": 0, "misses": 0, "evictions": 0}
+
+    @classmethod
+    def enabled(cls):
+        return bool(GRAPHIC_CACHE_DIR) or GRAPHIC_CACHE_OBJECT_STORE
+
+    @classmethod
+    def _path(cls, key):
+        return os.path.join(GRAPHIC_CACHE_DIR, key[:2], key)
+
+    @classmethod
+    def _count(cls, stat):
+        with cls._lock:
+            cls.stats[stat] += 1
+            lookups = cls.stats["local_hits"] + cls.stats["store_hits"] + cls.stats["misses"]
+        if stat != "evictions" and lookups % GRAPHIC_CACHE_LOG_INTERVAL == 0:
+            logger.info(f"Graphic cache stats for process {os.getpid()}: {cls.get_stats()}")
+
+    @classmethod
+    def get_stats(cls):
+        """Returns hit/miss counters and the hit rate for this process."""
+        with cls._lock:
+            stats = dict(cls.stats)
+        total = stats["local_hits"] + stats["store_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["local_hits"] + stats["store_hits"]) / total if total else 0.0
+        return stats
+
+    @classmethod
+    def get(cls, key):
+        """Returns the cached graphic for `key`, or None."""
+        if GRAPHIC_CACHE_DIR:
+            path = cls._path(key)
+            try:
+                with open(path, "rb") as data_file:
+                    data = data_file.read()
+            except FileNotFoundError:
+                data = None
+            except OSError:
+                logger.warning("Failed to read graphic from local cache!", exc_info=True)
+                data = None
+            if data is not None:
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+                cls._count("local_hits")
+                return data
+        if GRAPHIC_CACHE_OBJECT_STORE:
+            try:
+                data = get_tator_store().get_object(f"{GRAPHIC_CACHE_PREFIX}/{key}")
+            except Exception:  # pylint: disable=broad-except
+                data = None
+            if data:
+                cls._count("store_hits")
+                cls._set_local(key, data)
+                return data
+        cls._count("misses")
+        return None
+
+    @classmethod
+    def set(cls, key, data):
+        """Stores a rendered graphic in all enabled tiers."""
+        if data is None:
+            return
+        cls._set_local(key, data)
+        if GRAPHIC_CACHE_OBJECT_STORE:
+            try:
+                get_tator_store().put_string(f"{GRAPHIC_CACHE_PREFIX}/{key}", data)
+            except Exception:  # pylint: disable=broad-except
+                logger.warning("Failed to store graphic in object store cache!", exc_info=True)
+
+    @classmethod
+    def _set_local(cls, key, data):
+        if not GRAPHIC_CACHE_DIR or len(data) > GRAPHIC_CACHE_MAX_BYTES:
+            return
+        path = cls._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write atomically so concurrent readers never see a partial file.
+            with tempfile.NamedTemporaryFile(
+                dir=os.path.dirname(path), prefix=TEMP_PREFIX, delete=False
+            ) as temp_file:
+                temp_file.write(data)
+            os.replace(temp_file.name, path)
+        except OSError:
+            logger.warning("Failed to store graphic in local cache!", exc_info=True)
+            return
+        with cls._lock:
+            # The directory is shared by all processes on the host, so the local estimate is
+            # resynced from disk whenever it nears the limit or after a tenth of the limit has
+            # been written by this process.
+            cls._unsynced += len(data)
+            if cls._size is None or cls._unsynced > GRAPHIC_CACHE_MAX_BYTES // 10:
+                cls._size = cls._disk_usage()
+                cls._unsynced = 0
+            else:
+                cls._size += len(data)
+            if cls._size > GRAPHIC_CACHE_MAX_BYTES:
+                cls._evict()
+
+    @classmethod
+    def _entries(cls):
+        """Yields the modification time, size and path of every cache entry on disk."""
+        for root, _, files in os.walk(GRAPHIC_CACHE_DIR):
+            for name in files:
+                if name.startswith(TEMP_PREFIX):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+    @classmethod
+    def _disk_usage(cls):
+        return sum(entry[1] for entry in cls._entries())
+
+    @classmethod
+    def _evict(cls):
+        """Removes least recently used entries until the cache is at 90% of its maximum size.
+        Must be called with the lock held."""
+        entries = sorted(cls._entries())
+        size = sum(entry[1] for entry in entries)
+        target = int(GRAPHIC_CACHE_MAX_BYTES * 0.9)
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+            try:
+                os.remove(path)
+                cls.stats["evictions"] += 1
+            except OSError:
+                pass
+            size -= entry_size
+        cls._size = size
+        cls._unsynced = 0
@@ -10,6 +10,7 @@ from django.db.models import Q
 
 from ..models import Leaf, LeafType
 
+from ._cursor import paginate
 from ._attribute_query import (
     get_attribute_filter_ops,
     get_attribute_psql_queryset,
@@ -27,8 +28,6 @@ def _get_leaf_psql_queryset(project, filter_ops, params):
     project = params["project"]
     filter_type = params.get("type")
     name = params.get("name")
-    start = params.get("start")
-    stop = params.get("stop")
     depth = params.get("depth")
 
     qs = Leaf.objects.filter(project=project, deleted=False)
@@ -87,12 +86,7 @@ def _get_leaf_psql_queryset(project, filter_ops, params):
     else:
         qs = qs.order_by("id")
 
-    if start is not None and stop is not None:
-        qs = qs[start:stop]
-    elif start is not None:
-        qs = qs[start:]
-    elif stop is not None:
-        qs = qs[:stop]
+    qs = paginate(qs, params)
 
     return qs
 
@@ -15,6 +15,7 @@ from django.db.models import UUIDField, TextField, F
 from ..models import LocalizationType, Media, MediaType, Localization, Section, State, StateType
 
 from ..schema._attributes import related_keys
+from ._cursor import keyset_filter, keyset_order, paginate, sort_key_values, supports_keyset
 from ._attribute_query import (
     _related_search,
     get_attribute_filter_ops,
@@ -56,8 +57,6 @@ def _get_media_psql_queryset(project, filter_ops, params):
     uid = params.get("uid")
     after = params.get("after")
     after_name = params.get("after_name")
-    start = params.get("start")
-    stop = params.get("stop")
     section_id = params.get("section")
     multiple_section = params.get("multi_section")
     archive_states = _get_archived_filter(params)
@@ -259,10 +258,7 @@ def _get_media_psql_queryset(project, filter_ops, params):
     else:
         qs = qs.order_by("name", "id")
 
-    if stop is not None:
-        qs = qs[:stop]
-    if start is not None:
-        qs = qs[start:]
+    qs = paginate(qs, params)
 
     return qs
 
@@ -293,6 +289,42 @@ def get_media_count(project, params):
     return qs.count()
 
 
+def get_adjacent_media_id(qs, media_id, reverse=False):
+    """Returns the ID of the media following `media_id` in the ordered queryset `qs`, or the
+    preceding media if `reverse` is set. Returns -1 if there is no such media.
+
+    The neighbor is found with a single keyset query on the sort keys of `qs` (with id as a
+    tie breaker) rather than by walking the queryset.
+    """
+    if qs.query.is_sliced or not supports_keyset(qs):
+        # Sliced querysets cannot be filtered further and orderings by expressions cannot be
+        # resumed with a keyset filter, walk the queryset instead.
+        ids = list(qs.values_list("id", flat=True))
+        if reverse:
+            ids.reverse()
+        try:
+            idx = ids.index(media_id)
+        except ValueError:
+            return -1
+        return ids[idx + 1] if idx + 1 < len(ids) else -1
+
+    order_by = keyset_order(qs)
+    current = sort_key_values(qs, media_id, order_by)
+    if current is None:
+        return -1
+
+    traversal = order_by
+    if reverse:
+        traversal = [field[1:] if field.startswith("-") else f"-{field}" for field in order_by]
+    next_id = (
+        qs.filter(keyset_filter(order_by, current, reverse))
+        .order_by(*traversal)
+        .values_list("id", flat=True)
+        .first()
+    )
+    return -1 if next_id is None else next_id
+
+
 def query_string_to_media_ids(project, url):
     """TODO: add documentation for this"""
     params = dict(urllib_parse.parse_qsl(urllib_parse.urlsplit(url).query))
@@ -1,5 +1,6 @@
 """ TODO: add documentation for this """
 
+import bisect
 import logging
 import os
 import json
@@ -9,15 +10,128 @@ import io
 import textwrap
 import mmap
 import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 from django.conf import settings
 
 from ..store import get_storage_lookup
 from ..models import Resource
+from .. import frame_decoder
 
 logger = logging.getLogger(__name__)
 
+SEGMENT_INDEX_CACHE_SIZE = int(os.getenv("TATOR_SEGMENT_INDEX_CACHE_SIZE", 64))
+RANGE_FETCH_WORKERS = int(os.getenv("TATOR_RANGE_FETCH_WORKERS", 8))
+RANGE_COALESCE_GAP = int(os.getenv("TATOR_RANGE_COALESCE_GAP", 256 * 1024))
+
+_range_fetch_pool = None
+_range_fetch_pool_lock = threading.Lock()
+
+
+def _get_range_fetch_pool():
+    """Returns the thread pool shared by all requests in this process for ranged GETs."""
+    global _range_fetch_pool
+    with _range_fetch_pool_lock:
+        if _range_fetch_pool is None:
+            _range_fetch_pool = ThreadPoolExecutor(
+                max_workers=max(1, RANGE_FETCH_WORKERS), thread_name_prefix="range_fetch"
+            )
+        return _range_fetch_pool
+
+
+class SegmentIndex:
+    """Compact representation of a `segment_info` file.
+
+    Per segment arrays are indexed by segment index, per moof arrays are ordered by frame and
+    hold the segment index of each moof box in `moof_idx`.
+    """
+
+    def __init__(self, segment_info):
+        segments = segment_info["segments"]
+        self.offset = np.array([seg["offset"] for seg in segments], dtype=np.int64)
+        self.size = np.array([seg["size"] for seg in segments], dtype=np.int64)
+        self.has_frames = np.array(["frame_samples" in seg for seg in segments], dtype=bool)
+        self.frame_start = np.array(
+            [seg.get("frame_start", sys.maxsize) for seg in segments], dtype=np.int64
+        )
+        self.frame_samples = np.array([seg.get("frame_samples", 0) for seg in segments], np.int64)
+        self.moof_idx = np.array(
+            [idx for idx, seg in enumerate(segments) if seg["name"] == "moof"], dtype=np.int64
+        )
+        self.moof_frame_start = self.frame_start[self.moof_idx]
+        self.moof_frame_end = self.moof_frame_start + self.frame_samples[self.moof_idx]
+
+    def find_moofs(self, frames):
+        """Returns the position in `moof_idx` of the moof containing each frame, or -1 if no
+        moof contains it."""
+        frames = np.asarray(frames, dtype=np.int64)
+        pos = np.searchsorted(self.moof_frame_start, frames, side="right") - 1
+        clipped = np.clip(pos, 0, None)
+        found = (pos >= 0) & (frames < self.moof_frame_end[clipped])
+        return np.where(found, pos, -1)
+
+
+class _SegmentIndexCache:
+    """Per process LRU cache of parsed segment indexes keyed by path and object version."""
+
+    def __init__(self, max_entries):
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            index = self._entries.get(key)
+            if index is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return index
+
+    def set(self, key, index):
+        if self._max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = index
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+_segment_index_cache = _SegmentIndexCache(SEGMENT_INDEX_CACHE_SIZE)
+
+
+def _load_segment_index(storage, segment_file):
+    """Returns the `SegmentIndex` of a segment file, downloading and parsing it only if the
+    cached copy is missing or stale."""
+    head = storage.head_object(segment_file, quiet=True)
+    version = head.get("ETag") or head.get("LastModified")
+    key = None
+    if version is not None:
+        key = (storage.bucket_name, segment_file, str(version))
+        index = _segment_index_cache.get(key)
+        if index is not None:
+            return index
+    f_p = io.BytesIO()
+    storage.download_fileobj(segment_file, f_p)
+    index = SegmentIndex(json.loads(f_p.getvalue().decode("utf-8")))
+    if key is not None:
+        _segment_index_cache.set(key, index)
+    return index
+
 
 class MediaUtil:
     """TODO: add documentation for this"""
@@ -26,7 +140,7 @@ class MediaUtil:
         self._temp_dir = temp_dir
         # If available we only attempt to fetch
         # the part of the file we need to
-        self._segment_info = None
+        self._segment_index = None
         resources = Resource.objects.filter(media__in=[video])
         store_lookup = get_storage_lookup(resources)
 
@@ -57,17 +171,8 @@ class MediaUtil:
                 self._height = video.media_files["streaming"][quality_idx]["resolution"][0]
                 self._width = video.media_files["streaming"][quality_idx]["resolution"][1]
                 segment_file = video.media_files["streaming"][quality_idx]["segment_info"]
-                f_p = io.BytesIO()
-                self._storage.download_fileobj(segment_file, f_p)
-                self._segment_info = json.loads(f_p.getvalue().decode("utf-8"))
-                self._moof_data = [
-                    (i, x)
-                    for i, x in enumerate(self._segment_info["segments"])
-                    if x["name"] == "moof"
-                ]
-                self._start_bias_frame = 0
-                if self._moof_data[0][1]["frame_start"] > 0:
-                    self._start_bias_frame = self._moof_data[0][1]["frame_start"]
+                self._segment_index = _load_segment_index(self._storage, segment_file)
+                self._start_bias_frame = max(0, int(self._segment_index.moof_frame_start[0]))
 
         elif "image" in video.media_files:
             # Select highest quality image that is non AVIF (no ffmpeg support)
@@ -91,56 +196,31 @@ class MediaUtil:
         self._fps = video.fps
 
     def _get_impacted_segments(self, frames):
-        """TODO: add documentation for this"""
-        if self._segment_info is None and self._external_fetch != None:
+        """Returns a list of (frame, segment indices) needed to decode each frame. Frames past
+        the end of the video are omitted."""
+        if self._segment_index is None and self._external_fetch != None:
             return None
 
+        index = self._segment_index
+        frames = [int(frame) for frame in frames]
+        moof_pos = index.find_moofs(frames)
+        first_moof, second_moof = index.moof_idx[0], index.moof_idx[1]
+        last_frame = index.moof_frame_end[-1]
         segment_list = []
-        for frame_str in frames:
-            frame_seg = set()
-            frame_seg.add(0)
-            frame_seg.add(1)
-            # We already load the header so ignore those segments
-            frame = int(frame_str)
-            min_idx = 0
-            max_idx = len(self._moof_data) - 1
-            # Handle frames and files with frame biases
-            if frame < self._moof_data[0][1]["frame_start"]:
-                # Force add the first two segments and all the data in between
-                frame_seg.add(self._moof_data[0][0])
-                for data_idx in range(self._moof_data[0][0] + 1, self._moof_data[1][0], 1):
-                    frame_seg.add(data_idx)
-                frame_seg.add(self._moof_data[1][0])
-                frame_seg = list(frame_seg)
-                frame_seg.sort()
-                segment_list.append((frame, frame_seg))
-                continue
-
-            last_segment = self._moof_data[max_idx][1]  # Frame start/stop is in the moof
-            if frame >= last_segment["frame_start"] + last_segment["frame_samples"]:
+        for frame, pos in zip(frames, moof_pos.tolist()):
+            # We already load the header so always include those segments
+            if frame < index.moof_frame_start[0]:
+                # Handle frames and files with frame biases by including the first two
+                # segments and all the data in between
+                frame_seg = [0, 1, *range(int(first_moof), int(second_moof) + 1)]
+            elif frame >= last_frame:
                 continue
-
-            # Do a binary search for the segment in question
-            while min_idx <= max_idx:
-                guess_idx = math.floor((max_idx + min_idx) / 2)
-                moof = self._moof_data[guess_idx][1]
-                if frame < moof["frame_start"]:
-                    max_idx = max_idx - 1
-                elif frame >= moof["frame_start"] + moof["frame_samples"]:
-                    min_idx = min_idx + 1
-                else:
-                    frame_seg.add(self._moof_data[guess_idx][0])
-                    frame_seg.add(self._moof_data[guess_idx][0] + 1)
-                    if frame - moof["frame_start"] > moof["frame_samples"] - 5:
-                        # Handle boundary conditions
-                        if guess_idx + 1 in self._moof_data:
-                            frame_seg.add(self._moof_data[guess_idx + 1][0])
-                            frame_seg.add(self._moof_data[guess_idx + 1][0] + 1)
-                    break
-
-            frame_seg = list(frame_seg)
-            frame_seg.sort()
-            segment_list.append((frame, frame_seg))
+            elif pos < 0:
+                frame_seg = [0, 1]
+            else:
+                moof_idx = int(index.moof_idx[pos])
+                frame_seg = [0, 1, moof_idx, moof_idx + 1]
+            segment_list.append((frame, sorted(set(frame_seg))))
         logger.info(f"Given {frames}, we need {segment_list}")
         return segment_list
 
@@ -167,52 +247,115 @@ class MediaUtil:
         logger.info(f"Range-based segment list: {segment_list}")
         return segment_list
 
+    def _scatter_gather(self, frame, segments, segment_info):
+        """Returns the byte ranges covering the given segments, merging contiguous ranges, and
+        the first frame contained in them. Appends frame info for each segment to
+        `segment_info`."""
+        sc_graph = [(0, 0)]
+        segment_frame_start = sys.maxsize
+        # create a scatter/gather
+        index = self._segment_index
+        for segment_idx in segments:
+            offset = int(index.offset[segment_idx])
+            size = int(index.size[segment_idx])
+            frame_start = int(index.frame_start[segment_idx])
+            last_io = sc_graph[len(sc_graph) - 1]
+            if frame_start < segment_frame_start:
+                segment_frame_start = frame_start
+
+            if index.has_frames[segment_idx]:
+                segment_info.append(
+                    {
+                        "frame_start": frame_start,
+                        "num_frames": int(index.frame_samples[segment_idx]),
+                    }
+                )
+
+            if last_io[0] + last_io[1] == offset:
+                # merge contigous blocks
+                sc_graph[len(sc_graph) - 1] = (last_io[0], last_io[1] + size)
+            else:
+                # A new block
+                sc_graph.append((offset, size))
+
+        if segment_frame_start == sys.maxsize:
+            segment_frame_start = frame
+        logger.info(f"Scatter gather graph = {sc_graph}")
+        return sc_graph, segment_frame_start
+
+    def _fetch_ranges(self, sc_graphs):
+        """Returns the concatenated bytes of each scatter/gather graph.
+
+        Ranges shared between graphs, such as the header segments, are fetched once. Ranges
+        separated by at most `RANGE_COALESCE_GAP` bytes are merged into a single request and
+        requests are issued concurrently.
+        """
+        ranges = sorted({scatter for sc_graph in sc_graphs for scatter in sc_graph if scatter[1]})
+        blocks = []
+        for offset, size in ranges:
+            if blocks and offset <= blocks[-1][1] + RANGE_COALESCE_GAP:
+                blocks[-1][1] = max(blocks[-1][1], offset + size)
+            else:
+                blocks.append([offset, offset + size])
+        logger.info(f"Fetching {len(ranges)} ranges in {len(blocks)} requests")
+
+        def _get(block):
+            # Byte range is inclusive
+            return self._storage.get_object(self._video_file, start=block[0], stop=block[1] - 1)
+
+        if len(blocks) > 1:
+            bodies = list(_get_range_fetch_pool().map(_get, blocks))
+        else:
+            bodies = [_get(block) for block in blocks]
+        block_starts = [block[0] for block in blocks]
+
+        def _read(offset, size):
+            idx = bisect.bisect_right(block_starts, offset) - 1
+            start = offset - block_starts[idx]
+            return bodies[idx][start : start + size]
+
+        return [
+            b"".join(_read(offset, size) for offset, size in sc_graph if size)
+            for sc_graph in sc_graphs
+        ]
+
     def make_temporary_videos(self, segment_list):
         """Return a temporary mp4 for each impacted segment to limit IO to
         cloud storage"""
-        lookup = {}
-        segment_info = []
-        for frame, segments in segment_list:
+        lookup, segment_info = self.make_video_buffers(segment_list)
+        for frame, (segment_frame_start, data) in lookup.items():
             temp_video = os.path.join(self._temp_dir, f"{frame}.mp4")
-            preferred_block_size = 16 * 1024
-            sc_graph = [(0, 0)]
-            segment_frame_start = sys.maxsize
-            # create a scatter/gather
-            for segment_idx in segments:
-                segment = self._segment_info["segments"][segment_idx]
-                last_io = sc_graph[len(sc_graph) - 1]
-                if segment.get("frame_start", sys.maxsize) < segment_frame_start:
-                    segment_frame_start = segment["frame_start"]
-
-                if "frame_samples" in segment:
-                    segment_info.append(
-                        {
-                            "frame_start": segment["frame_start"],
-                            "num_frames": segment["frame_samples"],
-                        }
-                    )
-
-                if last_io[0] + last_io[1] == segment["offset"]:
-                    # merge contigous blocks
-                    sc_graph[len(sc_graph) - 1] = (last_io[0], last_io[1] + segment["size"])
-                else:
-                    # A new block
-                    sc_graph.append((segment["offset"], segment["size"]))
-
-            if segment_frame_start == sys.maxsize:
-                segment_frame_start = frame
-            lookup[frame] = (segment_frame_start, temp_video)
-
-            logger.info(f"Scatter gather graph = {sc_graph}")
             with open(temp_video, "wb") as out_fp:
-                for scatter in sc_graph:
-                    start = scatter[0]
-                    stop = scatter[0] + scatter[1] - 1  # Byte range is inclusive
-                    body = self._storage.get_object(self._video_file, start=start, stop=stop)
-                    out_fp.write(body)
+                out_fp.write(data)
+            lookup[frame] = (segment_frame_start, temp_video)
+        return lookup, segment_info
 
+    def make_video_buffers(self, segment_list):
+        """Same as `make_temporary_videos`, but returns the bytes of each mp4 instead of
+        writing it to the temporary directory."""
+        segment_info = []
+        frames = []
+        frame_starts = []
+        sc_graphs = []
+        for frame, segments in segment_list:
+            sc_graph, segment_frame_start = self._scatter_gather(frame, segments, segment_info)
+            frames.append(frame)
+            frame_starts.append(segment_frame_start)
+            sc_graphs.append(sc_graph)
+        buffers = self._fetch_ranges(sc_graphs)
+        lookup = {
+            frame: (frame_start, data)
+            for frame, frame_start, data in zip(frames, frame_starts, buffers)
+        }
         return lookup, segment_info
 
+    def _frame_offset(self, frame, relative_to):
+        """Returns the index of a frame relative to the first frame of a temporary video."""
+        frame -= relative_to
+        if frame < 0:
+            frame += self._start_bias_frame
+        return frame
+
     def _frame_to_time_str(self, frame, relative_to=None):
         """TODO: add documentation for this"""
         if relative_to:
@@ -228,6 +371,32 @@ class MediaUtil:
         seconds = total_seconds % 60
         return f"{hours}:{minutes}:{seconds}"
 
+    def _roi_to_pixels(self, roi):
+        """Converts a relative (width, height, x, y) roi into pixels clamped to the media."""
+        w = max(0, min(round(roi[0] * self._width), self._width))  # pylint: disable=invalid-name
+        h = max(0, min(round(roi[1] * self._height), self._height))  # pylint: disable=invalid-name
+        x = max(0, min(round(roi[2] * self._width), self._width))  # pylint: disable=invalid-name
+        y = max(0, min(round(roi[3] * self._height), self._height))  # pylint: disable=invalid-name
+        return (w, h, x, y)
+
+    def _use_frame_decoder(self):
+        """Returns True if frames can be decoded in memory by the frame decoder pool."""
+        return frame_decoder.decoder_enabled() and self._segment_index is not None
+
+    def get_frame_images(self, frames, rois=None, render_format="jpg", force_scale=None):
+        """Decodes each requested frame in memory and returns a list of encoded images"""
+        frames = [int(frame) for frame in frames]
+        lookup, _ = self.make_video_buffers(self._get_impacted_segments(frames))
+        jobs = []
+        for idx, frame in enumerate(frames):
+            if frame not in lookup:
+                raise ValueError(f"Failed to find frame {frame} in segmented mp4!")
+            segment_frame_start, data = lookup[frame]
+            crop = self._roi_to_pixels(rois[idx]) if rois else None
+            offset = self._frame_offset(frame, segment_frame_start)
+            jobs.append((data, offset, crop, force_scale, render_format))
+        return frame_decoder.decode_frames(jobs)
+
     def _generate_frame_images(self, frames, rois=None, render_format="jpg", force_scale=None):
         """Generate a jpg for each requested frame and store in the working directory"""
         BATCH_SIZE = 30
@@ -237,21 +406,7 @@ class MediaUtil:
             batch = [int(frame) for frame in frames[idx : idx + BATCH_SIZE]]
             crop_filter = None
             if rois:
-                crop_filter = []
-                for c in rois:  # pylint: disable=invalid-name
-                    w = max(
-                        0, min(round(c[0] * self._width), self._width)
-                    )  # pylint: disable=invalid-name
-                    h = max(
-                        0, min(round(c[1] * self._height), self._height)
-                    )  # pylint: disable=invalid-name
-                    x = max(
-                        0, min(round(c[2] * self._width), self._width)
-                    )  # pylint: disable=invalid-name
-                    y = max(
-                        0, min(round(c[3] * self._height), self._height)
-                    )  # pylint: disable=invalid-name
-                    crop_filter.append(f"crop={w}:{h}:{x}:{y}")
+                crop_filter = ["crop={}:{}:{}:{}".format(*self._roi_to_pixels(roi)) for roi in rois]
             scale_filter = None
             if force_scale:
                 scale_w = force_scale[0]
@@ -311,23 +466,20 @@ class MediaUtil:
             procs.append(subprocess.run(args, check=True, capture_output=True))
         return any([proc.returncode == 0 for proc in procs])
 
+    def get_image_data(self, roi=None, render_format="jpg", force_scale=None):
+        """Returns the encoded image, decoded in memory when the frame decoder is enabled"""
+        if frame_decoder.decoder_enabled():
+            crop = self._roi_to_pixels(roi) if roi else None
+            data = self._storage.get_object(self._video_file)
+            return frame_decoder.decode_images([(data, crop, force_scale, render_format)])[0]
+        with open(self.get_image(roi, render_format, force_scale), "rb") as data_file:
+            return data_file.read()
+
     def get_image(self, roi=None, render_format="jpg", force_scale=None):
         crop_filter = None
         scale_filter = None
         if roi:
-            w = max(
-                0, min(round(roi[0] * self._width), self._width)
-            )  # pylint: disable=invalid-name
-            h = max(
-                0, min(round(roi[1] * self._height), self._height)
-            )  # pylint: disable=invalid-name
-            x = max(
-                0, min(round(roi[2] * self._width), self._width)
-            )  # pylint: disable=invalid-name
-            y = max(
-                0, min(round(roi[3] * self._height), self._height)
-            )  # pylint: disable=invalid-name
-            crop_filter = f"crop={w}:{h}:{x}:{y}"
+            crop_filter = "crop={}:{}:{}:{}".format(*self._roi_to_pixels(roi))
         if force_scale:
             scale_filter = f"scale={force_scale[0]}:{force_scale[1]}"
 
@@ -475,23 +627,7 @@ class MediaUtil:
         self, frames, rois=None, tile_size=None, render_format="jpg", force_scale=None
     ):
         """Generate a tile jpeg of the given frame/rois"""
-        # Compute tile size if not supplied explicitly
-        try:
-            if tile_size is not None:
-                # check supplied tile size makes sense
-                comps = tile_size.split("x")
-                if len(comps) != 2:
-                    raise Exception("Bad Tile Size")
-                if int(comps[0]) * int(comps[1]) < len(frames):
-                    raise Exception("Bad Tile Size")
-        except:
-            tile_size = None
-            # compute the required tile size
-        if tile_size is None:
-            width = math.ceil(math.sqrt(len(frames)))
-            height = math.ceil(len(frames) / width)
-            tile_size = f"{width}x{height}"
-
+        tile_size = self._compute_tile_size(frames, tile_size)
         if (
             self._generate_frame_images(
                 frames, rois, render_format=render_format, force_scale=force_scale
@@ -522,6 +658,43 @@ class MediaUtil:
 
         return output_file
 
+    def get_tile_image_data(
+        self, frames, rois=None, tile_size=None, render_format="jpg", force_scale=None
+    ):
+        """Returns an encoded tile image of the given frame/rois. When the frame decoder is
+        enabled frames are decoded and tiled in memory, otherwise ffmpeg is used."""
+        if not self._use_frame_decoder():
+            image_fp = self.get_tile_image(frames, rois, tile_size, render_format, force_scale)
+            if image_fp is None:
+                return None
+            with open(image_fp, "rb") as data_file:
+                return data_file.read()
+
+        images = self.get_frame_images(frames, rois, render_format, force_scale)
+        if len(images) == 1:
+            return images[0]
+        tile_size = self._compute_tile_size(frames, tile_size)
+        return frame_decoder.tile_images(images, tile_size, render_format)
+
+    def _compute_tile_size(self, frames, tile_size):
+        """Validates the tile size or computes one if it was not supplied explicitly"""
+        try:
+            if tile_size is not None:
+                # check supplied tile size makes sense
+                comps = tile_size.split("x")
+                if len(comps) != 2:
+                    raise Exception("Bad Tile Size")
+                if int(comps[0]) * int(comps[1]) < len(frames):
+                    raise Exception("Bad Tile Size")
+        except:
+            tile_size = None
+            # compute the required tile size
+        if tile_size is None:
+            width = math.ceil(math.sqrt(len(frames)))
+            height = math.ceil(len(frames) / width)
+            tile_size = f"{width}x{height}"
+        return tile_size
+
     def get_animation(self, frames, roi, fps, render_format, force_scale):
         """TODO: add documentation for this"""
         if (
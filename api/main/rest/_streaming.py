@@ -0,0 +1,89 @@
+import csv
+import io
+import json
+import logging
+import os
+from itertools import islice
+
+from django.http import StreamingHttpResponse
+
+from ..encoders import TatorJSONEncoder
+
+logger = logging.getLogger(__name__)
+
+STREAM_CHUNK_SIZE = int(os.getenv("TATOR_STREAM_CHUNK_SIZE", 2000))
+
+
+def iter_value_chunks(queryset, fields, chunk_size=STREAM_CHUNK_SIZE):
+    """Yields lists of at most `chunk_size` dicts from `queryset.values(*fields)`. The
+    queryset is evaluated with a server-side cursor so only one chunk is held in memory.
+    """
+    rows = queryset.values(*fields).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        yield chunk
+
+
+def _stream_json(chunks):
+    """Yields a JSON array one chunk of elements at a time."""
+    encoder = TatorJSONEncoder()
+    yield "["
+    first = True
+    for chunk in chunks:
+        for element in chunk:
+            if first:
+                first = False
+                yield encoder.encode(element)
+            else:
+                yield "," + encoder.encode(element)
+    yield "]"
+
+
+def _stream_csv(chunks, field_names):
+    """Yields a CSV header followed by rows, one chunk at a time. Fields that are not in
+    `field_names` are ignored, matching the behavior of `CsvRenderer`.
+    """
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=field_names, extrasaction="ignore")
+    writer.writeheader()
+    for chunk in chunks:
+        writer.writerows(chunk)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate(0)
+    remainder = buf.getvalue()
+    if remainder:
+        yield remainder
+
+
+def streaming_response(chunks, renderer_format, csv_field_names=None):
+    """Wraps an iterable of lists of dicts in a `StreamingHttpResponse`.
+
+    :param chunks: Iterable of lists of dicts, as returned by `iter_value_chunks`.
+    :param renderer_format: Format of the accepted renderer. Anything other than `csv` is
+                            streamed as JSON.
+    :param csv_field_names: Column names to use for CSV output.
+    """
+    if renderer_format == "csv":
+        if csv_field_names is None:
+            raise ValueError("Streaming CSV output requires a list of field names!")
+        return StreamingHttpResponse(
+            _stream_csv(chunks, csv_field_names), content_type="text/plain"
+        )
+    return StreamingHttpResponse(_stream_json(chunks), content_type="application/json")
+
+
+def attribute_names(entity_type_model, project, type_id=None):
+    """Returns the ordered, deduplicated list of attribute names defined on the given type
+    (or on all types of this model in the project if no type is given).
+    """
+    qs = entity_type_model.objects.filter(project=project)
+    if type_id is not None:
+        qs = qs.filter(pk=type_id)
+    names = {}
+    for attribute_types in qs.order_by("id").values_list("attribute_types", flat=True):
+        for attribute_type in attribute_types or []:
+            names[attribute_type["name"]] = None
+    return list(names.keys())
@@ -1,12 +1,18 @@
 import datetime
+import io
 from itertools import islice
+import json
 import logging
 from urllib.parse import urlparse
 import uuid
 import os
 import socket
+import time
 
 from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.db.models import JSONField, Model
+from django.utils import timezone
 from django.utils.http import urlencode
 from django.db.models.expressions import Subquery
 from rest_framework.reverse import reverse
@@ -14,12 +20,26 @@ from rest_framework.exceptions import APIException
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.exceptions import NotFound
 
+from ..cache import TatorCache
+from ..encoders import TatorJSONEncoder
+from ..worker import push_job
 from ..models import type_to_obj, ChangeLog, ChangeToObject, Membership, Project, Permission, User
 
-from ._attributes import bulk_patch_attributes, convert_attribute
+from ._attributes import bulk_patch_attributes, convert_attribute, get_attribute_validator
 
 logger = logging.getLogger(__name__)
 
+# Creates with at least this many objects are written with COPY instead of INSERT, 0 to disable.
+COPY_INGEST_THRESHOLD = int(os.getenv("TATOR_COPY_INGEST_THRESHOLD", 5000))
+COPY_BATCH_SIZE = int(os.getenv("TATOR_COPY_BATCH_SIZE", 50000))
+
+# Queue changelogs in redis to be written by the db worker instead of within the request. If the
+# oldest queued changelog is older than the maximum lag, the request writes the queue itself.
+CHANGELOG_ASYNC = os.getenv("TATOR_ASYNC_CHANGELOG", "false").lower() == "true"
+CHANGELOG_MAX_LAG = int(os.getenv("TATOR_CHANGELOG_MAX_LAG", 60))
+
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\n": "\\n", "\r": "\\r", "\t": "\\t"})
+
 
 class Array(Subquery):
     """Class to expose ARRAY SQL function to ORM"""
@@ -47,6 +67,33 @@ def compute_user(project, user, user_elemental_id):
         return user
 
 
+def compute_users(project, user, user_elemental_ids):
+    """Resolves the authors of a batch of new objects with at most two queries. Returns a
+    dictionary mapping each of `user_elemental_ids` to a user, where None maps to `user`.
+    """
+    users = {None: user}
+    user_elemental_ids = set(user_elemental_ids) - {None, ""}
+    if not user_elemental_ids:
+        return users
+    can_change_authorship = Membership.objects.filter(
+        user=user, project=project, permission=Permission.FULL_CONTROL
+    ).exists()
+    if not can_change_authorship:
+        raise PermissionDenied(
+            f"{user} does not have full permission, required for authorship modifications, on {project.pk}"
+        )
+    found = {
+        identified_user.elemental_id: identified_user
+        for identified_user in User.objects.filter(elemental_id__in=user_elemental_ids)
+    }
+    for user_elemental_id in user_elemental_ids:
+        identified_user = found.get(uuid.UUID(str(user_elemental_id)))
+        if identified_user is None:
+            raise NotFound(f"Couldn't find user with {user_elemental_id}")
+        users[user_elemental_id] = identified_user
+    return users
+
+
 def reverse_queryArgs(viewname, kwargs=None, queryargs=None):
     """
     Regular reverse doesn't handle query args
@@ -131,21 +178,28 @@ def check_required_fields(datafields, attr_types, body):
     return attrs
 
 
-def paginate(query_params, queryset):
-    start = query_params.get("start", None)
-    stop = query_params.get("stop", None)
-    qs = queryset
-    if start is None and stop is not None:
-        stop = int(stop)
-        qs = queryset[:stop]
-    elif start is not None and stop is None:
-        start = int(start)
-        qs = queryset[start:]
-    elif start is not None and stop is not None:
-        start = int(start)
-        stop = int(stop)
-        qs = queryset[start:stop]
-    return qs
+def bulk_check_required_fields(type_objs, specs):
+    """Equivalent of calling `check_required_fields` on each of `specs`, validating each
+    attribute for all specs of a type at once with a cached `AttributeValidator`.
+
+    :param type_objs: Dictionary mapping type ids to entity types.
+    :param specs: List of request bodies, each with a `type` key.
+    :returns: List of attribute dictionaries in the order of `specs`.
+    """
+    indices_by_type = {}
+    for idx, spec in enumerate(specs):
+        indices_by_type.setdefault(spec["type"], []).append(idx)
+    attr_specs = [None] * len(specs)
+    for type_id, indices in indices_by_type.items():
+        type_obj = type_objs[type_id]
+        datafields = computeRequiredFields(type_obj)[0]
+        bodies = [specs[idx] for idx in indices]
+        for field in datafields:
+            if any(field not in body for body in bodies):
+                raise Exception(f'Missing required field in request body "{field}".')
+        for idx, attrs in zip(indices, get_attribute_validator(type_obj).check_required(bodies)):
+            attr_specs[idx] = attrs
+    return attr_specs
 
 
 def bulk_create_from_generator(obj_generator, model, batch_size=1000):
@@ -159,6 +213,64 @@ def bulk_create_from_generator(obj_generator, model, batch_size=1000):
     return saved_objects
 
 
+def use_copy_ingest(count):
+    """Returns True if a create of `count` objects should use `bulk_copy_create`."""
+    return COPY_INGEST_THRESHOLD > 0 and count >= COPY_INGEST_THRESHOLD
+
+
+def _copy_value(field, obj):
+    """Returns the value of `field` on `obj` in postgres COPY text format."""
+    if getattr(field, "auto_now_add", False) and field.value_from_object(obj) is not None:
+        # Keep creation times that were set explicitly, such as those of queued changelogs.
+        value = field.value_from_object(obj)
+    else:
+        value = field.pre_save(obj, True)
+    if value is None:
+        return "\\N"
+    if isinstance(field, JSONField):
+        value = json.dumps(value, cls=field.encoder)
+    elif isinstance(value, bool):
+        value = "t" if value else "f"
+    else:
+        value = str(field.get_db_prep_save(value, connection))
+    return value.translate(_COPY_ESCAPES)
+
+
+def bulk_copy_create(obj_generator, model, batch_size=COPY_BATCH_SIZE):
+    """Equivalent of `bulk_create_from_generator` that streams rows with COPY. Primary keys are
+    reserved from the table's sequence up front, so they are assigned in generator order and set
+    on the returned objects. Statement level triggers fire once per batch as they do for INSERT.
+    """
+    opts = model._meta
+    fields = opts.concrete_fields
+    qn = connection.ops.quote_name
+    columns = ", ".join(qn(field.column) for field in fields)
+    copy_sql = f"COPY {qn(opts.db_table)} ({columns}) FROM STDIN"
+    saved_objects = []
+    with connection.cursor() as cursor:
+        while True:
+            batch = list(islice(obj_generator, batch_size))
+            if not batch:
+                break
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)",
+                [opts.db_table, opts.pk.column, len(batch)],
+            )
+            for obj, (pk,) in zip(batch, cursor.fetchall()):
+                obj.pk = pk
+            buf = io.StringIO()
+            for obj in batch:
+                buf.write("\t".join(_copy_value(field, obj) for field in fields))
+                buf.write("\n")
+            buf.seek(0)
+            cursor.copy_expert(copy_sql, buf)
+            for obj in batch:
+                obj._state.adding = False
+                obj._state.db = connection.alias
+            saved_objects += batch
+    return saved_objects
+
+
 def check_resource_prefix(prefix, obj, force_prefix=False):
     """Checks that a prefix corresponding to a resource has the form
     <organization>/<project>/<object>/<name> and that the IDs line
@@ -266,6 +378,12 @@ def bulk_update_and_log_changes(queryset, project, user, update_kwargs=None, new
 
     # Create ChangeLog
     first_obj = type(first_obj).objects.get(pk=first_obj.id)
+    if CHANGELOG_ASYNC:
+        entry = _changelog_entry(
+            project, user, first_obj.change_dict(model_dict), ref_table, updated_ids, time.time()
+        )
+        enqueue_changelogs([entry])
+        return
     cl = ChangeLog(
         project=project,
         user=user,
@@ -278,6 +396,85 @@ def bulk_update_and_log_changes(queryset, project, user, update_kwargs=None, new
     bulk_create_from_generator(objs, ChangeToObject)
 
 
+def bulk_create_variants(queryset, update_kwargs, new_attributes=None, batch_size=COPY_BATCH_SIZE):
+    """
+    Inserts a modified copy of every object in a queryset with `INSERT ... SELECT`, so rows never
+    leave the database. Copies keep the original `created_datetime` and many to many relations.
+    Rows are copied in id order, so the mark triggers number them as they would a `bulk_create`.
+
+    :param queryset: The queryset to copy
+    :param update_kwargs: Dictionary of field values to set on the copies
+    :param new_attributes: The validated attributes returned by `validate_attributes`, if any, are
+                           merged into the attributes of the copies
+    :returns: List of (original id, copy id) tuples
+    """
+    model = queryset.model
+    opts = model._meta
+    qn = connection.ops.quote_name
+    table = qn(opts.db_table)
+    pk_column = qn(opts.pk.column)
+
+    columns = []
+    select = []
+    select_params = []
+    for field in opts.concrete_fields:
+        if field.primary_key:
+            continue
+        column = qn(field.column)
+        columns.append(column)
+        if field.name in update_kwargs:
+            value = update_kwargs[field.name]
+            if isinstance(value, Model):
+                value = value.pk
+            select.append("%s")
+            select_params.append(field.get_db_prep_save(value, connection))
+        elif getattr(field, "auto_now", False):
+            select.append("%s")
+            select_params.append(timezone.now())
+        elif field.name == "attributes" and new_attributes:
+            select.append(f"COALESCE(t.{column}, '{{}}'::jsonb) || %s::jsonb")
+            select_params.append(json.dumps(new_attributes, cls=field.encoder))
+        else:
+            select.append(f"t.{column}")
+    insert_sql = (
+        f"INSERT INTO {table} ({pk_column}, {', '.join(columns)}) "
+        f"SELECT m.new_id, {', '.join(select)} "
+        f"FROM unnest(%s::bigint[], %s::bigint[]) AS m(old_id, new_id) "
+        f"JOIN {table} t ON t.{pk_column} = m.old_id ORDER BY m.new_id"
+    )
+    m2m_sqls = []
+    for field in opts.many_to_many:
+        through = field.remote_field.through
+        source = qn(field.m2m_column_name())
+        target = qn(field.m2m_reverse_name())
+        m2m_sqls.append(
+            f"INSERT INTO {qn(through._meta.db_table)} ({source}, {target}) "
+            f"SELECT m.new_id, r.{target} "
+            f"FROM unnest(%s::bigint[], %s::bigint[]) AS m(old_id, new_id) "
+            f"JOIN {qn(through._meta.db_table)} r ON r.{source} = m.old_id "
+            f"ON CONFLICT DO NOTHING"
+        )
+
+    ids_sql, ids_params = queryset.order_by().values_list("pk", flat=True).query.sql_with_params()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT pg_get_serial_sequence(%s, %s)", [opts.db_table, opts.pk.column])
+        sequence = cursor.fetchone()[0]
+        cursor.execute(
+            f"SELECT old_id, nextval(%s) FROM (SELECT DISTINCT q.{pk_column} AS old_id "
+            f"FROM ({ids_sql}) q ORDER BY old_id) ordered",
+            [sequence, *ids_params],
+        )
+        id_map = cursor.fetchall()
+        for start in range(0, len(id_map), batch_size):
+            batch = id_map[start : start + batch_size]
+            old_ids = [old_id for old_id, _ in batch]
+            new_ids = [new_id for _, new_id in batch]
+            cursor.execute(insert_sql, [*select_params, old_ids, new_ids])
+            for m2m_sql in m2m_sqls:
+                cursor.execute(m2m_sql, [old_ids, new_ids])
+    return id_map
+
+
 def bulk_delete_and_log_changes(queryset, project, user):
     """
     Performs a bulk delete and creates a changelog for it.
@@ -346,20 +543,34 @@ def log_creation(obj, project, user):
     ChangeToObject(ref_table=ref_table, ref_id=obj.id, change_id=cl).save()
 
 
-def bulk_log_creation(objects, project, user):
+def bulk_log_creation(objects, project, user, copy=False):
     """
     Creates changelogs for multiple new objects.
 
     :param obj: The new object to create a change log for.
     :param project: The project the request originates from
     :param user: The user making the requests
+    :param copy: Whether to write the changelogs with COPY
     """
+    if CHANGELOG_ASYNC:
+        ref_table = ContentType.objects.get_for_model(objects[0])
+        now = time.time()
+        enqueue_changelogs(
+            [
+                _changelog_entry(project, user, obj.create_dict, ref_table, [obj.id], now)
+                for obj in objects
+            ]
+        )
+        return [obj.id for obj in objects]
+
+    create = bulk_copy_create if copy else bulk_create_from_generator
+
     # Create ChangeLogs
     objs = (
         ChangeLog(project=project, user=user, description_of_change=obj.create_dict)
         for obj in objects
     )
-    change_logs = bulk_create_from_generator(objs, ChangeLog)
+    change_logs = create(objs, ChangeLog)
 
     # Associate ChangeLogs with created objects
     ref_table = ContentType.objects.get_for_model(objects[0])
@@ -368,10 +579,64 @@ def bulk_log_creation(objects, project, user):
         ChangeToObject(ref_table=ref_table, ref_id=ref_id, change_id=cl)
         for ref_id, cl in zip(ids, change_logs)
     )
-    bulk_create_from_generator(objs, ChangeToObject)
+    create(objs, ChangeToObject)
     return ids
 
 
+def _changelog_entry(project, user, description_of_change, ref_table, ref_ids, created):
+    """Serializes a changelog and the ids of the objects it applies to for the outbox."""
+    return json.dumps(
+        {
+            "project": project.pk if isinstance(project, Project) else project,
+            "user": user.pk if user is not None else None,
+            "description": description_of_change,
+            "ref_table": ref_table.pk,
+            "ref_ids": list(ref_ids),
+            "time": created,
+        },
+        cls=TatorJSONEncoder,
+    )
+
+
+def enqueue_changelogs(entries):
+    """
+    Adds serialized changelogs to the outbox once the current transaction commits, and schedules
+    the db worker to write them. Changelogs of a transaction that is rolled back are discarded.
+    If the worker has fallen more than `TATOR_CHANGELOG_MAX_LAG` seconds behind, the outbox is
+    written before returning so the lag stays bounded.
+    """
+    transaction.on_commit(lambda: _push_changelogs(entries))
+
+
+def _push_changelogs(entries):
+    from .._changelog_writer import write_changelogs  # pylint: disable=import-outside-toplevel
+
+    TatorCache().push_changelogs(entries)
+    lag = changelog_lag()
+    if lag["lag_seconds"] > CHANGELOG_MAX_LAG:
+        logger.warning(
+            f"Changelog outbox is {lag['lag_seconds']:.1f}s behind with {lag['pending']} "
+            "pending entries, writing it synchronously."
+        )
+        write_changelogs(blocking=True)
+    else:
+        push_job("db_jobs", write_changelogs, result_ttl=0)
+
+
+def changelog_lag():
+    """Returns the number of queued changelogs and the age in seconds of the oldest one."""
+    pending, oldest = TatorCache().get_changelog_backlog()
+    lag = time.time() - json.loads(oldest)["time"] if oldest else 0.0
+    return {"pending": pending, "lag_seconds": lag}
+
+
+def flush_changelogs():
+    """Writes all queued changelogs. Returns the number of changelogs written."""
+    from .._changelog_writer import write_changelogs  # pylint: disable=import-outside-toplevel
+
+    return write_changelogs(blocking=True)
+
+
 def construct_parent_from_spec(state_or_loc_spec, parent_type):
     """
     Gets the parent object from a state or localization specification, if specified, otherwise
@@ -381,12 +646,34 @@ def construct_parent_from_spec(state_or_loc_spec, parent_type):
     return parent_type.objects.get(pk=parent) if parent else None
 
 
-def construct_elemental_id_from_spec(state_or_loc_spec, parent_type):
+def construct_parents_from_specs(state_or_loc_specs, parent_type):
+    """
+    Gets the parent objects of a list of state or localization specifications with one query.
+    Returns a dictionary mapping parent ids to parents; raises `DoesNotExist` naming every
+    parent that could not be found.
+    """
+    parent_ids = {spec["parent"] for spec in state_or_loc_specs if spec.get("parent", None)}
+    if not parent_ids:
+        return {}
+    parents = parent_type.objects.in_bulk(parent_ids)
+    missing = parent_ids - parents.keys()
+    if missing:
+        raise parent_type.DoesNotExist(
+            f"Could not find parent {parent_type.__name__} objects with ids {sorted(missing)}!"
+        )
+    return parents
+
+
+def construct_elemental_id_from_spec(state_or_loc_spec, parent_type, parents=None):
     """
     Calls `construct_elemental_id_from_parent` with inputs scraped from a state or localization
-    specification
+    specification. If given, the parent is looked up in `parents` (see
+    `construct_parents_from_specs`) instead of the database.
     """
-    parent = construct_elemental_id_from_parent(state_or_loc_spec, parent_type)
+    if parents is None:
+        parent = construct_parent_from_spec(state_or_loc_spec, parent_type)
+    else:
+        parent = parents.get(state_or_loc_spec.get("parent", None))
     return construct_elemental_id_from_parent(parent, state_or_loc_spec.get("elemental_id", None))
 
 
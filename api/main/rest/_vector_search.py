@@ -0,0 +1,119 @@
+""" Batched nearest neighbor search over the vector side tables. """
+
+import logging
+
+from django.db import connection, transaction
+
+from ..models import HNSW_EF_SEARCH
+from ._attribute_query import _get_info_for_attribute
+
+logger = logging.getLogger(__name__)
+
+# Operators matching the vector_*_ops classes of the HNSW indexes built by make_vector_index.
+METRIC_OPERATORS = {"l2norm": "<->", "ip": "<#>", "cosine": "<=>"}
+
+# pgvector's default size of the HNSW candidate list, which also caps the number of results.
+DEFAULT_EF_SEARCH = 40
+
+
+def batch_nearest_neighbors(qs, vector_model, entity_type, params):
+    """Returns the nearest neighbors in `qs` of every query vector in `params["centers"]`.
+
+    Each query vector is searched with its own ordered index scan through a LATERAL join, so
+    all of them are planned and executed as a single statement. Rows are restricted to `qs`
+    with a semi-join, which lets the filters of the list endpoints apply unchanged.
+
+    :param qs: Filtered queryset of objects of `entity_type`.
+    :param vector_model: Side table model holding the vectors of `qs.model`.
+    :returns: List with one dict of `ids` and `distances` per center, closest first.
+    """
+    name = params["name"]
+    centers = params["centers"]
+    metric = params.get("metric", "l2norm")
+    k = params.get("k", 10)
+
+    info = _get_info_for_attribute(entity_type, name)
+    if info.get("dtype") != "float_array":
+        raise ValueError(
+            f"Attribute '{name}' is not a float_array attribute of type {entity_type.pk}!"
+        )
+    size = int(info["size"])
+    for center in centers:
+        if len(center) != size:
+            raise ValueError(f"Query vectors for '{name}' must have {size} elements!")
+
+    ids_sql, ids_params = qs.order_by().values("id").query.sql_with_params()
+    table = vector_model._meta.db_table
+    distance = f"(v.embedding::vector({size})) {METRIC_OPERATORS[metric]} p.center::vector({size})"
+    sql = f"""
+        SELECT p.idx, r.entity, r.distance
+        FROM unnest(%s::text[]) WITH ORDINALITY AS p(center, idx)
+        CROSS JOIN LATERAL (
+            SELECT v.entity, {distance} AS distance
+            FROM {table} v
+            WHERE v.meta = %s AND v.name = %s AND v.entity IN ({ids_sql})
+            ORDER BY {distance}
+            LIMIT %s
+        ) r
+        ORDER BY p.idx, r.distance
+    """
+    # Filters apply to the rows of the index scan, which stops after ef_search candidates, so
+    # selective filters can leave a center short of k neighbors. Such centers are searched
+    # again exactly by ordering a materialized list of the filtered vectors.
+    exact_sql = f"""
+        WITH candidates AS MATERIALIZED (
+            SELECT v.entity, v.embedding
+            FROM {table} v
+            WHERE v.meta = %s AND v.name = %s AND v.entity IN ({ids_sql})
+        )
+        SELECT p.idx, r.entity, r.distance
+        FROM unnest(%s::text[], %s::int[]) AS p(center, idx)
+        CROSS JOIN LATERAL (
+            SELECT v.entity, {distance} AS distance
+            FROM candidates v
+            ORDER BY distance
+            LIMIT %s
+        ) r
+        ORDER BY p.idx, r.distance
+    """
+    count_sql = f"""
+        SELECT count(*) FROM (
+            SELECT 1 FROM {table} v
+            WHERE v.meta = %s AND v.name = %s AND v.entity IN ({ids_sql})
+            LIMIT %s
+        ) c
+    """
+    center_strs = ["[" + ",".join(str(float(val)) for val in center) + "]" for center in centers]
+    results = [{"ids": [], "distances": []} for _ in centers]
+    with transaction.atomic(), connection.cursor() as cursor:
+        if k > (HNSW_EF_SEARCH or DEFAULT_EF_SEARCH):
+            # An HNSW scan returns at most ef_search rows.
+            cursor.execute("SET LOCAL hnsw.ef_search = %s", (k,))
+        cursor.execute(sql, [center_strs, entity_type.pk, name, *ids_params, k])
+        for idx, entity, dist in cursor.fetchall():
+            results[idx - 1]["ids"].append(entity)
+            results[idx - 1]["distances"].append(dist)
+
+        if any(len(result["ids"]) < k for result in results):
+            cursor.execute(count_sql, [entity_type.pk, name, *ids_params, k])
+            available = cursor.fetchone()[0]
+            short = [idx for idx, result in enumerate(results) if len(result["ids"]) < available]
+            if short:
+                logger.info(f"Searching {len(short)} of {len(centers)} centers exactly.")
+                cursor.execute(
+                    exact_sql,
+                    [
+                        entity_type.pk,
+                        name,
+                        *ids_params,
+                        [center_strs[idx] for idx in short],
+                        [idx + 1 for idx in short],
+                        k,
+                    ],
+                )
+                for idx in short:
+                    results[idx] = {"ids": [], "distances": []}
+                for idx, entity, dist in cursor.fetchall():
+                    results[idx - 1]["ids"].append(entity)
+                    results[idx - 1]["distances"].append(dist)
+    return results
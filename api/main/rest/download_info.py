@@ -44,8 +44,10 @@ class DownloadInfoAPI(BaseListView):
         cache = TatorCache()
         user_id = self.request.user.pk
         ttl = expiration - 3600
+        cached = cache.mget_presigned(user_id, keys)
+        new_urls = {}
         for key in keys:
-            url = cache.get_presigned(user_id, key)
+            url = cached.get(key) or new_urls.get(key)
             if url is None:
                 upload = key.startswith("_uploads")
                 bucket = project_obj.get_bucket(upload=upload)
@@ -62,10 +64,11 @@ class DownloadInfoAPI(BaseListView):
                     raise PermissionDenied
                 # Generate presigned url.
                 url = tator_store.get_download_url(key, expiration)
-                # Store url in cache.
-                if ttl > 0:
-                    cache.set_presigned(user_id, key, url, ttl)
+                new_urls[key] = url
             # For compose deploys, use internal url.
             url = _use_internal_host(self.request, url)
             response_data.append({"key": key, "url": url})
+        # Store urls in cache.
+        if ttl > 0:
+            cache.mset_presigned(user_id, new_urls, ttl)
         return response_data
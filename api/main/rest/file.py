@@ -24,6 +24,7 @@ from ..schema.components.file import file_fields as fields
 from ._base_views import BaseListView
 from ._base_views import BaseDetailView
 from ._file_query import get_file_queryset
+from ._cursor import next_cursor
 from ._attributes import patch_attributes
 from ._attributes import validate_attributes
 from ._permissions import ProjectExecutePermission, ProjectViewOnlyPermission
@@ -55,6 +56,7 @@ class FileListAPI(BaseListView):
     def _get(self, params: dict) -> dict:
         qs = get_file_queryset(params["project"], params)
         response_data = list(qs.values(*FILE_PROPERTIES))
+        self.next_page_cursor = next_cursor(qs, params, response_data)
         return response_data
 
     def _post(self, params: dict) -> dict:
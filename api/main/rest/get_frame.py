@@ -15,6 +15,7 @@ from ..renderers import Mp4Renderer
 from ..schema import GetFrameSchema
 from ..schema import parse
 from ._base_views import TatorAPIView
+from ._graphic_cache import GraphicCache, graphic_cache_key
 from ._media_util import MediaUtil
 from ._permissions import ProjectViewOnlyPermission
 
@@ -123,44 +124,63 @@ class GetFrameAPI(TatorAPIView):
                         y = float(comps[3])
                         roi_arg.append((box_width, box_height, x, y))
 
-        with tempfile.TemporaryDirectory() as temp_dir:
-            media_util = MediaUtil(video, temp_dir, quality)
-            if len(frames) > 1 and animate:
-                # Default to gif for animate, but mp4 is also supported
-                if any(x is self.request.accepted_renderer.format for x in ["mp4", "gif"]):
-                    pass
-                else:
-                    self.request.accepted_renderer = GifRenderer()
-                gif_fp = media_util.get_animation(
-                    frames,
-                    roi_arg,
-                    fps=animate,
-                    render_format=self.request.accepted_renderer.format,
-                    force_scale=force_image_size,
-                )
-                with open(gif_fp, "rb") as data_file:
-                    response_data = data_file.read()
+        if len(frames) > 1 and animate:
+            # Default to gif for animate, but mp4 is also supported
+            if any(x is self.request.accepted_renderer.format for x in ["mp4", "gif"]):
+                pass
             else:
-                logger.info(f"Accepted format = {self.request.accepted_renderer.format}")
-                if video.type.dtype == "video":
-                    image_fp = media_util.get_tile_image(
+                self.request.accepted_renderer = GifRenderer()
+
+        response_data = None
+        cache_key = None
+        if GraphicCache.enabled():
+            cache_key = graphic_cache_key(
+                video,
+                frames=frames,
+                tile=tile_size,
+                animate=animate,
+                roi=roi_arg,
+                force_scale=force_image_size,
+                quality=quality,
+                format=self.request.accepted_renderer.format,
+            )
+            response_data = GraphicCache.get(cache_key)
+
+        if response_data is None:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                media_util = MediaUtil(video, temp_dir, quality)
+                if len(frames) > 1 and animate:
+                    gif_fp = media_util.get_animation(
                         frames,
                         roi_arg,
-                        tile_size,
+                        fps=animate,
                         render_format=self.request.accepted_renderer.format,
                         force_scale=force_image_size,
                     )
-                elif video.type.dtype == "image":
-                    roi = None
-                    if roi_arg:
-                        roi = roi_arg[0]
-                    image_fp = media_util.get_image(
-                        roi=roi,
-                        render_format=self.request.accepted_renderer.format,
-                        force_scale=force_image_size,
-                    )
-                with open(image_fp, "rb") as data_file:
-                    response_data = data_file.read()
+                    with open(gif_fp, "rb") as data_file:
+                        response_data = data_file.read()
+                else:
+                    logger.info(f"Accepted format = {self.request.accepted_renderer.format}")
+                    if video.type.dtype == "video":
+                        response_data = media_util.get_tile_image_data(
+                            frames,
+                            roi_arg,
+                            tile_size,
+                            render_format=self.request.accepted_renderer.format,
+                            force_scale=force_image_size,
+                        )
+                    elif video.type.dtype == "image":
+                        roi = None
+                        if roi_arg:
+                            roi = roi_arg[0]
+                        response_data = media_util.get_image_data(
+                            roi=roi,
+                            render_format=self.request.accepted_renderer.format,
+                            force_scale=force_image_size,
+                        )
+
+            if cache_key is not None:
+                GraphicCache.set(cache_key, response_data)
 
         response = Response(response_data, status=status.HTTP_200_OK)
         response["Last-Modified"] = http_date(last_modified)
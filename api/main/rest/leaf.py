@@ -18,6 +18,7 @@ from ..schema.components import leaf as leaf_schema
 from ._base_views import BaseListView
 from ._base_views import BaseDetailView
 from ._leaf_query import get_leaf_queryset
+from ._cursor import next_cursor
 from ._attributes import patch_attributes
 from ._attributes import bulk_patch_attributes
 from ._attributes import validate_attributes
@@ -143,6 +144,7 @@ class LeafListAPI(BaseListView):
     def _get(self, params):
         qs = get_leaf_queryset(params["project"], params)
         response_data = list(qs.values(*LEAF_PROPERTIES))
+        self.next_page_cursor = next_cursor(qs, params, response_data)
         return response_data
 
     def get_queryset(self, **kwargs):
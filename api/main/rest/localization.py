@@ -21,20 +21,25 @@ from .._permission_util import augment_permission
 from ._base_views import BaseListView
 from ._base_views import BaseDetailView
 from ._annotation_query import get_annotation_queryset
+from ._cursor import next_cursor
+from ._streaming import attribute_names, iter_value_chunks, streaming_response
 from ._attributes import patch_attributes
 from ._attributes import validate_attributes
 from ._util import (
+    bulk_check_required_fields,
+    bulk_copy_create,
+    bulk_create_variants,
     bulk_create_from_generator,
     bulk_delete_and_log_changes,
     bulk_log_creation,
     bulk_update_and_log_changes,
-    computeRequiredFields,
-    check_required_fields,
     delete_and_log_changes,
     log_changes,
     construct_elemental_id_from_spec,
-    construct_parent_from_spec,
+    construct_parents_from_specs,
     compute_user,
+    compute_users,
+    use_copy_ingest,
 )
 from ._permissions import ProjectEditPermission, ProjectViewOnlyPermission
 
@@ -47,6 +52,36 @@ LOCALIZATION_PROPERTIES = list(localization_schema["properties"].keys())
 import os
 
 
+def _csv_transform(response_data):
+    """Replaces user and media ids with email and name and flattens attributes for CSV output."""
+    # CSV creation requires a bit more
+    user_ids = set([d["user"] for d in response_data])
+    users = list(User.objects.filter(id__in=user_ids).values("id", "email"))
+    email_dict = {}
+    for user in users:
+        email_dict[user["id"]] = user["email"]
+
+    media_ids = set([d["media"] for d in response_data])
+    medias = list(Media.objects.filter(id__in=media_ids).values("id", "name"))
+    filename_dict = {}
+    for media in medias:
+        filename_dict[media["id"]] = media["name"]
+
+    for element in response_data:
+        del element["type"]
+
+        oldAttributes = element["attributes"]
+        del element["attributes"]
+        element.update(oldAttributes)
+
+        user_id = element["user"]
+        media_id = element["media"]
+
+        element["user"] = email_dict[user_id]
+        element["media"] = filename_dict[media_id]
+    return response_data
+
+
 class LocalizationListAPI(BaseListView):
     """Interact with list of localizations.
 
@@ -85,37 +120,29 @@ class LocalizationListAPI(BaseListView):
     def _get(self, params):
         logger.info("PARAMS=%s", params)
         qs = self.get_queryset()
+        renderer_format = self.request.accepted_renderer.format
+        if params.get("stream"):
+            return self._stream(qs, params, renderer_format)
         response_data = list(qs.values(*LOCALIZATION_PROPERTIES))
+        self.next_page_cursor = next_cursor(qs, params, response_data)
 
         # Adjust fields for csv output.
-        if self.request.accepted_renderer.format == "csv":
-            # CSV creation requires a bit more
-            user_ids = set([d["user"] for d in response_data])
-            users = list(User.objects.filter(id__in=user_ids).values("id", "email"))
-            email_dict = {}
-            for user in users:
-                email_dict[user["id"]] = user["email"]
-
-            media_ids = set([d["media"] for d in response_data])
-            medias = list(Media.objects.filter(id__in=media_ids).values("id", "name"))
-            filename_dict = {}
-            for media in medias:
-                filename_dict[media["id"]] = media["name"]
-
-            for element in response_data:
-                del element["type"]
-
-                oldAttributes = element["attributes"]
-                del element["attributes"]
-                element.update(oldAttributes)
-
-                user_id = element["user"]
-                media_id = element["media"]
-
-                element["user"] = email_dict[user_id]
-                element["media"] = filename_dict[media_id]
+        if renderer_format == "csv":
+            response_data = _csv_transform(response_data)
         return response_data
 
+    def _stream(self, qs, params, renderer_format):
+        """Streams the query result in chunks from a server-side cursor."""
+        chunks = iter_value_chunks(qs, LOCALIZATION_PROPERTIES)
+        field_names = None
+        if renderer_format == "csv":
+            chunks = (_csv_transform(chunk) for chunk in chunks)
+            field_names = [
+                field for field in LOCALIZATION_PROPERTIES if field not in ["type", "attributes"]
+            ]
+            field_names += attribute_names(LocalizationType, params["project"], params.get("type"))
+        return streaming_response(chunks, renderer_format, field_names)
+
     def _post(self, params):
         # Check that we are getting a localization list.
         try:
@@ -199,14 +226,12 @@ class LocalizationListAPI(BaseListView):
                 f"Versions must be part of project {project.id}, got project {version_projects[0]}!"
             )
 
-        # Get required fields for attributes.
-        required_fields = {id_: computeRequiredFields(metas[id_]) for id_ in meta_ids}
-        attr_specs = [
-            check_required_fields(
-                required_fields[loc["type"]][0], required_fields[loc["type"]][2], loc
-            )
-            for loc in loc_specs
-        ]
+        # Validate required fields and attributes.
+        attr_specs = bulk_check_required_fields(metas, loc_specs)
+        parents = construct_parents_from_specs(loc_specs, Localization)
+        authors = compute_users(
+            project, self.request.user, [loc.get("user_elemental_id") for loc in loc_specs]
+        )
 
         # Create the localization objects.
         objs = (
@@ -214,18 +239,12 @@ class LocalizationListAPI(BaseListView):
                 project=project,
                 type=metas[loc_spec["type"]],
                 media=medias[loc_spec["media_id"]],
-                user=compute_user(
-                    project, self.request.user, loc_spec.get("user_elemental_id", None)
-                ),
+                user=authors[loc_spec.get("user_elemental_id") or None],
                 attributes=attrs,
-                created_by=compute_user(
-                    project, self.request.user, loc_spec.get("user_elemental_id", None)
-                ),
-                modified_by=compute_user(
-                    project, self.request.user, loc_spec.get("user_elemental_id", None)
-                ),
+                created_by=authors[loc_spec.get("user_elemental_id") or None],
+                modified_by=authors[loc_spec.get("user_elemental_id") or None],
                 version=versions[loc_spec.get("version", None)],
-                parent=construct_parent_from_spec(loc_spec, Localization),
+                parent=parents.get(loc_spec.get("parent", None)),
                 x=loc_spec.get("x", None),
                 y=loc_spec.get("y", None),
                 u=loc_spec.get("u", None),
@@ -234,13 +253,17 @@ class LocalizationListAPI(BaseListView):
                 height=loc_spec.get("height", None),
                 points=loc_spec.get("points", None),
                 frame=loc_spec.get("frame", None),
-                elemental_id=construct_elemental_id_from_spec(loc_spec, Localization),
+                elemental_id=construct_elemental_id_from_spec(loc_spec, Localization, parents),
             )
             for loc_spec, attrs in zip(loc_specs, attr_specs)
         )
-        localizations = bulk_create_from_generator(objs, Localization)
+        copy = use_copy_ingest(len(loc_specs))
+        if copy:
+            localizations = bulk_copy_create(objs, Localization)
+        else:
+            localizations = bulk_create_from_generator(objs, Localization)
 
-        ids = bulk_log_creation(localizations, project, self.request.user)
+        ids = bulk_log_creation(localizations, project, self.request.user, copy=copy)
 
         # Return created IDs.
         return {"message": f"Successfully created {len(ids)} localizations!", "id": ids}
@@ -267,14 +290,9 @@ class LocalizationListAPI(BaseListView):
                         new_attributes=None,
                     )
                 else:
-                    objs = []
-                    for original in qs.iterator():
-                        original.pk = None
-                        original.id = None
-                        original.modified_by = self.request.user
-                        original.variant_deleted = True
-                        objs.append(original)
-                    Localization.objects.bulk_create(objs)
+                    bulk_create_variants(
+                        qs, {"modified_by": self.request.user, "variant_deleted": True}
+                    )
 
         return {"message": f"Successfully deleted {count} localizations!"}
 
@@ -318,26 +336,9 @@ class LocalizationListAPI(BaseListView):
                     new_attributes=new_attrs,
                 )
             else:
-                objs = []
-                origin_datetimes = []
-                for original in qs.iterator():
-                    original.pk = None
-                    original.id = None
-                    for key, value in update_kwargs.items():
-                        if key == "version":
-                            setattr(original, key, Version.objects.get(pk=value))
-                        else:
-                            setattr(original, key, value)
-                    original.attributes.update(new_attrs)
-                    objs.append(original)
-                    origin_datetimes.append(original.created_datetime)
-
-                new_objs = Localization.objects.bulk_create(objs)
-
-                for new_obj, origin_datetime in zip(new_objs, origin_datetimes):
-                    found_it = Localization.objects.get(pk=new_obj.pk)
-                    found_it.created_datetime = origin_datetime
-                    found_it.save()
+                if "version" in update_kwargs:
+                    update_kwargs["version"] = Version.objects.get(pk=update_kwargs["version"])
+                bulk_create_variants(qs, update_kwargs, new_attrs)
 
         return {"message": f"Successfully updated {count} localizations!"}
 
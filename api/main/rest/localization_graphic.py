@@ -17,6 +17,7 @@ from ..renderers import Mp4Renderer
 from ..schema import LocalizationGraphicSchema
 from ..schema import parse
 from ._base_views import TatorAPIView
+from ._graphic_cache import GraphicCache, graphic_cache_key
 from ._media_util import MediaUtil
 from ._permissions import ProjectViewOnlyPermission
 from .temporary_file import TemporaryFileDetailAPI
@@ -262,39 +263,54 @@ class LocalizationGraphicAPI(TatorAPIView):
             assert requested_height > 0
             force_image_size = (requested_width, requested_height)
 
-        # By reaching here, it's expected that the graphics mode is to create a new
-        # thumbnail using the provided parameters. That new thumbnail is returned
-        with tempfile.TemporaryDirectory() as temp_dir:
-            media_util = MediaUtil(video=obj.media, temp_dir=temp_dir)
-
-            roi = self._getRoi(
-                obj=obj,
+        response_data = None
+        cache_key = None
+        if GraphicCache.enabled():
+            # The roi is derived from the localization geometry and the request parameters.
+            cache_key = graphic_cache_key(
+                obj.media,
+                localization=obj.pk,
+                localization_modified=obj.modified_datetime.isoformat(),
+                frame=obj.frame,
                 params=self.params,
-                media_width=media_util.getWidth(),
-                media_height=media_util.getHeight(),
+                format=self.request.accepted_renderer.format,
             )
-
-            if media_util.isVideo():
-                # We will only pass a single frame and corresponding roi into this
-                # so the expected output is only one tile instead of many
-                image_path = media_util.get_tile_image(
-                    frames=[obj.frame],
-                    rois=[roi],
-                    tile_size=None,
-                    render_format=self.request.accepted_renderer.format,
-                    force_scale=force_image_size,
+            response_data = GraphicCache.get(cache_key)
+
+        if response_data is None:
+            # By reaching here, it's expected that the graphics mode is to create a new
+            # thumbnail using the provided parameters. That new thumbnail is returned
+            with tempfile.TemporaryDirectory() as temp_dir:
+                media_util = MediaUtil(video=obj.media, temp_dir=temp_dir)
+
+                roi = self._getRoi(
+                    obj=obj,
+                    params=self.params,
+                    media_width=media_util.getWidth(),
+                    media_height=media_util.getHeight(),
                 )
 
-                with open(image_path, "rb") as data_file:
-                    response_data = data_file.read()
-
-            else:
-                # Grab the ROI from the image
-                response_data = media_util.get_cropped_image(
-                    roi=roi,
-                    render_format=self.request.accepted_renderer.format,
-                    force_scale=force_image_size,
-                )
+                if media_util.isVideo():
+                    # We will only pass a single frame and corresponding roi into this
+                    # so the expected output is only one tile instead of many
+                    response_data = media_util.get_tile_image_data(
+                        frames=[obj.frame],
+                        rois=[roi],
+                        tile_size=None,
+                        render_format=self.request.accepted_renderer.format,
+                        force_scale=force_image_size,
+                    )
+
+                else:
+                    # Grab the ROI from the image
+                    response_data = media_util.get_cropped_image(
+                        roi=roi,
+                        render_format=self.request.accepted_renderer.format,
+                        force_scale=force_image_size,
+                    )
+
+            if cache_key is not None:
+                GraphicCache.set(cache_key, response_data)
 
         response = Response(response_data, status=status.HTTP_200_OK)
         response["Last-Modified"] = http_date(last_modified)
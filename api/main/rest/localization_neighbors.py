@@ -0,0 +1,30 @@
+from ..models import LocalizationType, LocalizationVector
+from ..schema import LocalizationNeighborsSchema
+
+from ._base_views import BaseListView
+from ._annotation_query import get_annotation_queryset
+from ._permissions import ProjectViewOnlyPermission
+from ._vector_search import batch_nearest_neighbors
+
+
+class LocalizationNeighborsAPI(BaseListView):
+    """Batched nearest neighbor search of localizations on a `float_array` attribute.
+
+    This endpoint accepts the same query parameters as a GET request to the `Localizations`
+    endpoint, and returns the nearest localizations matching them for each of many query vectors.
+    """
+
+    schema = LocalizationNeighborsSchema()
+    permission_classes = [ProjectViewOnlyPermission]
+    http_method_names = ["put"]
+
+    def get_queryset(self, **kwargs):
+        return self.filter_only_viewables(
+            get_annotation_queryset(self.params["project"], self.params, "localization")
+        )
+
+    def _put(self, params):
+        if "type" not in params:
+            raise ValueError("Must supply 'type' for a nearest neighbor search.")
+        entity_type = LocalizationType.objects.get(project=params["project"], pk=params["type"])
+        return batch_nearest_neighbors(self.get_queryset(), LocalizationVector, entity_type, params)
@@ -55,6 +55,7 @@ from ._util import (
 
 from ._base_views import BaseListView, BaseDetailView
 from ._media_query import get_media_queryset
+from ._cursor import next_cursor
 from ._attributes import bulk_patch_attributes, patch_attributes, validate_attributes
 from ._permissions import (
     ProjectEditPermission,
@@ -111,6 +112,28 @@ def _presign(user_id, expiration, medias, fields=None, no_cache=False):
     cache = TatorCache()
     ttl = expiration - 3600
 
+    # Fetch all cached urls in one round trip.
+    cached = {}
+    if not no_cache:
+        paths = []
+        for media in medias:
+            if media.get("media_files") is None:
+                continue
+            for field in fields:
+                for media_def in media["media_files"].get(field, []):
+                    paths.append(media_def["path"])
+                    if field == "streaming" and "segment_info" in media_def:
+                        paths.append(media_def["segment_info"])
+        cached = cache.mget_presigned(user_id, paths)
+    new_urls = {}
+
+    def _get_url(path):
+        url = cached.get(path) or new_urls.get(path)
+        if url is None:
+            url = store_lookup[path].get_download_url(path, expiration)
+            new_urls[path] = url
+        return url
+
     # Get replace all keys with presigned urls.
     for media in medias:
         if media.get("media_files") is None:
@@ -125,30 +148,20 @@ def _presign(user_id, expiration, medias, fields=None, no_cache=False):
                 # If the path is a bona fide URL, don't attempt to presign it
                 if urlparse(media_def["path"]).scheme != "":
                     continue
-                url = cache.get_presigned(user_id, media_def["path"])
-                if no_cache or (url is None):
-                    tator_store = store_lookup[media_def["path"]]
-                    url = tator_store.get_download_url(media_def["path"], expiration)
-                    if ttl > 0 and not no_cache:
-                        cache.set_presigned(user_id, media_def["path"], url, ttl)
-                media_def["path"] = url
+                media_def["path"] = _get_url(media_def["path"])
                 # Get segment url
                 if field == "streaming":
                     if "segment_info" in media_def:
-                        url = cache.get_presigned(user_id, media_def["segment_info"])
-                        if no_cache or (url is None):
-                            tator_store = store_lookup[media_def["segment_info"]]
-                            url = tator_store.get_download_url(
-                                media_def["segment_info"], expiration
-                            )
-                            if ttl > 0 and not no_cache:
-                                cache.set_presigned(user_id, media_def["segment_info"], url, ttl)
-                        media_def["segment_info"] = url
+                        media_def["segment_info"] = _get_url(media_def["segment_info"])
                     else:
                         logger.warning(
                             f"No segment file in media {media['id']} for file {media_def['path']}!"
                         )
 
+    # Store all new urls in one round trip.
+    if ttl > 0 and not no_cache:
+        cache.mset_presigned(user_id, new_urls, ttl)
+
 
 def _save_image(url, media_obj, project_obj, role):
     """
@@ -446,6 +459,7 @@ class MediaListAPI(BaseListView):
         if params.get("encoded_related_search") == None:
             fields.remove("incident")
         response_data = list(qs.values(*fields))
+        self.next_page_cursor = next_cursor(qs, params, response_data)
         presigned = params.get("presigned")
         if presigned is not None:
             no_cache = params.get("no_cache", False)
@@ -6,6 +6,7 @@ from ..models import Media
 from ..search import TatorSearch
 from ..schema import MediaNextSchema
 
+from ._media_query import get_adjacent_media_id
 from ._media_query import get_media_queryset
 
 from ._base_views import BaseDetailView
@@ -31,19 +32,7 @@ class MediaNextAPI(BaseDetailView):
         media = Media.objects.get(pk=media_id)
 
         qs = get_media_queryset(media.project.id, params)
-        iter_obj = qs.iterator()
-        next_id = -1
-        try:
-            for x in range(qs.count()):
-                record = next(iter_obj)
-                if record.id == media_id:
-                    next_record = next(iter_obj)
-                    next_id = next_record.id
-                    break
-        except StopIteration:
-            pass
-
-        return next_id
+        return get_adjacent_media_id(qs, media_id)
 
     def _get(self, params):
         # Find this object.
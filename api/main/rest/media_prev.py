@@ -6,6 +6,7 @@ from ..models import Media
 from ..search import TatorSearch
 from ..schema import MediaPrevSchema
 
+from ._media_query import get_adjacent_media_id
 from ._media_query import get_media_queryset
 
 from ._base_views import BaseDetailView
@@ -32,19 +33,8 @@ class MediaPrevAPI(BaseDetailView):
         params = self.params
         media = Media.objects.get(pk=media_id)
 
-        qs = get_media_queryset(media.project.id, params).reverse()
-        iter_obj = qs.iterator()
-        next_id = -1
-        try:
-            for x in range(qs.count()):
-                record = next(iter_obj)
-                if record.id == media_id:
-                    next_record = next(iter_obj)
-                    next_id = next_record.id
-                    break
-        except StopIteration:
-            pass
-        return next_id
+        qs = get_media_queryset(media.project.id, params)
+        return get_adjacent_media_id(qs, media_id, reverse=True)
 
     def _get(self, params):
         response_data = {"prev": self._get_prev(params["id"])}
@@ -55,6 +55,9 @@ def _serialize_projects(projects, user_id):
     ttl = 28800
     project_data = list(projects.values(*PROJECT_PROPERTIES))
     stores = {None: get_tator_store(None, connect_timeout=1, read_timeout=1, max_attempts=1)}
+    thumb_paths = [project["thumb"] for project in project_data if project["thumb"]]
+    cached = cache.mget_presigned(user_id, thumb_paths)
+    new_urls = {}
 
     for idx, project in enumerate(projects):
         if os.getenv("TATOR_FINE_GRAIN_PERMISSION", None) == "true":
@@ -71,7 +74,7 @@ def _serialize_projects(projects, user_id):
         # logger.info(f"{project_data}")
         thumb_path = project_data[idx]["thumb"]
         if thumb_path:
-            url = cache.get_presigned(user_id, thumb_path)
+            url = cached.get(thumb_path)
             if url is None:
                 try:
                     url = stores[None].get_download_url(thumb_path, ttl)
@@ -99,11 +102,12 @@ def _serialize_projects(projects, user_id):
                     else:
                         logger.warning(f"Could not find thumbnail for project {project.id}")
                 if url is not None:
-                    cache.set_presigned(user_id, thumb_path, url, ttl)
+                    new_urls[thumb_path] = url
 
             if url is not None:
                 thumb = url
             project_data[idx]["thumb"] = thumb
+    cache.mset_presigned(user_id, new_urls, ttl)
     return project_data
 
 
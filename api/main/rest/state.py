@@ -30,21 +30,26 @@ from .._permission_util import augment_permission
 from ._base_views import BaseListView
 from ._base_views import BaseDetailView
 from ._annotation_query import get_annotation_queryset
+from ._cursor import next_cursor
+from ._streaming import attribute_names, iter_value_chunks, streaming_response
 from ._attributes import patch_attributes
 from ._attributes import bulk_patch_attributes
 from ._attributes import validate_attributes
 from ._util import (
+    bulk_check_required_fields,
+    bulk_copy_create,
+    bulk_create_variants,
     bulk_create_from_generator,
     bulk_delete_and_log_changes,
     bulk_log_creation,
     bulk_update_and_log_changes,
-    computeRequiredFields,
-    check_required_fields,
     delete_and_log_changes,
     log_changes,
     construct_elemental_id_from_spec,
-    construct_parent_from_spec,
+    construct_parents_from_specs,
     compute_user,
+    compute_users,
+    use_copy_ingest,
 )
 from ._permissions import ProjectEditPermission, ProjectViewOnlyPermission
 import os
@@ -82,6 +87,78 @@ def _fill_m2m(response_data):
     return response_data
 
 
+def _is_latest_frame_type(params):
+    if "type" not in params:
+        return False
+    type_object = StateType.objects.get(pk=params["type"])
+    return (
+        type_object.association == "Frame"
+        and type_object.interpolation == InterpolationMethods.LATEST
+    )
+
+
+def _csv_transform(response_data, params, following=None):
+    """Replaces user and media ids with email and name and flattens attributes for CSV output.
+
+    :param following: The first (untransformed) element after `response_data`, if any. Used
+                      to compute the end frame of the last element when output is chunked.
+    """
+    # CSV creation requires a bit more
+    user_ids = set([d["modified_by"] for d in response_data])
+    users = list(User.objects.filter(id__in=user_ids).values("id", "email"))
+    email_dict = {}
+    for user in users:
+        email_dict[user["id"]] = user["email"]
+
+    media_ids = set(media for d in response_data for media in d["media"])
+    medias = list(Media.objects.filter(id__in=media_ids).values("id", "name"))
+    filename_dict = {media["id"]: media["name"] for media in medias}
+
+    for element in response_data:
+        del element["type"]
+
+        oldAttributes = element["attributes"]
+        del element["attributes"]
+        element.update(oldAttributes)
+
+        user_id = element["modified_by"]
+        media_ids = element["media"]
+
+        element["user"] = email_dict[user_id]
+        element["media"] = [filename_dict[media_id] for media_id in media_ids]
+
+    if _is_latest_frame_type(params):
+        for idx, el in enumerate(response_data):
+            mediaEl = Media.objects.get(pk=el["media"])
+            endFrame = 0
+            if idx + 1 < len(response_data):
+                next_element = response_data[idx + 1]
+                endFrame = next_element["frame"]
+            elif following is not None:
+                endFrame = following["frame"]
+            else:
+                endFrame = mediaEl.num_frames
+            el["media"] = mediaEl.name
+
+            el["endFrame"] = endFrame
+            el["startSeconds"] = int(el["frame"]) * mediaEl.fps
+            el["endSeconds"] = int(el["endFrame"]) * mediaEl.fps
+    return response_data
+
+
+def _iter_csv_chunks(chunks, params):
+    """Applies `_csv_transform` to a stream of chunks, holding each chunk back until the
+    next one is available so end frames are correct across chunk boundaries.
+    """
+    pending = None
+    for chunk in chunks:
+        if pending is not None:
+            yield _csv_transform(pending, params, following=chunk[0])
+        pending = chunk
+    if pending is not None:
+        yield _csv_transform(pending, params)
+
+
 class StateListAPI(BaseListView):
     """Interact with list of states.
 
@@ -123,60 +200,37 @@ class StateListAPI(BaseListView):
     def _get(self, params):
         t0 = datetime.datetime.now()
         qs = self.get_queryset()
+        renderer_format = self.request.accepted_renderer.format
+        if params.get("stream"):
+            return self._stream(qs, params, renderer_format)
         response_data = list(qs.values(*STATE_PROPERTIES))
+        self.next_page_cursor = next_cursor(qs, params, response_data)
 
         t1 = datetime.datetime.now()
         response_data = _fill_m2m(response_data)
-        if self.request.accepted_renderer.format == "csv":
-            # CSV creation requires a bit more
-            user_ids = set([d["modified_by"] for d in response_data])
-            users = list(User.objects.filter(id__in=user_ids).values("id", "email"))
-            email_dict = {}
-            for user in users:
-                email_dict[user["id"]] = user["email"]
-
-            media_ids = set(media for d in response_data for media in d["media"])
-            medias = list(Media.objects.filter(id__in=media_ids).values("id", "name"))
-            filename_dict = {media["id"]: media["name"] for media in medias}
-
-            for element in response_data:
-                del element["type"]
-
-                oldAttributes = element["attributes"]
-                del element["attributes"]
-                element.update(oldAttributes)
-
-                user_id = element["modified_by"]
-                media_ids = element["media"]
-
-                element["user"] = email_dict[user_id]
-                element["media"] = [filename_dict[media_id] for media_id in media_ids]
-
-            if "type" in params:
-                type_object = StateType.objects.get(pk=params["type"])
-                if (
-                    type_object.association == "Frame"
-                    and type_object.interpolation == InterpolationMethods.LATEST
-                ):
-                    for idx, el in enumerate(response_data):
-                        mediaEl = Media.objects.get(pk=el["media"])
-                        endFrame = 0
-                        if idx + 1 < len(response_data):
-                            next_element = response_data[idx + 1]
-                            endFrame = next_element["frame"]
-                        else:
-                            endFrame = mediaEl.num_frames
-                        el["media"] = mediaEl.name
-
-                        el["endFrame"] = endFrame
-                        el["startSeconds"] = int(el["frame"]) * mediaEl.fps
-                        el["endSeconds"] = int(el["endFrame"]) * mediaEl.fps
+        if renderer_format == "csv":
+            response_data = _csv_transform(response_data, params)
         t2 = datetime.datetime.now()
         logger.info(f"Number of states: {len(response_data)}")
         logger.info(f"Time to get states: {t1-t0}")
         logger.info(f"Time to get states many to many fields: {t2-t1}")
         return response_data
 
+    def _stream(self, qs, params, renderer_format):
+        """Streams the query result in chunks from a server-side cursor."""
+        chunks = (_fill_m2m(chunk) for chunk in iter_value_chunks(qs, STATE_PROPERTIES))
+        field_names = None
+        if renderer_format == "csv":
+            chunks = _iter_csv_chunks(chunks, params)
+            field_names = [
+                field for field in STATE_PROPERTIES if field not in ["type", "attributes"]
+            ]
+            field_names += ["media", "localizations", "user"]
+            if _is_latest_frame_type(params):
+                field_names += ["endFrame", "startSeconds", "endSeconds"]
+            field_names += attribute_names(StateType, params["project"], params.get("type"))
+        return streaming_response(chunks, renderer_format, field_names)
+
     def _post(self, params):
         # Check that we are getting a state list.
         if "body" in params:
@@ -274,14 +328,12 @@ class StateListAPI(BaseListView):
                 f"Media must be part of project {project.id}, got project " f"{media_projects[0]}!"
             )
 
-        # Get required fields for attributes.
-        required_fields = {id_: computeRequiredFields(metas[id_]) for id_ in meta_ids}
-        attr_specs = [
-            check_required_fields(
-                required_fields[state["type"]][0], required_fields[state["type"]][2], state
-            )
-            for state in state_specs
-        ]
+        # Validate required fields and attributes.
+        attr_specs = bulk_check_required_fields(metas, state_specs)
+        parents = construct_parents_from_specs(state_specs, State)
+        authors = compute_users(
+            project, self.request.user, [state.get("user_elemental_id") for state in state_specs]
+        )
 
         # Create the state objects.
         objs = (
@@ -289,20 +341,20 @@ class StateListAPI(BaseListView):
                 project=project,
                 type=metas[state_spec["type"]],
                 attributes=attrs,
-                created_by=compute_user(
-                    project, self.request.user, state_spec.get("user_elemental_id", None)
-                ),
-                modified_by=compute_user(
-                    project, self.request.user, state_spec.get("user_elemental_id", None)
-                ),
+                created_by=authors[state_spec.get("user_elemental_id") or None],
+                modified_by=authors[state_spec.get("user_elemental_id") or None],
                 version=versions[state_spec.get("version", None)],
                 frame=state_spec.get("frame", None),
-                parent=construct_parent_from_spec(state_spec, State),
-                elemental_id=construct_elemental_id_from_spec(state_spec, State),
+                parent=parents.get(state_spec.get("parent", None)),
+                elemental_id=construct_elemental_id_from_spec(state_spec, State, parents),
             )
             for state_spec, attrs in zip(state_specs, attr_specs)
         )
-        states = bulk_create_from_generator(objs, State)
+        copy = use_copy_ingest(len(state_specs))
+        if copy:
+            states = bulk_copy_create(objs, State)
+        else:
+            states = bulk_create_from_generator(objs, State)
 
         # Create media relations.
         media_relations = []
@@ -353,7 +405,7 @@ class StateListAPI(BaseListView):
                 state.segments = [[int(segment[0]), int(segment[-1])] for segment in segments]
         State.objects.bulk_update(states, ["segments"])
 
-        ids = bulk_log_creation(states, project, self.request.user)
+        ids = bulk_log_creation(states, project, self.request.user, copy=copy)
 
         return {"message": f"Successfully created {len(ids)} states!", "id": ids}
 
@@ -379,14 +431,9 @@ class StateListAPI(BaseListView):
                         new_attributes=None,
                     )
                 else:
-                    objs = []
-                    for original in qs.iterator():
-                        original.pk = None
-                        original.id = None
-                        original.variant_deleted = True
-                        original.modified_by = self.request.user
-                        objs.append(original)
-                    State.objects.bulk_create(objs)
+                    bulk_create_variants(
+                        qs, {"variant_deleted": True, "modified_by": self.request.user}
+                    )
 
         return {"message": f"Successfully deleted {count} states!"}
 
@@ -431,28 +478,9 @@ class StateListAPI(BaseListView):
                     new_attributes=new_attrs,
                 )
             else:
-                objs = []
-                many_to_many = []
-                origin_datetimes = []
-
-                for original in qs.iterator():
-                    many_to_many.append((original.media.all(), original.localizations.all()))
-                    original.pk = None
-                    original.id = None
-                    for key, value in update_kwargs.items():
-                        setattr(original, key, value)
-                    original.attributes.update(new_attrs)
-                    objs.append(original)
-                    origin_datetimes.append(original.created_datetime)
-                new_objs = State.objects.bulk_create(objs)
-                for p_obj, m2m, origin_datetime in zip(new_objs, many_to_many, origin_datetimes):
-                    p_obj.media.set(m2m[0])
-                    p_obj.localizations.set(m2m[1])
-
-                    # Django doesn't let you fix created_datetime unless you fetch the object again
-                    found_it = State.objects.get(pk=p_obj.pk)
-                    found_it.created_datetime = origin_datetime
-                    found_it.save()
+                if "version" in update_kwargs:
+                    update_kwargs["version"] = Version.objects.get(pk=update_kwargs["version"])
+                bulk_create_variants(qs, update_kwargs, new_attrs)
 
         return {"message": f"Successfully updated {count} states!"}
 
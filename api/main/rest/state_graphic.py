@@ -15,6 +15,7 @@ from ..renderers import Mp4Renderer
 from ..schema import StateGraphicSchema
 
 from ._base_views import TatorAPIView
+from ._graphic_cache import GraphicCache, graphic_cache_key
 from ._media_util import MediaUtil
 from ._permissions import ProjectViewOnlyPermission
 
@@ -76,52 +77,75 @@ class StateGraphicAPI(TatorAPIView):
         localizations = state.localizations.order_by("frame")[offset : offset + length]
         frames = [l.frame for l in localizations]
         roi = [(l.width, l.height, l.x, l.y) for l in localizations]
-        with tempfile.TemporaryDirectory() as temp_dir:
-            media_util = MediaUtil(video, temp_dir)
-            if mode == "animate":
-                if any(x is self.request.accepted_renderer.format for x in ["mp4", "gif"]):
-                    pass
-                else:
-                    self.request.accepted_renderer = GifRenderer()
-                gif_fp = media_util.get_animation(
-                    frames, roi, fps, self.request.accepted_renderer.format, force_scale=force_scale
-                )
-                with open(gif_fp, "rb") as data_file:
-                    self.request.accepted_renderer = GifRenderer()
-                    response_data = data_file.read()
+        if mode == "animate":
+            if any(x is self.request.accepted_renderer.format for x in ["mp4", "gif"]):
+                pass
             else:
-                max_w = 0
-                max_h = 0
-                for el in roi:
-                    if el[0] > max_w:
-                        max_w = el[0]
-                    if el[1] > max_h:
-                        max_h = el[1]
-
-                print(f"{max_w} {max_h}")
-                # rois have to be the same size box for tile to work
-                if force_scale is None:
-                    new_rois = [
-                        (max_w, max_h, r[2] + ((r[0] - max_w) / 2), r[3] + ((r[1] - max_h) / 2))
-                        for r in roi
-                    ]
-                    for idx, r in enumerate(roi):
-                        print(f"{r} corrected to {new_rois[idx]}")
+                self.request.accepted_renderer = GifRenderer()
+
+        response_data = None
+        cache_key = None
+        if GraphicCache.enabled():
+            cache_key = graphic_cache_key(
+                video,
+                state=state.pk,
+                frames=frames,
+                roi=roi,
+                mode=mode,
+                fps=fps,
+                force_scale=force_scale,
+                format=self.request.accepted_renderer.format,
+            )
+            response_data = GraphicCache.get(cache_key)
+
+        if response_data is None:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                media_util = MediaUtil(video, temp_dir)
+                if mode == "animate":
+                    gif_fp = media_util.get_animation(
+                        frames,
+                        roi,
+                        fps,
+                        self.request.accepted_renderer.format,
+                        force_scale=force_scale,
+                    )
+                    with open(gif_fp, "rb") as data_file:
+                        self.request.accepted_renderer = GifRenderer()
+                        response_data = data_file.read()
                 else:
-                    new_rois = roi
-                    print(f"Using a forced scale")
-
-                # Get a tiled fp as a film strip
-                tile_size = f"{len(frames)}x1"
-                tiled_fp = media_util.get_tile_image(
-                    frames,
-                    new_rois,
-                    tile_size,
-                    render_format=self.request.accepted_renderer.format,
-                    force_scale=force_scale,
-                )
-                with open(tiled_fp, "rb") as data_file:
-                    response_data = data_file.read()
+                    max_w = 0
+                    max_h = 0
+                    for el in roi:
+                        if el[0] > max_w:
+                            max_w = el[0]
+                        if el[1] > max_h:
+                            max_h = el[1]
+
+                    print(f"{max_w} {max_h}")
+                    # rois have to be the same size box for tile to work
+                    if force_scale is None:
+                        new_rois = [
+                            (max_w, max_h, r[2] + ((r[0] - max_w) / 2), r[3] + ((r[1] - max_h) / 2))
+                            for r in roi
+                        ]
+                        for idx, r in enumerate(roi):
+                            print(f"{r} corrected to {new_rois[idx]}")
+                    else:
+                        new_rois = roi
+                        print(f"Using a forced scale")
+
+                    # Get a tiled fp as a film strip
+                    tile_size = f"{len(frames)}x1"
+                    response_data = media_util.get_tile_image_data(
+                        frames,
+                        new_rois,
+                        tile_size,
+                        render_format=self.request.accepted_renderer.format,
+                        force_scale=force_scale,
+                    )
+
+            if cache_key is not None:
+                GraphicCache.set(cache_key, response_data)
 
         response = Response(response_data, status=status.HTTP_200_OK)
         response["Last-Modified"] = http_date(last_modified)
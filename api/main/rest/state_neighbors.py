@@ -0,0 +1,30 @@
+from ..models import StateType, StateVector
+from ..schema import StateNeighborsSchema
+
+from ._base_views import BaseListView
+from ._annotation_query import get_annotation_queryset
+from ._permissions import ProjectViewOnlyPermission
+from ._vector_search import batch_nearest_neighbors
+
+
+class StateNeighborsAPI(BaseListView):
+    """Batched nearest neighbor search of states on a `float_array` attribute.
+
+    This endpoint accepts the same query parameters as a GET request to the `States`
+    endpoint, and returns the nearest states matching them for each of many query vectors.
+    """
+
+    schema = StateNeighborsSchema()
+    permission_classes = [ProjectViewOnlyPermission]
+    http_method_names = ["put"]
+
+    def get_queryset(self, **kwargs):
+        return self.filter_only_viewables(
+            get_annotation_queryset(self.params["project"], self.params, "state")
+        )
+
+    def _put(self, params):
+        if "type" not in params:
+            raise ValueError("Must supply 'type' for a nearest neighbor search.")
+        entity_type = StateType.objects.get(project=params["project"], pk=params["type"])
+        return batch_nearest_neighbors(self.get_queryset(), StateVector, entity_type, params)
@@ -53,6 +53,7 @@ from .localization import LocalizationListSchema
 from .localization import LocalizationDetailSchema
 from .localization import LocalizationByElementalIdSchema
 from .localization_count import LocalizationCountSchema
+from .localization_neighbors import LocalizationNeighborsSchema
 from .localization_graphic import LocalizationGraphicSchema
 from .localization_type import LocalizationTypeListSchema
 from .localization_type import LocalizationTypeDetailSchema
@@ -84,6 +85,7 @@ from .state import StateDetailSchema
 from .state import StateByElementalIdSchema
 from .state import StateGraphicSchema
 from .state_count import StateCountSchema
+from .state_neighbors import StateNeighborsSchema
 from .state import MergeStatesSchema
 from .state import TrimStateEndSchema
 from .state_type import StateTypeListSchema
@@ -104,5 +106,7 @@ from .version import VersionDetailSchema
 from .video_file import VideoFileListSchema
 from .video_file import VideoFileDetailSchema
 from ._parse import parse
+from ._parse import warm_up
+from ._parse import write_parser_spec
 from ._generator import NoAliasRenderer
 from ._generator import CustomGenerator
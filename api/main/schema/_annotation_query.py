@@ -92,3 +92,15 @@ annotation_filter_parameter_schema = [
         "schema": {"type": "integer", "minimum": 0, "maximum": 1, "default": 0},
     },
 ]
+
+annotation_stream_parameter_schema = [
+    {
+        "name": "stream",
+        "in": "query",
+        "required": False,
+        "description": "If 1, results are read from the database in chunks and streamed to "
+        "the client as they are produced, keeping server memory usage flat regardless of the "
+        "size of the result. Supported for JSON and CSV output.",
+        "schema": {"type": "integer", "minimum": 0, "maximum": 1, "default": 0},
+    },
+]
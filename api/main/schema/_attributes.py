@@ -90,6 +90,16 @@ attribute_filter_parameter_schema = [
         "larger list to return.",
         "schema": {"type": "integer"},
     },
+    {
+        "name": "cursor",
+        "in": "query",
+        "required": False,
+        "description": "Pagination cursor. Opaque token returned in the `X-Next-Cursor` header "
+        "of the previous page when `stop` is given. Results begin after the last item of that "
+        "page using the same `sort_by`, `start` is ignored and `stop` is the page size. Unlike "
+        "`start`, the cost of a page does not grow with its depth.",
+        "schema": {"type": "string"},
+    },
     {
         "name": "encoded_search",
         "in": "query",
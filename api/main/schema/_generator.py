@@ -180,6 +180,8 @@ class CustomGenerator(SchemaGenerator):
                 "UserSpec": user_spec,
                 "UserUpdate": user_update,
                 "User": user,
+                "VectorSearchQuery": vector_search_query,
+                "VectorSearchResult": vector_search_result,
                 "VersionSpec": version_spec,
                 "VersionUpdate": version_update,
                 "Version": version,
@@ -1,7 +1,12 @@
+import hashlib
+import importlib.metadata
 import logging
 import json
+import os
 import re
+import tempfile
 
+from openapi_core import Config
 from openapi_core import OpenAPI
 from openapi_core.datatypes import RequestParameters
 from openapi_core.protocols import Request
@@ -14,6 +19,11 @@ logger = logging.getLogger(__name__)
 
 PATH_PARAMETER_PATTERN = r"(?:[^/<>]*)<(\w+)>([^/\[\]]*(?:\[\^[^/\]]*\][^/\[\]]*)*)"
 
+SCHEMA_DIR = os.path.dirname(os.path.abspath(__file__))
+# Libraries whose versions change the generated spec.
+FINGERPRINT_PACKAGES = ["django", "djangorestframework", "openapi-core", "openapi-spec-validator"]
+PARSER_SPEC_PATH = os.getenv("TATOR_PARSER_SPEC_PATH", os.path.join(SCHEMA_DIR, "parser_spec.json"))
+
 
 class DrfOpenAPIRequest(Request):
     path_regex = re.compile(PATH_PARAMETER_PATTERN)
@@ -74,12 +84,80 @@ class DrfOpenAPIRequest(Request):
         return self.request.content_type
 
 
+def _spec_fingerprint():
+    """Returns a digest of the sources and library versions the parser spec is generated from,
+    so a cached spec is only used with the code it was generated from."""
+    digest = hashlib.sha256()
+    for package in FINGERPRINT_PACKAGES:
+        try:
+            version = importlib.metadata.version(package)
+        except importlib.metadata.PackageNotFoundError:
+            version = None
+        digest.update(f"{package}=={version}".encode())
+    main_dir = os.path.dirname(SCHEMA_DIR)
+    paths = []
+    # Views and serializers are introspected by the generator as well as the schema modules.
+    for root, dirs, files in os.walk(main_dir):
+        dirs[:] = sorted(name for name in dirs if name not in ["__pycache__", "migrations"])
+        paths.extend(
+            os.path.join(root, name)
+            for name in sorted(files)
+            if name.endswith(".py") and name != "tests.py"
+        )
+    for path in paths:
+        digest.update(os.path.relpath(path, main_dir).encode())
+        with open(path, "rb") as source:
+            digest.update(source.read())
+    return digest.hexdigest()
+
+
+def generate_parser_spec():
+    """Generates the spec used to parse requests."""
+    generator = CustomGenerator(title="Tator REST API")
+    return generator.get_schema(parser=True)
+
+
+def write_parser_spec(path=PARSER_SPEC_PATH):
+    """Generates, validates and writes the parser spec to `path`. Run at image build via the
+    `buildparserspec` management command so workers can skip generation at startup."""
+    spec = generate_parser_spec()
+    OpenAPI.from_dict(spec)  # Raises if the spec is invalid.
+    contents = {"fingerprint": _spec_fingerprint(), "spec": spec}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(path), delete=False) as spec_file:
+        json.dump(contents, spec_file)
+    os.replace(spec_file.name, path)
+    return path
+
+
+def load_validator():
+    """Returns an `OpenAPI` validator, from the serialized spec if it is up to date."""
+    try:
+        with open(PARSER_SPEC_PATH, "r") as spec_file:
+            contents = json.load(spec_file)
+        if contents.get("fingerprint") == _spec_fingerprint():
+            # The cached spec was validated when it was written.
+            return OpenAPI.from_dict(contents["spec"], config=Config(spec_validator_cls=None))
+        logger.warning(f"Parser spec at {PARSER_SPEC_PATH} is stale, regenerating.")
+    except FileNotFoundError:
+        logger.info(f"No parser spec found at {PARSER_SPEC_PATH}, generating.")
+    except Exception:  # pylint: disable=broad-except
+        logger.warning(f"Failed to load parser spec from {PARSER_SPEC_PATH}!", exc_info=True)
+    return OpenAPI.from_dict(generate_parser_spec())
+
+
+def warm_up():
+    """Builds the validator and its request unmarshaller. Call before a worker accepts
+    traffic so the first request does not pay for it."""
+    if parse.validator is None:
+        parse.validator = load_validator()
+    parse.validator.request_unmarshaller  # pylint: disable=pointless-statement
+
+
 def parse(request):
     """Parses a request using Tator's generated OpenAPI spec."""
     if parse.validator is None:
-        generator = CustomGenerator(title="Tator REST API")
-        spec = generator.get_schema(parser=True)
-        parse.validator = OpenAPI.from_dict(spec)
+        parse.validator = load_validator()
     openapi_request = DrfOpenAPIRequest(request)
     result = parse.validator.unmarshal_request(openapi_request)
     result.raise_for_errors()
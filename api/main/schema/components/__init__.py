@@ -167,4 +167,5 @@ from ._common import message_response
 from ._errors import not_found_response
 from ._errors import bad_request_response
 from ._float_array_query import float_array_query
+from ._vector_search import vector_search_query, vector_search_result
 from .rowprotection import row_protection_spec, row_protection_update_spec, row_protection
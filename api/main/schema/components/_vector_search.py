@@ -0,0 +1,47 @@
+vector_search_query = {
+    "type": "object",
+    "required": ["name", "centers"],
+    "properties": {
+        "name": {
+            "description": "Name of the `float_array` attribute to search.",
+            "type": "string",
+        },
+        "centers": {
+            "description": "Query vectors. Each must have the size of the attribute.",
+            "type": "array",
+            "minItems": 1,
+            "maxItems": 10000,
+            "items": {"type": "array", "items": {"type": "number"}},
+        },
+        "metric": {
+            "description": "Distance metric from each center.",
+            "type": "string",
+            "enum": ["l2norm", "ip", "cosine"],
+            "default": "l2norm",
+        },
+        "k": {
+            "description": "Maximum number of nearest neighbors to return per center.",
+            "type": "integer",
+            "minimum": 1,
+            "maximum": 1000,
+            "default": 10,
+        },
+    },
+}
+
+vector_search_result = {
+    "type": "object",
+    "description": "Nearest neighbors of one query vector, closest first.",
+    "properties": {
+        "ids": {
+            "description": "IDs of the nearest objects.",
+            "type": "array",
+            "items": {"type": "integer"},
+        },
+        "distances": {
+            "description": "Distance of each object in `ids` from the query vector.",
+            "type": "array",
+            "items": {"type": "number"},
+        },
+    },
+}
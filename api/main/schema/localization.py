@@ -13,6 +13,7 @@ from ._attributes import (
 )
 from ._safety import safety_parameter_schema
 from ._annotation_query import annotation_filter_parameter_schema
+from ._annotation_query import annotation_stream_parameter_schema
 
 localization_filter_schema = [
     {
@@ -112,6 +113,8 @@ class LocalizationListSchema(AutoSchema):
                 + localization_filter_schema
                 + related_attribute_filter_parameter_schema
             )
+        if method in ["GET", "PUT"]:
+            params = params + annotation_stream_parameter_schema
         if method in ["PATCH", "DELETE"]:
             params += safety_parameter_schema
         return params
@@ -0,0 +1,85 @@
+from textwrap import dedent
+
+from rest_framework.schemas.openapi import AutoSchema
+
+from ._errors import error_responses
+from ._annotation_query import annotation_filter_parameter_schema
+from ._attributes import (
+    attribute_filter_parameter_schema,
+    related_attribute_filter_parameter_schema,
+)
+from .localization import localization_filter_schema
+
+boilerplate = dedent(
+    """\
+Finds the nearest localizations on a `float_array` attribute for each of many query vectors in a
+single request. This endpoint accepts the same query parameters as a GET request to the
+`Localizations` endpoint to restrict the search, and `type` is required. Results are returned in
+the order of the query vectors.
+"""
+)
+
+
+class LocalizationNeighborsSchema(AutoSchema):
+    def get_operation(self, path, method):
+        operation = super().get_operation(path, method)
+        if method == "PUT":
+            operation["operationId"] = "GetLocalizationNeighbors"
+        operation["tags"] = ["Tator"]
+        return operation
+
+    def get_description(self, path, method):
+        return f"Get nearest localizations of query vectors.\n\n{boilerplate}"
+
+    def get_path_parameters(self, path, method):
+        return [
+            {
+                "name": "project",
+                "in": "path",
+                "required": True,
+                "description": "A unique integer identifying a project.",
+                "schema": {"type": "integer"},
+            }
+        ]
+
+    def get_filter_parameters(self, path, method):
+        params = []
+        if method == "PUT":
+            params = (
+                annotation_filter_parameter_schema
+                + attribute_filter_parameter_schema
+                + localization_filter_schema
+                + related_attribute_filter_parameter_schema
+            )
+        return params
+
+    def get_request_body(self, path, method):
+        body = {}
+        if method == "PUT":
+            body = {
+                "required": True,
+                "content": {
+                    "application/json": {
+                        "schema": {
+                            "$ref": "#/components/schemas/VectorSearchQuery",
+                        },
+                    }
+                },
+            }
+        return body
+
+    def get_responses(self, path, method):
+        responses = error_responses()
+        if method == "PUT":
+            responses["200"] = {
+                "description": "Nearest neighbors of each query vector.",
+                "content": {
+                    "application/json": {
+                        "schema": {
+                            "type": "array",
+                            "items": {"$ref": "#/components/schemas/VectorSearchResult"},
+                        }
+                    }
+                },
+            }
+        return responses
@@ -1,19 +1,37 @@
 import logging
 import os
 import datetime
+from contextlib import contextmanager
 from copy import deepcopy
 from uuid import uuid1
 import re
+import threading
 import time
 import psycopg2
 from psycopg2 import sql
+from psycopg2.pool import ThreadedConnectionPool
 
 from .worker import push_job
 
-from django.db import connection
+from django.db import connection, transaction
 
 logger = logging.getLogger(__name__)
 
+HNSW_M = int(os.getenv("TATOR_HNSW_M", 16))
+HNSW_EF_CONSTRUCTION = int(os.getenv("TATOR_HNSW_EF_CONSTRUCTION", 64))
+SEARCH_POOL_SIZE = int(os.getenv("TATOR_SEARCH_POOL_SIZE", 4))
+INDEX_BUILD_PARALLELISM = int(os.getenv("TATOR_INDEX_BUILD_PARALLELISM", 2))
+
+# Classes of the advisory locks taken by index build runners.
+INDEX_BUILD_TABLE_LOCK = 7301
+INDEX_BUILD_SLOT_LOCK = 7302
+
+# Entity tables whose float_array attributes are copied into a `<table>vector` side table.
+VECTOR_TABLES = ["main_media", "main_localization", "main_state", "main_leaf"]
+
+_pools = {}
+_pools_lock = threading.Lock()
+
 # Indicates what types can mutate into. Maps from type -> to type.
 ALLOWED_MUTATIONS = {
     "bool": [],
@@ -29,16 +47,178 @@ ALLOWED_MUTATIONS = {
 }
 
 
-def get_connection(db_name):
-    conn = psycopg2.connect(
-        database=db_name,
-        host=os.getenv("POSTGRES_HOST"),
-        user=os.getenv("POSTGRES_USER"),
-        password=os.getenv("POSTGRES_PASSWORD"),
+class BlockingConnectionPool(ThreadedConnectionPool):
+    """Thread safe connection pool that waits for a connection to be returned when all of
+    them are in use, rather than raising PoolError.
+    """
+
+    def __init__(self, minconn, maxconn, *args, **kwargs):
+        self._available = threading.BoundedSemaphore(maxconn)
+        super().__init__(minconn, maxconn, *args, **kwargs)
+
+    def getconn(self, key=None):
+        self._available.acquire()
+        try:
+            return super().getconn(key)
+        except Exception:
+            self._available.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self._available.release()
+
+
+def _get_pool(db_name):
+    """Returns the connection pool of this process for a database."""
+    key = (os.getpid(), db_name)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = BlockingConnectionPool(
+                    0,
+                    SEARCH_POOL_SIZE,
+                    database=db_name,
+                    host=os.getenv("POSTGRES_HOST"),
+                    user=os.getenv("POSTGRES_USER"),
+                    password=os.getenv("POSTGRES_PASSWORD"),
+                )
+                _pools[key] = pool
+    return pool
+
+
+@contextmanager
+def get_cursor(db_name):
+    """Yields an autocommit cursor on a pooled connection, which is returned to the pool
+    afterwards. Connections broken by an error are discarded.
+    """
+    pool = _get_pool(db_name)
+    conn = pool.getconn()
+    try:
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cursor:
+            yield cursor
+    finally:
+        pool.putconn(conn, close=bool(conn.closed))
+
+
+def queue_index_build(project_id, table_name, index_name, function, args, priority):
+    """Records an index build to be run by `run_index_builds`. Does nothing if the same index
+    is already waiting to be built.
+
+    :param function: Index function of this module, called with the database name and `args`.
+    :param priority: Builds of a table run in increasing order of priority.
+    """
+    from .models import IndexBuild
+
+    if IndexBuild.objects.filter(index_name=index_name, status="queued").exists():
+        logger.info(f"Index '{index_name}' is already queued.")
+        return
+    IndexBuild.objects.create(
+        project_id=project_id,
+        table_name=table_name,
+        index_name=index_name,
+        function=function.__name__,
+        args=list(args),
+        priority=priority,
+    )
+    db_name = connection.settings_dict["NAME"]
+    transaction.on_commit(
+        lambda: push_job("db_jobs", run_index_builds, args=(db_name, table_name), result_ttl=0)
+    )
+
+
+def schedule_index_builds(db_name):
+    """Pushes a build runner for each table with queued index builds."""
+    with get_cursor(db_name) as cursor:
+        cursor.execute(
+            "SELECT table_name FROM main_indexbuild WHERE status='queued' "
+            "GROUP BY table_name ORDER BY min(priority), min(id)"
+        )
+        tables = [row[0] for row in cursor.fetchall()]
+    for table_name in tables:
+        push_job("db_jobs", run_index_builds, args=(db_name, table_name), result_ttl=0)
+
+
+def _next_index_build(cursor, table_name):
+    cursor.execute(
+        """UPDATE main_indexbuild SET status='running', started_datetime=now(),
+           attempts=attempts+1
+           WHERE id=(SELECT id FROM main_indexbuild WHERE table_name=%s AND status='queued'
+                     ORDER BY priority, id LIMIT 1)
+           RETURNING id, index_name, function, args""",
+        (table_name,),
     )
+    return cursor.fetchone()
+
 
-    conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
-    return conn
+def run_index_builds(db_name, table_name):
+    """Runs the queued index builds of a table one at a time. Session advisory locks ensure a
+    single runner per table and at most `TATOR_INDEX_BUILD_PARALLELISM` runners per database.
+    A runner that cannot get a slot exits, the table is picked up again when a runner holding
+    a slot finishes. Returns the number of builds that were run.
+    """
+    ran = 0
+    held_slot = False
+    with get_cursor(db_name) as cursor:
+        cursor.execute(
+            "SELECT pg_try_advisory_lock(%s, hashtext(%s))", (INDEX_BUILD_TABLE_LOCK, table_name)
+        )
+        if not cursor.fetchone()[0]:
+            logger.info(f"Index builds of {table_name} are already running.")
+            return ran
+        try:
+            slot = None
+            for candidate in range(INDEX_BUILD_PARALLELISM):
+                cursor.execute(
+                    "SELECT pg_try_advisory_lock(%s, %s)", (INDEX_BUILD_SLOT_LOCK, candidate)
+                )
+                if cursor.fetchone()[0]:
+                    slot = candidate
+                    break
+            if slot is None:
+                logger.info(f"All index build slots are taken, deferring {table_name}.")
+                return ran
+            held_slot = True
+            try:
+                # Builds marked as running by a worker that died are retried.
+                cursor.execute(
+                    "UPDATE main_indexbuild SET status='queued' "
+                    "WHERE table_name=%s AND status='running'",
+                    (table_name,),
+                )
+                while True:
+                    build = _next_index_build(cursor, table_name)
+                    if build is None:
+                        break
+                    build_id, index_name, function, args = build
+                    logger.info(f"Building index '{index_name}' on {table_name}...")
+                    try:
+                        globals()[function](db_name, *args)
+                        status, error = "succeeded", None
+                    except Exception as exc:
+                        logger.error(f"Failed to build index '{index_name}'!", exc_info=True)
+                        status, error = "failed", str(exc)
+                    cursor.execute(
+                        "UPDATE main_indexbuild SET status=%s, error=%s, finished_datetime=now() "
+                        "WHERE id=%s",
+                        (status, error, build_id),
+                    )
+                    ran += 1
+            finally:
+                cursor.execute("SELECT pg_advisory_unlock(%s, %s)", (INDEX_BUILD_SLOT_LOCK, slot))
+        finally:
+            cursor.execute(
+                "SELECT pg_advisory_unlock(%s, hashtext(%s))", (INDEX_BUILD_TABLE_LOCK, table_name)
+            )
+    if held_slot:
+        # Hand the freed slot to tables that were deferred, even if this runner found no work.
+        schedule_index_builds(db_name)
+    return ran
 
 
 def _get_unique_index_name(entity_type, attribute):
@@ -81,7 +261,7 @@ def _get_unique_index_name(entity_type, attribute):
     if attribute["name"].startswith("$"):
         # Native fields are only scoped to project, native-string types are project/type bound
         # Both need to incorporate type name in the name for uniqueness.
-        if attribute["dtype"] == "native":
+        if attribute["dtype"] in ["native", "media_frame"]:
             index_name = f"tator_proj_{entity_type.project.id}_{type_name_sanitized}_internalv2_{attribute_name_sanitized}"
         else:
             index_name = f"tator_proj_{entity_type.project.id}_{type_name_sanitized}_internalv2_{entity_name_sanitized}_{attribute_name_sanitized}"
@@ -109,7 +289,7 @@ def make_section_path_btree_index(
     concurrent_str = ""
     if concurrent:
         concurrent_str = "CONCURRENTLY"
-    with get_connection(db_name).cursor() as cursor:
+    with get_cursor(db_name) as cursor:
         if flush:
             cursor.execute(
                 sql.SQL("DROP INDEX {concurrent} IF EXISTS {index_name}").format(
@@ -141,7 +321,7 @@ def make_section_path_gist_index(
     concurrent_str = ""
     if concurrent:
         concurrent_str = "CONCURRENTLY"
-    with get_connection(db_name).cursor() as cursor:
+    with get_cursor(db_name) as cursor:
         if flush:
             cursor.execute(
                 sql.SQL("DROP INDEX {concurrent} IF EXISTS {index_name}").format(
@@ -177,7 +357,7 @@ def make_btree_index(
     concurrent_str = ""
     if concurrent:
         concurrent_str = "CONCURRENTLY"
-    with get_connection(db_name).cursor() as cursor:
+    with get_cursor(db_name) as cursor:
         if flush:
             cursor.execute(
                 sql.SQL("DROP INDEX {concurrent} IF EXISTS {index_name}").format(
@@ -235,6 +415,41 @@ def make_native_index(
     )
 
 
+def make_media_frame_index(
+    db_name, project_id, entity_type_id, table_name, index_name, attribute, flush, concurrent
+):
+    """Indexes the key combining media and frame that coincident annotation searches join on.
+    The expression must match `MediaFieldExpression` for the index to be used.
+    """
+    concurrent_str = ""
+    if concurrent:
+        concurrent_str = "CONCURRENTLY"
+    with get_cursor(db_name) as cursor:
+        if flush:
+            cursor.execute(
+                sql.SQL("DROP INDEX {concurrent} IF EXISTS {index_name}").format(
+                    index_name=sql.Identifier(index_name), concurrent=sql.SQL(concurrent_str)
+                )
+            )
+        cursor.execute(
+            "SELECT tablename,indexname,indexdef from pg_indexes where indexname = %s",
+            (index_name,),
+        )
+        if bool(cursor.fetchall()):
+            return
+        sql_str = sql.SQL(
+            """CREATE INDEX {concurrent} {index_name} ON {table_name}
+                        USING btree (((media::bigint << 32) | frame))
+                        WHERE project=%s"""
+        ).format(
+            index_name=sql.SQL(index_name),
+            concurrent=sql.SQL(concurrent_str),
+            table_name=sql.Identifier(table_name),
+        )
+        cursor.execute(sql_str, (project_id,))
+        print(sql_str)
+
+
 def make_bool_index(
     db_name, project_id, entity_type_id, table_name, index_name, attribute, flush, concurrent
 ):
@@ -290,7 +505,7 @@ def make_string_btree_index(
     concurrent_str = ""
     if concurrent:
         concurrent_str = "CONCURRENTLY"
-    with get_connection(db_name).cursor() as cursor:
+    with get_cursor(db_name) as cursor:
         if flush:
             cursor.execute(
                 sql.SQL("DROP INDEX {concurrent} IF EXISTS {index_name}").format(
@@ -326,7 +541,7 @@ def make_string_index(
     concurrent_str = ""
     if concurrent:
         concurrent_str = "CONCURRENTLY"
-    with get_connection(db_name).cursor() as cursor:
+    with get_cursor(db_name) as cursor:
         if flush:
             cursor.execute(
                 sql.SQL("DROP INDEX {concurrent} IF EXISTS {index_name}").format(
@@ -364,7 +579,7 @@ def make_upper_string_index(
     concurrent_str = ""
     if concurrent:
         concurrent_str = "CONCURRENTLY"
-    with get_connection(db_name).cursor() as cursor:
+    with get_cursor(db_name) as cursor:
         if flush:
             cursor.execute(
                 sql.SQL("DROP INDEX {concurrently} IF EXISTS {index_name}").format(
@@ -400,7 +615,7 @@ def make_upper_string_btree_index(
     concurrent_str = ""
     if concurrent:
         concurrent_str = "CONCURRENTLY"
-    with get_connection(db_name).cursor() as cursor:
+    with get_cursor(db_name) as cursor:
         if flush:
             cursor.execute(
                 sql.SQL("DROP INDEX {concurrently} IF EXISTS {index_name}").format(
@@ -436,7 +651,7 @@ def make_section_index(
     concurrent_str = ""
     if concurrent:
         concurrent_str = "CONCURRENTLY"
-    with get_connection(db_name).cursor() as cursor:
+    with get_cursor(db_name) as cursor:
         if flush:
             cursor.execute(
                 sql.SQL("DROP INDEX {concurrent} IF EXISTS {index_name}").format(
@@ -480,7 +695,7 @@ def make_section_generic_index(
     concurrent_str = ""
     if concurrent:
         concurrent_str = "CONCURRENTLY"
-    with get_connection(db_name).cursor() as cursor:
+    with get_cursor(db_name) as cursor:
         if flush:
             cursor.execute(
                 sql.SQL("DROP INDEX {concurrent} IF EXISTS {index_name}").format(
@@ -548,7 +763,7 @@ def make_native_string_btree_index(
     concurrent_str = ""
     if concurrent:
         concurrent_str = "CONCURRENTLY"
-    with get_connection(db_name).cursor() as cursor:
+    with get_cursor(db_name) as cursor:
         if flush:
             cursor.execute(
                 sql.SQL("DROP INDEX {concurrent} IF EXISTS {index_name}").format(
@@ -584,7 +799,7 @@ def make_native_string_index(
     concurrent_str = ""
     if concurrent:
         concurrent_str = "CONCURRENTLY"
-    with get_connection(db_name).cursor() as cursor:
+    with get_cursor(db_name) as cursor:
         if flush:
             cursor.execute(
                 sql.SQL("DROP INDEX {concurrent} IF EXISTS {index_name}").format(
@@ -634,7 +849,7 @@ def make_datetime_index(
         table_name=sql.Identifier(table_name),
         col_name=sql.SQL(col_name),
     )
-    with get_connection(db_name).cursor() as cursor:
+    with get_cursor(db_name) as cursor:
         if flush:
             cursor.execute(
                 sql.SQL("DROP INDEX {concurrent} IF EXISTS {index_name}").format(
@@ -669,7 +884,7 @@ def make_geopos_index(
         index_name=sql.Identifier(index_name),
         table_name=sql.Identifier(table_name),
     )
-    with get_connection(db_name).cursor() as cursor:
+    with get_cursor(db_name) as cursor:
         if flush:
             cursor.execute(
                 sql.SQL("DROP INDEX {concurrent} IF EXISTS {index_name}").format(
@@ -686,13 +901,16 @@ def make_geopos_index(
         print(sql_str)
 
 
-def make_vector_index(
+def make_legacy_vector_index(
     db_name, project_id, entity_type_id, table_name, index_name, attribute, flush, concurrent
 ):
+    """Creates one ivfflat index per distance metric on a float_array attribute cast from the
+    attributes of `table_name` itself.
+    """
     concurrent_str = ""
     if concurrent:
         concurrent_str = "CONCURRENTLY"
-    with get_connection(db_name).cursor() as cursor:
+    with get_cursor(db_name) as cursor:
         if flush:
             for method in ["l2", "ip", "cosine"]:
                 cursor.execute(
@@ -725,13 +943,96 @@ def make_vector_index(
                 method=sql.SQL(method),
                 table_name=sql.Identifier(table_name),
             )
-            print(sql_str)
             cursor.execute(sql_str, (project_id, entity_type_id))
             print(sql_str)
 
 
+def make_vector_index(
+    db_name, project_id, entity_type_id, table_name, index_name, attribute, flush, concurrent
+):
+    """Backfills the vector side table of `table_name` for a float_array attribute and creates
+    one partial HNSW index per distance metric on it. Legacy ivfflat indexes on the entity
+    table with the same names are replaced. Tables without a side table keep ivfflat indexes.
+    """
+    if table_name not in VECTOR_TABLES:
+        return make_legacy_vector_index(
+            db_name,
+            project_id,
+            entity_type_id,
+            table_name,
+            index_name,
+            attribute,
+            flush,
+            concurrent,
+        )
+    concurrent_str = ""
+    if concurrent:
+        concurrent_str = "CONCURRENTLY"
+    vector_table = f"{table_name}vector"
+    attr_name = attribute["name"]
+    attr_size = int(attribute["size"])
+    with get_cursor(db_name) as cursor:
+        # Copy values written before the side table existed, or before an attribute rename.
+        cursor.execute(
+            sql.SQL(
+                """INSERT INTO {vector_table} (entity, meta, name, embedding)
+                   SELECT id, meta, %s, (attributes->>%s)::vector FROM {table_name}
+                   WHERE meta=%s AND jsonb_typeof(attributes->%s)='array'
+                   AND attributes->%s <> '[]'::jsonb
+                   ON CONFLICT (entity, name) DO UPDATE SET embedding=EXCLUDED.embedding"""
+            ).format(
+                vector_table=sql.Identifier(vector_table),
+                table_name=sql.Identifier(table_name),
+            ),
+            (attr_name, attr_name, entity_type_id, attr_name, attr_name),
+        )
+        for method in ["l2", "ip", "cosine"]:
+            unique_vector_name = f"{index_name}_{method}"
+            cursor.execute(
+                "SELECT tablename,indexname,indexdef from pg_indexes where indexname = %s",
+                (unique_vector_name,),
+            )
+            existing = cursor.fetchall()
+            if existing and existing[0][0] == vector_table and not flush:
+                continue
+            if existing:
+                cursor.execute(
+                    sql.SQL("DROP INDEX {concurrent} IF EXISTS {index_name}").format(
+                        index_name=sql.SQL(unique_vector_name),
+                        concurrent=sql.SQL(concurrent_str),
+                    )
+                )
+            sql_str = sql.SQL(
+                """CREATE INDEX {concurrent} {index_name} ON {vector_table}
+                   USING hnsw((embedding::vector({attr_size})) vector_{method}_ops)
+                   WITH (m={m}, ef_construction={ef_construction})
+                   WHERE meta=%s AND name=%s;"""
+            ).format(
+                attr_size=sql.SQL(f"{attr_size}"),
+                concurrent=sql.SQL(concurrent_str),
+                index_name=sql.SQL(unique_vector_name),
+                method=sql.SQL(method),
+                vector_table=sql.Identifier(vector_table),
+                m=sql.SQL(f"{HNSW_M}"),
+                ef_construction=sql.SQL(f"{HNSW_EF_CONSTRUCTION}"),
+            )
+            cursor.execute(sql_str, (entity_type_id, attr_name))
+            print(sql_str)
+
+
+def delete_vectors(db_name, table_name, entity_type_id, name):
+    """Removes side table vectors of a float_array attribute that was deleted or renamed."""
+    with get_cursor(db_name) as cursor:
+        cursor.execute(
+            sql.SQL("DELETE FROM {vector_table} WHERE meta=%s AND name=%s").format(
+                vector_table=sql.Identifier(f"{table_name}vector")
+            ),
+            (entity_type_id, name),
+        )
+
+
 def delete_psql_index(db_name, index_name):
-    with get_connection(db_name).cursor() as cursor:
+    with get_cursor(db_name) as cursor:
         cursor.execute(
             sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {index_name}").format(
                 index_name=sql.SQL(index_name)
@@ -755,6 +1056,7 @@ class TatorSearch:
         "geopos": make_geopos_index,
         "float_array": make_vector_index,
         "native": make_native_index,
+        "media_frame": make_media_frame_index,
         "native_string": make_native_string_index,
         "native_string_btree": make_native_string_btree_index,
         "section": make_section_index,
@@ -766,7 +1068,7 @@ class TatorSearch:
 
     def list_indices(self, project):
         """Based on a project id, list all known indices"""
-        with get_connection(connection.settings_dict["NAME"]).cursor() as cursor:
+        with get_cursor(connection.settings_dict["NAME"]) as cursor:
             cursor.execute(
                 "SELECT tablename,indexname,indexdef from pg_indexes where indexname LIKE '{}'".format(
                     f"tator_proj_{project}_%"
@@ -782,15 +1084,32 @@ class TatorSearch:
                 "db_jobs", delete_psql_index, args=(connection.settings_dict["NAME"], index_name)
             )
 
-    def delete_index(self, entity_type, attribute):
-        """Delete the index for a given entity type"""
+    def index_names(self, entity_type, attribute):
+        """Returns the names of all indices built for an attribute of an entity type"""
         index_name = _get_unique_index_name(entity_type, attribute)
         if attribute["dtype"] == "float_array":
-            index_names = [index_name + "_l2", index_name + "_ip", index_name + "_cosine"]
+            return [index_name + "_l2", index_name + "_ip", index_name + "_cosine"]
         elif attribute["dtype"] == "string":
-            index_names = [index_name, index_name + "_btree", index_name + "_upper_btree"]
+            return [index_name, index_name + "_btree", index_name + "_upper_btree"]
         else:
-            index_names = [index_name]
+            return [index_name]
+
+    def delete_index(self, entity_type, attribute):
+        """Delete the index for a given entity type"""
+        index_names = self.index_names(entity_type, attribute)
+        table_name = entity_type._meta.db_table.replace("type", "")
+        if attribute["dtype"] == "float_array" and table_name in VECTOR_TABLES:
+            push_job(
+                "db_jobs",
+                delete_vectors,
+                args=(
+                    connection.settings_dict["NAME"],
+                    table_name,
+                    entity_type.id,
+                    attribute["name"],
+                ),
+                result_ttl=0,
+            )
 
         for name in index_names:
             push_job(
@@ -803,7 +1122,7 @@ class TatorSearch:
     def is_index_present(self, entity_type, attribute):
         """Returns true if the index exists for this attribute"""
         index_name = _get_unique_index_name(entity_type, attribute)
-        with get_connection(connection.settings_dict["NAME"]).cursor() as cursor:
+        with get_cursor(connection.settings_dict["NAME"]) as cursor:
             if attribute["dtype"] == "float_array":
                 cursor.execute(
                     "SELECT tablename,indexname,indexdef from pg_indexes where indexname LIKE '{}%'".format(
@@ -822,7 +1141,7 @@ class TatorSearch:
                 return bool(result)
 
     def is_index_present_by_name(self, index_name):
-        with get_connection(connection.settings_dict["NAME"]).cursor() as cursor:
+        with get_cursor(connection.settings_dict["NAME"]) as cursor:
             cursor.execute(
                 "SELECT tablename,indexname,indexdef from pg_indexes where indexname = '{}'".format(
                     index_name
@@ -864,11 +1183,19 @@ class TatorSearch:
 
         table_name = entity_type._meta.db_table.replace("type", "")
         index_name = _get_unique_index_name(entity_type, attribute)
-        push_job(
-            "db_jobs",
+        # Built-in indices are built first and vector indices, the slowest to build, last.
+        if attribute["name"].startswith("$") or attribute["dtype"].startswith("section"):
+            priority = 0
+        elif attribute["dtype"] == "float_array":
+            priority = 2
+        else:
+            priority = 1
+        queue_index_build(
+            entity_type.project.id,
+            table_name,
+            index_name,
             index_func,
-            args=(
-                connection.settings_dict["NAME"],
+            (
                 entity_type.project.id,
                 entity_type.id,
                 table_name,
@@ -877,7 +1204,7 @@ class TatorSearch:
                 flush,
                 concurrent,
             ),
-            result_ttl=0,
+            priority,
         )
 
     def create_mapping(self, entity_type, flush=False, concurrent=True):
@@ -895,31 +1222,23 @@ class TatorSearch:
         btree_index_name = f"tator_proj_{project.pk}_internalv2_path_btree"
         gist_index_name = f"tator_proj_{project.pk}_internalv2_path_gist"
         if self.is_index_present_by_name(btree_index_name) is False or flush is True:
-            push_job(
-                "db_jobs",
+            queue_index_build(
+                project.pk,
+                "main_section",
+                btree_index_name,
                 make_section_path_btree_index,
-                args=(
-                    connection.settings_dict["NAME"],
-                    project.pk,
-                    btree_index_name,
-                    flush,
-                    concurrent,
-                ),
-                result_ttl=0,
+                (project.pk, btree_index_name, flush, concurrent),
+                0,
             )
 
         if self.is_index_present_by_name(gist_index_name) is False or flush is True:
-            push_job(
-                "db_jobs",
+            queue_index_build(
+                project.pk,
+                "main_section",
+                gist_index_name,
                 make_section_path_gist_index,
-                args=(
-                    connection.settings_dict["NAME"],
-                    project.pk,
-                    gist_index_name,
-                    flush,
-                    concurrent,
-                ),
-                result_ttl=0,
+                (project.pk, gist_index_name, flush, concurrent),
+                0,
             )
 
     def rename_alias(self, entity_type, old_name, new_name):
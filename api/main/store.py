@@ -3,12 +3,14 @@ from copy import deepcopy
 from datetime import datetime, timedelta
 from enum import Enum, unique
 import base64
+import hashlib
 import uuid
 import json
 import logging
 from oci.object_storage import ObjectStorageClient
 from oci.object_storage.models import RenameObjectDetails
 import os
+import threading
 from typing import IO, List, Optional, Tuple, Union
 from urllib.parse import urlsplit, urlunsplit
 
@@ -606,7 +608,7 @@ class GCPStorage(TatorStorage):
         Create a dictionary that matches the response from boto3.
         """
         blob = self._get_blob(path)
-        return {"ContentLength": blob.size, "StorageClass": blob.storage_class}
+        return {"ContentLength": blob.size, "ETag": blob.etag, "StorageClass": blob.storage_class}
 
     def object_tagged_for_archive(self, path):
         blob = self._get_blob(path)
@@ -741,6 +743,7 @@ class AzureStorage(TatorStorage):
         return {
             "ContentLength": properties.size,
             "ContentType": properties.content_settings.content_type,
+            "ETag": properties.etag,
             "LastModified": properties.last_modified,
             "StorageClass": properties.blob_tier,
         }
@@ -907,6 +910,61 @@ class AzureStorage(TatorStorage):
         blob_client.set_standard_blob_tier(desired_storage_class)
 
 
+class _TatorStoreCache:
+    """Thread-safe, per-process cache of TatorStorage instances. Entries are keyed by bucket id
+    and a hash of everything used to construct the store, so a stale entry is never returned
+    for a modified bucket even if the invalidating signal fired in another process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stores = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, factory):
+        with self._lock:
+            store = self._stores.get(key)
+            if store is not None:
+                self.hits += 1
+                return store
+            self.misses += 1
+        # Build the client outside of the lock, it may be slow.
+        store = factory()
+        with self._lock:
+            return self._stores.setdefault(key, store)
+
+    def invalidate(self, bucket_id=None):
+        with self._lock:
+            if bucket_id is None:
+                self._stores.clear()
+            else:
+                for key in [key for key in self._stores if key[0] == bucket_id]:
+                    del self._stores[key]
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._stores)}
+
+
+_store_cache = _TatorStoreCache()
+
+
+def _store_cache_key(bucket_key, *args):
+    digest = hashlib.sha256(json.dumps(args, sort_keys=True, default=str).encode()).hexdigest()
+    return (bucket_key, digest)
+
+
+def invalidate_tator_store_cache(bucket_id=None):
+    """Drops cached stores for the given bucket id, or all cached stores if `bucket_id` is None."""
+    _store_cache.invalidate(bucket_id)
+
+
+def get_tator_store_cache_stats() -> dict:
+    """Returns hit and miss counters and the current size of the per-process store cache."""
+    return _store_cache.stats()
+
+
 def get_tator_store(
     bucket=None, connect_timeout=5, read_timeout=5, max_attempts=5, upload=False, backup=False
 ) -> TatorStorage:
@@ -985,10 +1043,25 @@ def get_tator_store(
             f"Received bucket {bucket} as input, which is missing its `config` field."
         )
 
-    client = _client_from_config(
-        store_type, config, bucket_name, connect_timeout, read_timeout, max_attempts
+    def _create_store():
+        client = _client_from_config(
+            store_type, config, bucket_name, connect_timeout, read_timeout, max_attempts
+        )
+        return TatorStorage.get_tator_store(store_type, bucket, client, bucket_name, external_host)
+
+    key = _store_cache_key(
+        bucket.pk if bucket is not None else f"DEFAULT_{bucket_type}",
+        store_type.value,
+        config,
+        bucket_name,
+        external_host,
+        getattr(bucket, "archive_sc", None),
+        getattr(bucket, "live_sc", None),
+        connect_timeout,
+        read_timeout,
+        max_attempts,
     )
-    return TatorStorage.get_tator_store(store_type, bucket, client, bucket_name, external_host)
+    return _store_cache.get(key, _create_store)
 
 
 def get_storage_lookup(resources):
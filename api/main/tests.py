@@ -12,7 +12,12 @@ import re
 import requests
 import io
 import base64
+import tempfile
+import threading
 import unittest
+import importlib.util
+import psycopg2
+from types import SimpleNamespace
 
 from main.models import *
 
@@ -26,13 +31,24 @@ from botocore.errorfactory import ClientError
 from main.throttles import BurstableThrottle
 
 from .backup import TatorBackupManager
+from . import frame_decoder, index_advisor
+from .cache import ATTRIBUTE_USAGE_KEY, TatorCache
 from .models import *
-from .search import TatorSearch, ALLOWED_MUTATIONS
-from .store import get_tator_store, PATH_KEYS
+from .search import (
+    TatorSearch,
+    ALLOWED_MUTATIONS,
+    BlockingConnectionPool,
+    _get_unique_index_name,
+    delete_psql_index,
+    get_cursor,
+    make_vector_index,
+)
+from .store import get_tator_store, get_tator_store_cache_stats, PATH_KEYS
 from .util import update_queryset_archive_state, memberships_to_rowp, affiliations_to_rowp
 from ._permission_util import PermissionMask, shift_permission
+from .rest import _attribute_query, _attributes, _graphic_cache, _media_util, _util
 
-from django.db import transaction
+from django.db import connection, transaction
 
 logger = logging.getLogger(__name__)
 
@@ -682,6 +698,30 @@ class ElementalIDChangeMixin:
         for obj in response.data:
             self.assertEqual(obj["elemental_id"], new_elemental_id)
 
+    def test_bulk_create_marks(self):
+        model = type(self.entities[0])
+        elemental_id = uuid4()
+
+        def bulk_create(deleted_flags):
+            objs = []
+            for deleted in deleted_flags:
+                obj = model.objects.get(pk=self.entities[0].pk)
+                obj.pk = None
+                obj.elemental_id = elemental_id
+                obj.deleted = deleted
+                objs.append(obj)
+            model.objects.bulk_create(objs)
+
+        # Deleted rows take the next mark but do not advance it, as with per row triggers.
+        bulk_create([False, False, True, False])
+        qs = model.objects.filter(elemental_id=elemental_id).order_by("id")
+        self.assertEqual(list(qs.values_list("mark", flat=True)), [0, 1, 2, 2])
+        self.assertEqual(set(qs.values_list("latest_mark", flat=True)), {2})
+
+        bulk_create([False, False])
+        self.assertEqual(list(qs.values_list("mark", flat=True)), [0, 1, 2, 2, 3, 4])
+        self.assertEqual(set(qs.values_list("latest_mark", flat=True)), {4})
+
 
 class EntityAuthorChangeMixin:
     def test_author_change(self):
@@ -1444,6 +1484,32 @@ class AttributeMediaTestMixin:
         assertResponse(self, response, status.HTTP_200_OK)
 
 
+class StreamTestMixin:
+    def test_stream(self):
+        response = self.client.get(
+            f"/rest/{self.list_uri}/{self.project.pk}?type={self.entity_type.pk}&format=json"
+        )
+        assertResponse(self, response, status.HTTP_200_OK)
+        streamed = self.client.get(
+            f"/rest/{self.list_uri}/{self.project.pk}?type={self.entity_type.pk}&format=json"
+            f"&stream=1"
+        )
+        self.assertEqual(streamed.status_code, status.HTTP_200_OK)
+        self.assertTrue(streamed.streaming)
+        streamed_data = json.loads(b"".join(streamed.streaming_content))
+        self.assertEqual(
+            sorted(e["id"] for e in streamed_data), sorted(e["id"] for e in response.data)
+        )
+        streamed = self.client.get(
+            f"/rest/{self.list_uri}/{self.project.pk}?type={self.entity_type.pk}&format=csv"
+            f"&stream=1"
+        )
+        self.assertEqual(streamed.status_code, status.HTTP_200_OK)
+        lines = b"".join(streamed.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), len(self.entities) + 1)
+        self.assertIn("Bool Test", lines[0])
+
+
 class AttributeTestMixin:
     def test_query_no_attributes(self):
         response = self.client.get(
@@ -1496,6 +1562,85 @@ class AttributeTestMixin:
         if len(response.data) >= 2 and len(response1.data) >= 1:
             self.assertEqual(response.data[1], response1.data[0])
 
+    def test_cursor_pagination(self):
+        base_url = (
+            f"/rest/{self.list_uri}/{self.project.pk}"
+            f"?format=json&type={self.entity_type.pk}&sort_by=-Int Test"
+        )
+        response = self.client.get(base_url)
+        assertResponse(self, response, status.HTTP_200_OK)
+        expected_ids = [e["id"] for e in response.data]
+
+        page_ids = []
+        response = self.client.get(f"{base_url}&stop=2")
+        while True:
+            assertResponse(self, response, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data), 2)
+            page_ids += [e["id"] for e in response.data]
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+            response = self.client.get(f"{base_url}&stop=2&cursor={cursor}")
+        self.assertEqual(page_ids, expected_ids)
+
+        # Cursors are only valid for the sort order they were created with.
+        response = self.client.get(f"{base_url}&stop=1")
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is not None:
+            response = self.client.get(
+                f"/rest/{self.list_uri}/{self.project.pk}"
+                f"?format=json&type={self.entity_type.pk}&stop=1&cursor={cursor}"
+            )
+            assertResponse(self, response, status.HTTP_400_BAD_REQUEST)
+
+        # Attributes set to null sort apart from missing attributes, pages must not skip either.
+        # With only one null and otherwise missing values, the first ascending page ends on the
+        # null and every following row lacks the attribute.
+        model = type(self.entities[0])
+        for idx, entity in enumerate(model.objects.filter(pk__in=[e.pk for e in self.entities])):
+            if idx == 0:
+                entity.attributes["Int Test"] = None
+                null_id = entity.pk
+            else:
+                entity.attributes.pop("Int Test", None)
+            entity.save()
+        for sort_by in ["Int Test", "-Int Test"]:
+            base_url = (
+                f"/rest/{self.list_uri}/{self.project.pk}"
+                f"?format=json&type={self.entity_type.pk}&sort_by={sort_by}"
+            )
+            response = self.client.get(base_url)
+            expected_ids = [e["id"] for e in response.data]
+            self.assertEqual(len(expected_ids), len(self.entities))
+            page_ids = []
+            response = self.client.get(f"{base_url}&stop=1")
+            while True:
+                assertResponse(self, response, status.HTTP_200_OK)
+                page_ids += [e["id"] for e in response.data]
+                cursor = response.headers.get("X-Next-Cursor")
+                if cursor is None:
+                    break
+                response = self.client.get(f"{base_url}&stop=1&cursor={cursor}")
+            self.assertEqual(page_ids, expected_ids)
+            if sort_by == "Int Test":
+                self.assertEqual(page_ids[0], null_id)
+
+    def test_empty_page_fine_grain(self):
+        old_setting = os.environ.get("TATOR_FINE_GRAIN_PERMISSION")
+        os.environ["TATOR_FINE_GRAIN_PERMISSION"] = "true"
+        try:
+            base_url = (
+                f"/rest/{self.list_uri}/{self.project.pk}?format=json&type={self.entity_type.pk}"
+            )
+            response = self.client.get(f"{base_url}&start=100000&stop=100002")
+            assertResponse(self, response, status.HTTP_200_OK)
+            self.assertEqual(response.data, [])
+        finally:
+            if old_setting is None:
+                os.environ.pop("TATOR_FINE_GRAIN_PERMISSION")
+            else:
+                os.environ["TATOR_FINE_GRAIN_PERMISSION"] = old_setting
+
     def test_sorting(self):
         response = self.client.get(
             f"/rest/{self.list_uri}/{self.project.pk}"
@@ -2578,6 +2723,27 @@ class VideoTestCase(
         self.patch_json = {"name": "video1", "last_edit_start": "2017-07-21T17:32:28Z"}
         memberships_to_rowp(self.project.pk, force=False, verbose=False)
 
+    def test_next_prev(self):
+        for query in ["", "&sort_by=-Float Test", "&sort_by=$name&sort_by=-$id"]:
+            response = self.client.get(
+                f"/rest/Medias/{self.project.pk}?type={self.entity_type.pk}{query}"
+            )
+            assertResponse(self, response, status.HTTP_200_OK)
+            ids = [media["id"] for media in response.data]
+            for idx, media_id in enumerate(ids):
+                response = self.client.get(
+                    f"/rest/MediaNext/{media_id}?type={self.entity_type.pk}{query}"
+                )
+                assertResponse(self, response, status.HTTP_200_OK)
+                expected = ids[idx + 1] if idx + 1 < len(ids) else -1
+                self.assertEqual(response.data["next"], expected)
+                response = self.client.get(
+                    f"/rest/MediaPrev/{media_id}?type={self.entity_type.pk}{query}"
+                )
+                assertResponse(self, response, status.HTTP_200_OK)
+                expected = ids[idx - 1] if idx > 0 else -1
+                self.assertEqual(response.data["prev"], expected)
+
     def test_search(self):
         box_type = LocalizationType.objects.create(
             name="boxes",
@@ -2751,6 +2917,22 @@ class VideoTestCase(
         self.assertEqual(response.data[0]["attributes"]["String Test"], "Zoo")
         self.assertEqual(response.data[0]["attributes"]["Enum Test"], "enum_val4")
 
+        # The reverse direction finds the state on the frame of the box.
+        response = self.client.put(
+            f"/rest/States/{self.project.pk}",
+            {
+                "object_search": {
+                    "attribute": "$coincident_localizations",
+                    "operation": "search",
+                    "value": {"attribute": "String Test", "operation": "eq", "value": "Zoo"},
+                }
+            },
+            format="json",
+        )
+        self.assertEqual([obj["id"] for obj in response.data], [state.id])
+        media_frame_index = {"name": "$media_frame", "dtype": "media_frame"}
+        self.assertTrue(TatorSearch().is_index_present(box_type, media_frame_index))
+
         response = self.client.put(
             f"/rest/Localizations/{self.project.pk}",
             {"frame_state_ids": [state_2.id]},
@@ -3090,6 +3272,7 @@ class ImageTestCase(
 class LocalizationBoxTestCase(
     TatorTransactionTest,
     AttributeTestMixin,
+    StreamTestMixin,
     AttributeMediaTestMixin,
     DefaultCreateTestMixin,
     PermissionCreateTestMixin,
@@ -3171,6 +3354,327 @@ class LocalizationBoxTestCase(
         self.patch_json = {"name": "box1", "in_place": 1}
         memberships_to_rowp(self.project.pk, force=False, verbose=False)
 
+    def test_copy_ingest(self):
+        elemental_id = uuid4()
+        create_json = [
+            {**self.create_json[0], "elemental_id": str(elemental_id), "frame": idx}
+            for idx in range(5)
+        ]
+        create_json[0]["attributes"] = {**create_json[0]["attributes"], "String Test": "a\tb\\c"}
+        old_threshold = _util.COPY_INGEST_THRESHOLD
+        _util.COPY_INGEST_THRESHOLD = 1
+        try:
+            response = self.client.post(
+                f"/rest/{self.list_uri}/{self.project.pk}", create_json, format="json"
+            )
+        finally:
+            _util.COPY_INGEST_THRESHOLD = old_threshold
+        assertResponse(self, response, status.HTTP_201_CREATED)
+        ids = response.data["id"]
+        self.assertEqual(len(ids), len(create_json))
+        created = Localization.objects.filter(pk__in=ids).order_by("id")
+        self.assertEqual(list(created.values_list("id", flat=True)), ids)
+        self.assertEqual(list(created.values_list("frame", flat=True)), list(range(5)))
+        self.assertEqual(list(created.values_list("mark", flat=True)), list(range(5)))
+        self.assertEqual(created[0].attributes["String Test"], "a\tb\\c")
+        self.assertEqual(created[0].created_by, self.user)
+        self.assertIsNotNone(created[0].created_datetime)
+        ref_ids = ChangeToObject.objects.filter(ref_id__in=ids).values_list("ref_id", flat=True)
+        self.assertEqual(sorted(ref_ids), ids)
+
+    def test_vector_storage(self):
+        self.entity_type.attribute_types.append(
+            {"name": "Embedding Test", "dtype": "float_array", "size": 3}
+        )
+        self.entity_type.save()
+        embeddings = [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.9, 0.1, 0.0]]
+        create_json = [
+            {
+                **self.create_json[0],
+                "attributes": {**self.create_json[0]["attributes"], "Embedding Test": embedding},
+            }
+            for embedding in embeddings
+        ]
+        response = self.client.post(
+            f"/rest/{self.list_uri}/{self.project.pk}", create_json, format="json"
+        )
+        assertResponse(self, response, status.HTTP_201_CREATED)
+        ids = response.data["id"]
+        vectors = LocalizationVector.objects.filter(entity__in=ids, name="Embedding Test")
+        self.assertEqual(vectors.count(), len(ids))
+
+        response = self.client.patch(
+            f"/rest/{self.detail_uri}/{ids[1]}",
+            {"in_place": 1, "attributes": {"Embedding Test": [0.8, 0.0, 0.2]}},
+            format="json",
+        )
+        assertResponse(self, response, status.HTTP_200_OK)
+        vector = LocalizationVector.objects.get(entity=ids[1], name="Embedding Test")
+        self.assertEqual([round(val, 3) for val in vector.embedding], [0.8, 0.0, 0.2])
+
+        response = self.client.put(
+            f"/rest/{self.list_uri}/{self.project.pk}?type={self.entity_type.pk}",
+            {"float_array": [{"name": "Embedding Test", "center": [1.0, 0.0, 0.0]}]},
+            format="json",
+        )
+        assertResponse(self, response, status.HTTP_200_OK)
+        self.assertEqual([loc["id"] for loc in response.data], [ids[0], ids[2], ids[1]])
+
+        # Empty arrays cannot be cast to vectors and are left out of the side table.
+        empty_json = {
+            **self.create_json[0],
+            "attributes": {**self.create_json[0]["attributes"], "Embedding Test": []},
+        }
+        response = self.client.post(
+            f"/rest/{self.list_uri}/{self.project.pk}", [empty_json], format="json"
+        )
+        assertResponse(self, response, status.HTTP_201_CREATED)
+        self.assertFalse(LocalizationVector.objects.filter(entity=response.data["id"][0]).exists())
+        response = self.client.patch(
+            f"/rest/{self.detail_uri}/{ids[2]}",
+            {"in_place": 1, "attributes": {"Embedding Test": []}},
+            format="json",
+        )
+        assertResponse(self, response, status.HTTP_200_OK)
+        self.assertFalse(LocalizationVector.objects.filter(entity=ids[2]).exists())
+
+    def test_batch_neighbors(self):
+        self.entity_type.attribute_types.append(
+            {"name": "Embedding Test", "dtype": "float_array", "size": 2}
+        )
+        self.entity_type.save()
+        embeddings = [[1.0, 0.0], [0.0, 1.0], [0.7, 0.7]]
+        create_json = [
+            {
+                **self.create_json[0],
+                "media_id": self.media_entities[0].pk,
+                "attributes": {**self.create_json[0]["attributes"], "Embedding Test": embedding},
+            }
+            for embedding in embeddings
+        ]
+        response = self.client.post(
+            f"/rest/{self.list_uri}/{self.project.pk}", create_json, format="json"
+        )
+        assertResponse(self, response, status.HTTP_201_CREATED)
+        ids = response.data["id"]
+
+        endpoint = f"/rest/LocalizationNeighbors/{self.project.pk}?type={self.entity_type.pk}"
+        body = {"name": "Embedding Test", "centers": [[1.0, 0.0], [0.0, 1.0]], "k": 2}
+        response = self.client.put(endpoint, body, format="json")
+        assertResponse(self, response, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(response.data[0]["ids"], [ids[0], ids[2]])
+        self.assertEqual(response.data[1]["ids"], [ids[1], ids[2]])
+        self.assertAlmostEqual(response.data[0]["distances"][0], 0.0)
+
+        # List filters restrict the candidates.
+        response = self.client.put(f"{endpoint}&attribute=Bool Test::false", body, format="json")
+        assertResponse(self, response, status.HTTP_200_OK)
+        self.assertEqual(response.data, [{"ids": [], "distances": []}] * 2)
+
+        body["centers"] = [[1.0, 0.0, 0.0]]
+        response = self.client.put(endpoint, body, format="json")
+        assertResponse(self, response, status.HTTP_400_BAD_REQUEST)
+
+    def test_filtered_neighbors(self):
+        attribute = {"name": "Embedding Test", "dtype": "float_array", "size": 2}
+        self.entity_type.attribute_types.append(attribute)
+        self.entity_type.save()
+        # Decoys closest to the center are filtered out, the only match is far away.
+        points = [(False, [1.0, 0.01 * idx]) for idx in range(20)] + [(True, [-1.0, 0.0])]
+        create_json = [
+            {
+                **self.create_json[0],
+                "attributes": {
+                    **self.create_json[0]["attributes"],
+                    "Bool Test": match,
+                    "Embedding Test": embedding,
+                },
+            }
+            for match, embedding in points
+        ]
+        response = self.client.post(
+            f"/rest/{self.list_uri}/{self.project.pk}", create_json, format="json"
+        )
+        assertResponse(self, response, status.HTTP_201_CREATED)
+        target = response.data["id"][-1]
+
+        db_name = connection.settings_dict["NAME"]
+        ts = TatorSearch()
+        index_name = _get_unique_index_name(self.entity_type, attribute)
+        make_vector_index(
+            db_name,
+            self.project.pk,
+            self.entity_type.pk,
+            "main_localization",
+            index_name,
+            attribute,
+            False,
+            False,
+        )
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SET hnsw.ef_search = 1")
+                cursor.execute("SET enable_seqscan = off")
+            response = self.client.put(
+                f"/rest/LocalizationNeighbors/{self.project.pk}"
+                f"?type={self.entity_type.pk}&attribute=Bool Test::true",
+                {"name": "Embedding Test", "centers": [[1.0, 0.0]], "k": 1},
+                format="json",
+            )
+            assertResponse(self, response, status.HTTP_200_OK)
+            self.assertEqual(response.data[0]["ids"], [target])
+            self.assertAlmostEqual(response.data[0]["distances"][0], 2.0)
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute("RESET hnsw.ef_search")
+                cursor.execute("RESET enable_seqscan")
+            for name in ts.index_names(self.entity_type, attribute):
+                delete_psql_index(db_name, name)
+
+    def test_index_builds(self):
+        builds = IndexBuild.objects.filter(project=self.project, table_name="main_localization")
+        self.assertTrue(builds.exists())
+        # Builds are marked finished right after their index appears.
+        for _ in range(100):
+            if not builds.filter(status__in=["queued", "running"]).exists():
+                break
+            time.sleep(0.1)
+        self.assertEqual(builds.filter(status="succeeded").count(), builds.count())
+
+        db_name = connection.settings_dict["NAME"]
+        with get_cursor(db_name) as cursor:
+            first = cursor.connection
+        with get_cursor(db_name) as cursor:
+            self.assertIs(cursor.connection, first)
+
+        # A full pool waits for a connection to be returned instead of raising.
+        pool = BlockingConnectionPool(
+            0,
+            1,
+            database=db_name,
+            host=os.getenv("POSTGRES_HOST"),
+            user=os.getenv("POSTGRES_USER"),
+            password=os.getenv("POSTGRES_PASSWORD"),
+        )
+        conn = pool.getconn()
+        waiter = threading.Thread(target=lambda: pool.putconn(pool.getconn()))
+        waiter.start()
+        waiter.join(0.2)
+        self.assertTrue(waiter.is_alive())
+        pool.putconn(conn)
+        waiter.join(5)
+        self.assertFalse(waiter.is_alive())
+        pool.closeall()
+
+    def test_index_advisor(self):
+        TatorCache().rds.delete(ATTRIBUTE_USAGE_KEY)
+        _attribute_query.ATTRIBUTE_USAGE_SAMPLE_RATE = 1.0
+        index_advisor.ATTRIBUTE_USAGE_SAMPLE_RATE = 1.0
+        try:
+            response = self.client.get(
+                f"/rest/{self.list_uri}/{self.project.pk}?attribute=Int Test::5"
+            )
+            assertResponse(self, response, status.HTTP_200_OK)
+            usage = TatorCache().get_attribute_usage()
+            self.assertEqual(usage[("localizationtype", self.entity_type.pk, "Int Test")], 1)
+
+            decisions = index_advisor.advise_indices(
+                self.project.pk, population_limit=0, min_scans=10**9
+            )
+        finally:
+            _attribute_query.ATTRIBUTE_USAGE_SAMPLE_RATE = 0.01
+            index_advisor.ATTRIBUTE_USAGE_SAMPLE_RATE = 0.01
+            TatorCache().rds.delete(ATTRIBUTE_USAGE_KEY)
+        actions = {
+            decision.attribute: decision.action
+            for decision in decisions
+            if decision.type_id == self.entity_type.pk
+        }
+        self.assertEqual(actions["Int Test"], "keep")
+        self.assertEqual(actions["Float Test"], "drop")
+        history = IndexDecision.objects.filter(project=self.project, type_id=self.entity_type.pk)
+        self.assertEqual(history.count(), len(actions))
+        self.assertFalse(history.filter(applied=True).exists())
+        # Dry runs leave the indices in place.
+        ts = TatorSearch()
+        for attribute in self.entity_type.attribute_types:
+            if attribute["name"] == "Float Test":
+                self.assertTrue(ts.is_index_present(self.entity_type, attribute))
+
+        # Without sampled usage nothing is dropped.
+        decisions = index_advisor.advise_indices(
+            self.project.pk, population_limit=10**9, min_scans=10**9
+        )
+        self.assertTrue(all(decision.action == "keep" for decision in decisions))
+
+    def test_async_changelog(self):
+        endpoint = f"/rest/{self.list_uri}/{self.project.pk}"
+        _util.flush_changelogs()
+        # Keep a running db worker from writing the queue to its own database.
+        old_push_job = _util.push_job
+        _util.push_job = lambda *args, **kwargs: None
+        _util.CHANGELOG_ASYNC = True
+        try:
+            response = self.client.post(endpoint, self.create_json * 3, format="json")
+            assertResponse(self, response, status.HTTP_201_CREATED)
+            ids = response.data["id"]
+            response = self.client.patch(
+                endpoint, {"ids": ids, "attributes": {"Int Test": 5}}, format="json"
+            )
+            assertResponse(self, response, status.HTTP_200_OK)
+        finally:
+            _util.CHANGELOG_ASYNC = False
+            _util.push_job = old_push_job
+        self.assertFalse(ChangeToObject.objects.filter(ref_id__in=ids).exists())
+        lag = _util.changelog_lag()
+        self.assertEqual(lag["pending"], 4)
+        self.assertGreaterEqual(lag["lag_seconds"], 0)
+
+        self.assertEqual(_util.flush_changelogs(), 4)
+        self.assertEqual(_util.changelog_lag(), {"pending": 0, "lag_seconds": 0.0})
+        for ref_id in ids:
+            changes = ChangeToObject.objects.filter(ref_id=ref_id)
+            self.assertEqual(changes.count(), 2)
+        update = ChangeToObject.objects.filter(ref_id=ids[0]).latest("id").change_id
+        self.assertEqual(update.user, self.user)
+        self.assertEqual(ChangeToObject.objects.filter(change_id=update).count(), len(ids))
+
+        # Changelogs of a rolled back transaction never reach the outbox.
+        try:
+            with transaction.atomic():
+                _util.CHANGELOG_ASYNC = True
+                response = self.client.patch(
+                    endpoint, {"ids": ids, "attributes": {"Int Test": 6}}, format="json"
+                )
+                assertResponse(self, response, status.HTTP_200_OK)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        finally:
+            _util.CHANGELOG_ASYNC = False
+        self.assertEqual(_util.changelog_lag()["pending"], 0)
+
+    def test_create_with_parent(self):
+        endpoint = f"/rest/{self.list_uri}/{self.project.pk}"
+        parent = self.entities[0]
+        create_json = [{**self.create_json[0], "parent": parent.pk} for _ in range(3)]
+        response = self.client.post(endpoint, create_json, format="json")
+        assertResponse(self, response, status.HTTP_201_CREATED)
+        for localization in Localization.objects.filter(pk__in=response.data["id"]):
+            self.assertEqual(localization.parent_id, parent.pk)
+            self.assertEqual(localization.elemental_id, parent.elemental_id)
+
+        missing = Localization.objects.order_by("-id").first().pk + 1000
+        create_json = [
+            {**self.create_json[0], "parent": parent.pk},
+            {**self.create_json[0], "parent": missing},
+            {**self.create_json[0], "parent": missing + 1},
+        ]
+        response = self.client.post(endpoint, create_json, format="json")
+        assertResponse(self, response, status.HTTP_404_NOT_FOUND)
+        self.assertIn(str([missing, missing + 1]), response.data["message"])
+
 
 class LocalizationLineTestCase(
     TatorTransactionTest,
@@ -3422,6 +3926,7 @@ class LocalizationPolyTestCase(
 class StateTestCase(
     TatorTransactionTest,
     AttributeTestMixin,
+    StreamTestMixin,
     AttributeMediaTestMixin,
     DefaultCreateTestMixin,
     PermissionCreateTestMixin,
@@ -3500,6 +4005,26 @@ class StateTestCase(
         self.patch_json = {"name": "state1", "in_place": 1}
         memberships_to_rowp(self.project.pk, force=False, verbose=False)
 
+    def test_variant_keeps_relations(self):
+        original = State.objects.get(pk=self.entities[0].pk)
+        media_ids = sorted(original.media.values_list("id", flat=True))
+        response = self.client.patch(
+            f"/rest/{self.list_uri}/{self.project.pk}",
+            {"elemental_ids": [str(original.elemental_id)], "attributes": {"Int Test": 7}},
+            format="json",
+        )
+        assertResponse(self, response, status.HTTP_200_OK)
+        variant = State.objects.filter(
+            elemental_id=original.elemental_id, version=original.version
+        ).latest("mark")
+        self.assertNotEqual(variant.pk, original.pk)
+        self.assertEqual(variant.mark, original.mark + 1)
+        self.assertEqual(variant.latest_mark, variant.mark)
+        self.assertEqual(variant.created_datetime, original.created_datetime)
+        self.assertEqual(variant.attributes["Int Test"], 7)
+        self.assertEqual(variant.attributes["Float Test"], original.attributes["Float Test"])
+        self.assertEqual(sorted(variant.media.values_list("id", flat=True)), media_ids)
+
     def test_elemental_id(self):
         # Test on type object
         new_uuid = str(uuid4())
@@ -4978,6 +5503,20 @@ class BucketTestCase(
         response = self.client.post(endpoint, self.create_json, format="json")
         assertResponse(self, response, status.HTTP_403_FORBIDDEN)
 
+    def test_store_cache(self):
+        bucket = self.entities[0]
+        store = get_tator_store(bucket)
+        stats = get_tator_store_cache_stats()
+        self.assertIs(get_tator_store(Bucket.objects.get(pk=bucket.pk)), store)
+        self.assertEqual(get_tator_store_cache_stats()["hits"], stats["hits"] + 1)
+
+        # Modifying the bucket invalidates the cached store.
+        bucket.external_host = "https://example.com"
+        bucket.save()
+        new_store = get_tator_store(bucket)
+        self.assertIsNot(new_store, store)
+        self.assertEqual(new_store.external_host, "https://example.com")
+
 
 class ImageFileTestCase(TatorTransactionTest, FileMixin):
     def setUp(self):
@@ -7076,6 +7615,104 @@ class AdvancedPermissionTestCase(TatorTransactionTest):
                         else:
                             assert localization.effective_permission == 0x00
 
+    def test_permission_cache(self):
+        from main._permission_util import get_project_permissions
+
+        user = self.random_user
+        masks = get_project_permissions(user, self.project.pk)
+        self.assertEqual(masks["project"], 0)
+        self.assertEqual(masks["sections"], {})
+
+        # Cached masks are served without touching the database.
+        with self.assertNumQueries(0):
+            get_project_permissions(user, self.project.pk)
+
+        # Row protection changes invalidate the cache.
+        rp = RowProtection.objects.create(
+            user=user, section=self.public_section, permission=0x030303
+        )
+        masks = get_project_permissions(user, self.project.pk)
+        self.assertEqual(masks["sections"], {self.public_section.pk: 0x030303})
+        RowProtection.objects.create(user=user, project=self.project, permission=0x0101)
+        self.assertEqual(get_project_permissions(user, self.project.pk)["project"], 0x0101)
+        rp.delete()
+        self.assertEqual(get_project_permissions(user, self.project.pk)["sections"], {})
+
+        # So do group membership changes.
+        RowProtection.objects.create(group=self.groups[2], project=self.project, permission=0x0202)
+        GroupMembership.objects.create(user=user, group=self.groups[2])
+        self.assertEqual(get_project_permissions(user, self.project.pk)["project"], 0x0303)
+
+    def test_effective_permission_table(self):
+        from django.core.management import call_command
+        from main._permission_util import compute_effective_permissions
+
+        def _materialized(user):
+            return {
+                (scope, target): permission
+                for scope, target, permission in EffectivePermission.objects.filter(
+                    user=user
+                ).values_list("scope", "target", "permission")
+            }
+
+        user = self.random_user
+        RowProtection.objects.create(user=user, project=self.project, permission=0x0101)
+        RowProtection.objects.create(
+            group=self.groups[2], section=self.public_section, permission=0x030303
+        )
+        version_rp = RowProtection.objects.create(
+            organization=self.organization, version=self.readonly_version, permission=0x0303
+        )
+        self.assertEqual(_materialized(user), {("project", self.project.pk): 0x0101})
+
+        # Group memberships and affiliations are applied by triggers.
+        membership = GroupMembership.objects.create(user=user, group=self.groups[2])
+        Affiliation.objects.create(user=user, organization=self.organization)
+        expected = _materialized(user)
+        self.assertEqual(expected, compute_effective_permissions(user))
+        self.assertEqual(expected[("section", self.public_section.pk)], 0x030303)
+        self.assertEqual(expected[("version", self.readonly_version.pk)], 0x0303)
+        membership.delete()
+        self.assertNotIn(("section", self.public_section.pk), _materialized(user))
+        version_rp.permission = 0x0101
+        version_rp.save()
+        self.assertEqual(_materialized(user)[("version", self.readonly_version.pk)], 0x0101)
+
+        # A rebuild produces the same table and verifies against row protections.
+        expected = _materialized(user)
+        call_command("rebuildpermissions")
+        self.assertEqual(_materialized(user), expected)
+
+        # Refreshes wait for the one in progress, so each reads the other's committed changes.
+        settings = connection.settings_dict
+        blocker = psycopg2.connect(
+            dbname=settings["NAME"],
+            host=settings["HOST"],
+            port=settings["PORT"] or None,
+            user=settings["USER"],
+            password=settings["PASSWORD"],
+        )
+
+        def _join_group():
+            try:
+                GroupMembership.objects.create(user=user, group=self.groups[2])
+            finally:
+                connection.close()
+
+        try:
+            with blocker.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", (EFFECTIVE_PERMISSION_LOCK,))
+            waiter = threading.Thread(target=_join_group)
+            waiter.start()
+            waiter.join(0.5)
+            self.assertTrue(waiter.is_alive())
+            blocker.rollback()
+            waiter.join(10)
+            self.assertFalse(waiter.is_alive())
+        finally:
+            blocker.close()
+        self.assertIn(("section", self.public_section.pk), _materialized(user))
+
 
 class GroupTestCase(TatorTransactionTest):
     def setUp(self):
@@ -7504,3 +8141,366 @@ if os.getenv("TATOR_FINE_GRAIN_PERMISSION") == "true":
             self.client.force_authenticate(user=self.red_shirt)
             resp = self.client.get(f"/rest/Medias/{self.project.pk}")
             assertResponse(self, resp, status.HTTP_403_FORBIDDEN)
+
+
+class GraphicCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        print(f"\n{self.__class__.__name__}=", end="", flush=True)
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.old_dir = _graphic_cache.GRAPHIC_CACHE_DIR
+        self.old_max_bytes = _graphic_cache.GRAPHIC_CACHE_MAX_BYTES
+        _graphic_cache.GRAPHIC_CACHE_DIR = self.temp_dir.name
+        _graphic_cache.GRAPHIC_CACHE_MAX_BYTES = 1000
+        _graphic_cache.GraphicCache._size = None
+        _graphic_cache.GraphicCache._unsynced = 0
+        self.media = SimpleNamespace(
+            pk=1, modified_datetime=datetime.datetime.now(datetime.timezone.utc)
+        )
+
+    def tearDown(self):
+        _graphic_cache.GRAPHIC_CACHE_DIR = self.old_dir
+        _graphic_cache.GRAPHIC_CACHE_MAX_BYTES = self.old_max_bytes
+        _graphic_cache.GraphicCache._size = None
+        _graphic_cache.GraphicCache._unsynced = 0
+        self.temp_dir.cleanup()
+
+    def test_get_set(self):
+        cache = _graphic_cache.GraphicCache
+        key = _graphic_cache.graphic_cache_key(self.media, frames=["0"], format="jpg")
+        self.assertNotEqual(
+            key, _graphic_cache.graphic_cache_key(self.media, frames=["1"], format="jpg")
+        )
+        self.assertIsNone(cache.get(key))
+        cache.set(key, b"frame")
+        self.assertEqual(cache.get(key), b"frame")
+        self.assertGreater(cache.get_stats()["local_hits"], 0)
+
+        # Modifying the media changes the key.
+        self.media.modified_datetime += datetime.timedelta(seconds=1)
+        self.assertNotEqual(
+            key, _graphic_cache.graphic_cache_key(self.media, frames=["0"], format="jpg")
+        )
+
+    def test_eviction(self):
+        cache = _graphic_cache.GraphicCache
+        keys = [_graphic_cache.graphic_cache_key(self.media, frames=[str(idx)]) for idx in range(5)]
+        for idx, key in enumerate(keys):
+            cache.set(key, bytes(300))
+            # Make recency unambiguous regardless of file system timestamp resolution.
+            os.utime(cache._path(key), (idx, idx))
+        self.assertIsNone(cache.get(keys[0]))
+        self.assertEqual(cache.get(keys[-1]), bytes(300))
+
+    def test_shared_directory(self):
+        cache = _graphic_cache.GraphicCache
+        keys = [_graphic_cache.graphic_cache_key(self.media, frames=[str(idx)]) for idx in range(2)]
+        cache.set(keys[0], bytes(300))
+        # Entries written by another process and files still being written.
+        other = os.path.join(self.temp_dir.name, "ab", "ab" + "0" * 62)
+        os.makedirs(os.path.dirname(other), exist_ok=True)
+        with open(other, "wb") as other_file:
+            other_file.write(bytes(900))
+        os.utime(other, (0, 0))
+        in_flight = os.path.join(self.temp_dir.name, "ab", _graphic_cache.TEMP_PREFIX + "x")
+        with open(in_flight, "wb") as temp_file:
+            temp_file.write(bytes(500))
+        cache.set(keys[1], bytes(300))
+        self.assertFalse(os.path.exists(other))
+        self.assertTrue(os.path.exists(in_flight))
+        self.assertEqual(cache.get(keys[1]), bytes(300))
+
+    def test_disk_errors(self):
+        cache = _graphic_cache.GraphicCache
+        key = _graphic_cache.graphic_cache_key(self.media, frames=["0"])
+        not_a_dir = os.path.join(self.temp_dir.name, "file")
+        with open(not_a_dir, "wb") as data_file:
+            data_file.write(b"x")
+        _graphic_cache.GRAPHIC_CACHE_DIR = not_a_dir
+        cache.set(key, b"frame")
+        self.assertIsNone(cache.get(key))
+
+
+class SegmentIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        print(f"\n{self.__class__.__name__}=", end="", flush=True)
+        segments = [
+            {"name": "ftyp", "offset": 0, "size": 24},
+            {"name": "moov", "offset": 24, "size": 100},
+        ]
+        offset = 124
+        for frame_start in range(0, 100, 10):
+            segments.append(
+                {
+                    "name": "moof",
+                    "offset": offset,
+                    "size": 50,
+                    "frame_start": frame_start,
+                    "frame_samples": 10,
+                }
+            )
+            segments.append({"name": "mdat", "offset": offset + 50, "size": 1000})
+            offset += 1050
+        self.segment_info = {"segments": segments}
+
+    def test_impacted_segments(self):
+        util = _media_util.MediaUtil.__new__(_media_util.MediaUtil)
+        util._external_fetch = None
+        util._segment_index = _media_util.SegmentIndex(self.segment_info)
+        segment_list = util._get_impacted_segments(["0", "9", "10", "55", "99", "100"])
+        self.assertEqual(
+            segment_list,
+            [
+                (0, [0, 1, 2, 3]),
+                (9, [0, 1, 2, 3]),
+                (10, [0, 1, 4, 5]),
+                (55, [0, 1, 12, 13]),
+                (99, [0, 1, 20, 21]),
+            ],
+        )
+        segment_info = []
+        sc_graph, segment_frame_start = util._scatter_gather(55, [0, 1, 12, 13], segment_info)
+        self.assertEqual(sc_graph, [(0, 124), (124 + 5 * 1050, 1050)])
+        self.assertEqual(segment_frame_start, 50)
+        self.assertEqual(segment_info, [{"frame_start": 50, "num_frames": 10}])
+
+    def test_fetch_ranges(self):
+        data = bytes(idx % 256 for idx in range(124 + 10 * 1050))
+        requests = []
+
+        class _Storage:
+            def get_object(self, path, start=None, stop=None):
+                requests.append((start, stop))
+                return data[start : stop + 1]
+
+        util = _media_util.MediaUtil.__new__(_media_util.MediaUtil)
+        util._external_fetch = None
+        util._video_file = "video.mp4"
+        util._storage = _Storage()
+        util._segment_index = _media_util.SegmentIndex(self.segment_info)
+        segment_list = util._get_impacted_segments([5, 15, 95])
+        old_gap = _media_util.RANGE_COALESCE_GAP
+        _media_util.RANGE_COALESCE_GAP = 1000
+        try:
+            lookup, _ = util.make_video_buffers(segment_list)
+        finally:
+            _media_util.RANGE_COALESCE_GAP = old_gap
+        first = 124 + 1050
+        self.assertEqual(lookup[5][1], data[:first])
+        self.assertEqual(lookup[15][1], data[:124] + data[first : first + 1050])
+        self.assertEqual(lookup[95][1], data[:124] + data[124 + 9 * 1050 :])
+        # Header and adjacent moofs are coalesced, the distant moof is a separate request.
+        self.assertEqual(
+            sorted(requests), [(0, 124 + 2 * 1050 - 1), (124 + 9 * 1050, len(data) - 1)]
+        )
+
+
+class FrameDecoderTestCase(unittest.TestCase):
+    def setUp(self):
+        print(f"\n{self.__class__.__name__}=", end="", flush=True)
+
+    @staticmethod
+    def _image(color, size=(64, 48), fmt="png"):
+        from PIL import Image
+
+        buf = io.BytesIO()
+        Image.new("RGB", size, color).save(buf, fmt)
+        return buf.getvalue()
+
+    @staticmethod
+    def _open(data):
+        from PIL import Image
+
+        return Image.open(io.BytesIO(data))
+
+    def test_decode_image(self):
+        data = self._image((200, 0, 0))
+        out = frame_decoder.decode_image(data, crop=(32, 24, 10, 10), render_format="png")
+        self.assertTrue(out.startswith(b"\x89PNG"))
+        self.assertEqual(self._open(out).size, (32, 24))
+        # Crops are clipped to the image and scaling happens after cropping.
+        out = frame_decoder.decode_image(data, crop=(100, 100, 40, 40), scale=(8, 4))
+        self.assertTrue(out.startswith(b"\xff\xd8"))
+        img = self._open(out)
+        self.assertEqual(img.size, (8, 4))
+        self.assertGreater(img.getpixel((4, 2))[0], 180)
+
+    def test_tile_images(self):
+        colors = [(255, 0, 0), (0, 255, 0), (0, 0, 255)]
+        images = [self._image(color, size=(10, 10)) for color in colors]
+        img = self._open(frame_decoder.tile_images(images, "2x2", "png"))
+        self.assertEqual(img.size, (20, 20))
+        self.assertEqual(img.getpixel((5, 5))[:3], colors[0])
+        self.assertEqual(img.getpixel((15, 5))[:3], colors[1])
+        self.assertEqual(img.getpixel((5, 15))[:3], colors[2])
+
+    @unittest.skipUnless(importlib.util.find_spec("av"), "PyAV is not installed")
+    def test_decode_frame(self):
+        import av
+        from PIL import Image
+
+        buf = io.BytesIO()
+        with av.open(buf, mode="w", format="mp4") as container:
+            stream = container.add_stream("mpeg4", rate=10)
+            stream.width = 64
+            stream.height = 48
+            stream.pix_fmt = "yuv420p"
+            for idx in range(4):
+                img = Image.new("RGB", (64, 48), (idx * 60,) * 3)
+                for packet in stream.encode(av.VideoFrame.from_image(img)):
+                    container.mux(packet)
+            for packet in stream.encode():
+                container.mux(packet)
+        data = buf.getvalue()
+
+        for idx in range(4):
+            out = frame_decoder.decode_frame(data, idx, scale=(32, 24), render_format="png")
+            img = self._open(out)
+            self.assertEqual(img.size, (32, 24))
+            self.assertAlmostEqual(img.getpixel((16, 12))[0], idx * 60, delta=12)
+        with self.assertRaises(ValueError):
+            frame_decoder.decode_frame(data, 4)
+
+
+class ParserSpecTestCase(unittest.TestCase):
+    def setUp(self):
+        print(f"\n{self.__class__.__name__}=", end="", flush=True)
+
+    def test_load_validator(self):
+        from .schema import _parse
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            old_path = _parse.PARSER_SPEC_PATH
+            _parse.PARSER_SPEC_PATH = os.path.join(temp_dir, "parser_spec.json")
+            try:
+                _parse.write_parser_spec(_parse.PARSER_SPEC_PATH)
+                with open(_parse.PARSER_SPEC_PATH) as spec_file:
+                    contents = json.load(spec_file)
+                self.assertEqual(contents["fingerprint"], _parse._spec_fingerprint())
+                validator = _parse.load_validator()
+                self.assertIn("/rest/Projects", validator.spec.contents()["paths"])
+            finally:
+                _parse.PARSER_SPEC_PATH = old_path
+
+
+class AttributeValidatorTestCase(unittest.TestCase):
+    def setUp(self):
+        print(f"\n{self.__class__.__name__}=", end="", flush=True)
+        self.attribute_types = [
+            {"name": "Int", "dtype": "int", "minimum": 0},
+            {"name": "Enum", "dtype": "enum", "choices": ["a", "b"], "default": "a"},
+            {"name": "Datetime", "dtype": "datetime", "use_current": True},
+            {"name": "Bool", "dtype": "bool", "default": False},
+            {"name": "Geo", "dtype": "geopos", "required": False},
+        ]
+
+    def test_matches_convert_attribute(self):
+        validator = _attributes.AttributeValidator(self.attribute_types)
+        values = ["3", "x", "2024-05-01 10:00", "2024-05-01T10:00:00Z", True, 1, -1, "true", "1_2"]
+        for attr_type in self.attribute_types:
+            for value in values:
+                try:
+                    expected = _attributes.convert_attribute(attr_type, value)
+                except Exception as exc:
+                    expected = str(exc)
+                try:
+                    result = validator.convert(attr_type["name"], value)
+                except Exception as exc:
+                    result = str(exc)
+                self.assertEqual(result, expected)
+
+    def test_check_required(self):
+        validator = _attributes.AttributeValidator(self.attribute_types)
+        bodies = [
+            {"attributes": {"Int": "3", "Enum": "b", "Datetime": "2024-01-01", "Geo": [1, 2]}},
+            {"attributes": {"Int": 3, "Bool": "true"}},
+        ]
+        attrs = validator.check_required(bodies)
+        self.assertEqual(attrs[0]["Int"], 3)
+        self.assertEqual(attrs[0]["Datetime"], "2024-01-01T00:00:00")
+        self.assertEqual(attrs[0]["Geo"], [1.0, 2.0])
+        self.assertEqual(attrs[0]["Bool"], False)
+        self.assertEqual(attrs[1]["Enum"], "a")
+        self.assertTrue(attrs[1]["Bool"])
+        self.assertNotIn("Geo", attrs[1])
+        with self.assertRaises(ValueError):
+            validator.check_required([{"attributes": {"Enum": "a"}}])
+
+    def test_cache(self):
+        type_obj = LocalizationType(id=1, attribute_types=self.attribute_types)
+        validator = _attributes.get_attribute_validator(type_obj)
+        self.assertIs(_attributes.get_attribute_validator(type_obj), validator)
+        type_obj.attribute_types = self.attribute_types[:1]
+        self.assertIsNot(_attributes.get_attribute_validator(type_obj), validator)
+
+
+class AuthProjectTestCase(TatorTransactionTest):
+    def setUp(self):
+        print(f"\n{self.__class__.__name__}=", end="", flush=True)
+        super().setUp()
+        from rest_framework.authtoken.models import Token
+
+        self.member = create_test_user(username="member")
+        self.outsider = create_test_user(username="outsider")
+        self.project = create_test_project(self.member)
+        create_test_membership(self.member, self.project)
+        self.member_token = Token.objects.create(user=self.member)
+        self.outsider_token = Token.objects.create(user=self.outsider)
+
+    def _auth(self, token):
+        return self.client.get(
+            "/auth-project",
+            HTTP_X_ORIGINAL_URI=f"/media/{self.project.pk}/1/video.mp4",
+            HTTP_AUTHORIZATION=f"Token {token}",
+        )
+
+    def test_auth_project(self):
+        self.assertEqual(self._auth(self.member_token.key).status_code, 200)
+        self.assertEqual(self._auth(self.outsider_token.key).status_code, 403)
+        self.assertEqual(self._auth("bad_token").status_code, 403)
+
+        # Grants, denials and token lookups are served from cache.
+        with self.assertNumQueries(0):
+            self.assertEqual(self._auth(self.member_token.key).status_code, 200)
+            self.assertEqual(self._auth(self.outsider_token.key).status_code, 403)
+            self.assertEqual(self._auth("bad_token").status_code, 403)
+
+        # Membership changes invalidate decisions cached in redis.
+        self.assertFalse(TatorCache().get_cred_cache(self.outsider.pk, self.project.pk))
+        create_test_membership(self.outsider, self.project)
+        self.assertIsNone(TatorCache().get_cred_cache(self.outsider.pk, self.project.pk))
+        # Denials are not cached in process, so new members are granted access right away.
+        self.assertEqual(self._auth(self.outsider_token.key).status_code, 200)
+
+    def test_cred_cache_expiration(self):
+        cache = TatorCache()
+        cache.set_cred_cache(self.outsider.pk, self.project.pk, False, ttl=1)
+        cache.set_cred_cache(self.member.pk, self.project.pk, True, ttl=60)
+        self.assertFalse(cache.get_cred_cache(self.outsider.pk, self.project.pk))
+        time.sleep(1.5)
+        # Each decision expires on its own even though the project group is still alive.
+        self.assertIsNone(cache.get_cred_cache(self.outsider.pk, self.project.pk))
+        self.assertTrue(cache.get_cred_cache(self.member.pk, self.project.pk))
+        cache.invalidate_cred_cache(self.project.pk)
+
+
+class PresignCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        print(f"\n{self.__class__.__name__}=", end="", flush=True)
+        self.cache = TatorCache()
+        self.user = f"presign_test_{uuid4()}"
+
+    def test_mget_mset_presigned(self):
+        self.cache.mset_presigned(self.user, {"a/b.mp4": "url_a", "c/d.png": "url_c"}, ttl=1)
+        self.cache.set_presigned(self.user, "e/f.json", "url_e", ttl=60)
+
+        # Hits are returned in one lookup, misses are omitted and duplicates collapse.
+        urls = self.cache.mget_presigned(self.user, ["a/b.mp4", "missing", "c/d.png", "a/b.mp4"])
+        self.assertEqual(urls, {"a/b.mp4": "url_a", "c/d.png": "url_c"})
+        self.assertEqual(self.cache.mget_presigned(self.user, []), {})
+        self.assertEqual(self.cache.mget_presigned("other_user", ["a/b.mp4"]), {})
+
+        # Entries expire with their own TTL.
+        time.sleep(1.5)
+        urls = self.cache.mget_presigned(self.user, ["a/b.mp4", "c/d.png", "e/f.json"])
+        self.assertEqual(urls, {"e/f.json": "url_e"})
+        self.cache.rds.delete(f"{self.user}__e/f.json")
@@ -277,6 +277,10 @@ urlpatterns += [
         "rest/LocalizationCount/<int:project>",
         LocalizationCountAPI.as_view(),
     ),
+    path(
+        "rest/LocalizationNeighbors/<int:project>",
+        LocalizationNeighborsAPI.as_view(),
+    ),
     path(
         "rest/LocalizationTypes/<int:project>",
         LocalizationTypeListAPI.as_view(),
@@ -381,6 +385,10 @@ urlpatterns += [
         StateCountAPI.as_view(),
         name="StateCount",
     ),
+    path(
+        "rest/StateNeighbors/<int:project>",
+        StateNeighborsAPI.as_view(),
+    ),
     path("rest/StateGraphic/<int:id>", StateGraphicAPI.as_view(), name="StateGraphic"),
     path(
         "rest/State/<int:id>",
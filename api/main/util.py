@@ -147,9 +147,7 @@ def buildSearchIndices(project_ids=None, flush=False, concurrent=True):
     for type_ in list(FileType.objects.filter(project__in=projects)):
         TatorSearch().create_mapping(type_, flush, concurrent)
     logger.info("Dispatch complete!")
-    logger.info(
-        "To watch status, use `rq info` at the gunicorn shell OR the top-level rq-info make target"
-    )
+    logger.info("To watch status, use `python3 manage.py indexbuilds` at the gunicorn shell")
 
 
 def makeDefaultVersion(project_number):
@@ -1070,12 +1068,12 @@ def convert_old_buckets():
 
 
 def upgrade_vector_db():
-    from main.models import LocalizationType, MediaType, StateType
-    from main.search import get_connection, TatorSearch
+    from main.models import LeafType, LocalizationType, MediaType, StateType
+    from main.search import get_cursor, TatorSearch
     from django.db import connection
     import time
 
-    with get_connection(connection.settings_dict["NAME"]).cursor() as cursor:
+    with get_cursor(connection.settings_dict["NAME"]) as cursor:
         cursor.execute("ALTER EXTENSION vector UPDATE;")
 
     ts = TatorSearch()
@@ -1084,6 +1082,7 @@ def upgrade_vector_db():
         *LocalizationType.objects.all(),
         *MediaType.objects.all(),
         *StateType.objects.all(),
+        *LeafType.objects.all(),
     ]:
         for attribute_info in entity_type.attribute_types:
             if attribute_info["dtype"] == "float_array":
@@ -12,13 +12,19 @@ from django.conf import settings
 
 from django.template.response import TemplateResponse
 from rest_framework.authentication import TokenAuthentication
+from rest_framework.authentication import get_authorization_header
 
 from .models import Project
 from .models import Membership
 from .notify import Notify
 from .cache import TatorCache
 
+from collections import OrderedDict
+import hashlib
 import logging
+import os
+import threading
+import time
 
 import sys
 import traceback
@@ -85,28 +91,86 @@ class StreamSaverMITMLocal(ProjectBase, TemplateView):
         return response
 
 
-def validate_project(user, project):
-    # We only cache 'True' effectively with this logic
-    granted = TatorCache().get_cred_cache(user.id, project.id)
-    if granted:
+class _TTLCache:
+    """Small thread safe LRU cache whose entries expire after a fixed time."""
+
+    def __init__(self, ttl, max_entries):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self._ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self._ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+
+# Access decisions and token lookups are cached briefly in process, because nginx checks every
+# media file request (including each video segment) with `AuthProjectView`.
+AUTH_CACHE_TTL = int(os.getenv("TATOR_AUTH_CACHE_TTL", 30))
+_access_cache = _TTLCache(AUTH_CACHE_TTL, 10000)
+_token_cache = _TTLCache(AUTH_CACHE_TTL, 10000)
+_MISSING = object()
+
+
+def validate_project(user, project_id):
+    """Returns True if the user is a member of the project. Grants are cached in process and in
+    redis, denials only in redis. The redis cache is invalidated when a membership changes,
+    which processes cannot observe, so denials are not cached in process. Otherwise newly added
+    members would keep being denied."""
+    if isinstance(user, AnonymousUser):
+        return False
+    key = (user.id, project_id)
+    granted = _access_cache.get(key)
+    if granted is not None:
         return granted
 
-    if isinstance(user, AnonymousUser):
-        granted = False
-    else:
+    tator_cache = TatorCache()
+    granted = tator_cache.get_cred_cache(user.id, project_id)
+    if granted is None:
         # Find membership for this user and project
-        membership = Membership.objects.filter(user=user, project=project)
-
-        # If user is not part of project, deny access
-        if membership.count() == 0:
-            granted = False
-        else:
-            # Only cache granted attempts
-            granted = True
-            TatorCache().set_cred_cache(user.id, project.id, granted)
+        granted = Membership.objects.filter(user=user, project=project_id).exists()
+        tator_cache.set_cred_cache(user.id, project_id, granted)
+    if granted:
+        _access_cache.set(key, granted)
     return granted
 
 
+def _authenticate_token(request):
+    """Returns the user for the token in the authorization header, or None if the token is
+    missing or invalid."""
+    key = hashlib.sha256(get_authorization_header(request)).hexdigest()
+    user = _token_cache.get(key, _MISSING)
+    if user is _MISSING:
+        try:
+            user, _ = TokenAuthentication().authenticate(request)
+        except Exception:
+            user = None
+        _token_cache.set(key, user)
+    return user
+
+
+def _client_address(request):
+    return request.headers.get("X-Real-IP", request.META.get("REMOTE_ADDR"))
+
+
 class AuthProjectView(View):
     def dispatch(self, request, *args, **kwargs):
         """Identifies permissions for a file in /media
@@ -122,23 +186,24 @@ class AuthProjectView(View):
         # before we get too far
         user = request.user
         if isinstance(user, AnonymousUser):
-            try:
-                user, _ = TokenAuthentication().authenticate(request)
-            except Exception:
+            user = _authenticate_token(request)
+            if user is None:
                 msg = "*Security Alert:* "
-                msg += f"Bad credentials presented for '{original_url}' ({user})"
-                Notify.notify_admin_msg(msg)
-                logger.warn(msg, exc_info=True)
+                msg += f"Bad credentials presented for '{original_url}' ({request.user})"
+                Notify.notify_admin_msg_async(
+                    msg, dedup_key=f"bad_credentials_{_client_address(request)}"
+                )
+                logger.warning(msg)
                 return HttpResponse(status=403)
 
-        project = None
+        project_id = None
         try:
             comps = original_url.split("/")
             project_id = comps[2]
             if project_id.isdigit() is False:
                 project_id = comps[3]
-            project = Project.objects.get(pk=project_id)
-            authorized = validate_project(user, project)
+            project_id = int(project_id)
+            authorized = validate_project(user, project_id)
         except Exception:
             logger.info("Could not validate project access", exc_info=True)
             authorized = False
@@ -149,9 +214,9 @@ class AuthProjectView(View):
         # Files that aren't in the whitelist or database are forbidden
         msg = (
             f"({user}/{user.id}): Attempted to access unauthorized file '{original_url}'; does not "
-            f"have access to '{project}'"
+            f"have access to project {project_id}"
         )
-        Notify.notify_admin_msg(msg)
+        Notify.notify_admin_msg_async(msg, dedup_key=f"unauthorized_{user.id}_{project_id}")
         return HttpResponse(status=403)
 
 
@@ -169,11 +234,12 @@ class AuthAdminView(View):
         # before we get too far
         user = request.user
         if isinstance(user, AnonymousUser):
-            try:
-                user, _ = TokenAuthentication().authenticate(request)
-            except Exception:
+            user = _authenticate_token(request)
+            if user is None:
                 msg = f"*Security Alert:* Bad credentials presented for '{original_url}'"
-                Notify.notify_admin_msg(msg)
+                Notify.notify_admin_msg_async(
+                    msg, dedup_key=f"bad_credentials_{_client_address(request)}"
+                )
                 return HttpResponse(status=403)
 
         if user.is_staff:
@@ -181,7 +247,7 @@ class AuthAdminView(View):
 
         # Files that aren't in the whitelist or database are forbidden
         msg = f"({user}/{user.id}): Attempted to access unauthorized URL '{original_url}'."
-        Notify.notify_admin_msg(msg)
+        Notify.notify_admin_msg_async(msg, dedup_key=f"unauthorized_admin_{user.id}")
         return HttpResponse(status=403)
 
 
@@ -17,3 +17,12 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tator_online.settings")
 application = get_wsgi_application()
+
+# Build the request validator before this worker accepts traffic.
+if os.getenv("TATOR_SCHEMA_WARM_UP", "true").lower() == "true":
+    try:
+        from main.schema import warm_up
+
+        warm_up()
+    except Exception:
+        traceback.print_exc()
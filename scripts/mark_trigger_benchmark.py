@@ -0,0 +1,76 @@
+#!/usr/bin/python3
+
+"""Measures localization create throughput, which is dominated by mark maintenance for large
+bulk creates. Run against a server before and after a trigger change to compare.
+"""
+
+import argparse
+import time
+import uuid
+
+import numpy as np
+import tator
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", help="Host containing Tator server", required=True)
+    parser.add_argument("--token", help="Token file containing Tator token", required=True)
+    parser.add_argument("--count", default=100000, type=int)
+    parser.add_argument("--chunk_size", default=500, type=int)
+    parser.add_argument(
+        "--elements",
+        default=0,
+        type=int,
+        help="Number of distinct elemental ids to spread boxes over, 0 for one per box",
+    )
+    parser.add_argument("media_id", type=int)
+    parser.add_argument("localization_type_id", type=int)
+    args = parser.parse_args()
+
+    api = tator.get_api(host=args.host, token=args.token)
+    localization_type_obj = api.get_localization_type(args.localization_type_id)
+    project = localization_type_obj.project
+    print(f"Testing {localization_type_obj.name} of project {project}")
+
+    elemental_ids = [str(uuid.uuid4()) for _ in range(args.elements)]
+    boxes = []
+    for idx in range(args.count):
+        box = {
+            "media_id": args.media_id,
+            "frame": 0,
+            "type": args.localization_type_id,
+            "x": 0.5,
+            "y": 0.5,
+            "height": 0.2,
+            "width": 0.2,
+        }
+        if elemental_ids:
+            box["elemental_id"] = elemental_ids[idx % len(elemental_ids)]
+        boxes.append(box)
+
+    deltas = []
+    ids = []
+    total_start = time.time()
+    start = time.time()
+    for _, resp in tator.util.chunked_create(
+        api.create_localization_list, project, body=boxes, chunk_size=args.chunk_size
+    ):
+        ids += resp.id
+        deltas.append(time.time() - start)
+        start = time.time()
+    total = time.time() - total_start
+
+    print(f"Created {len(ids)} boxes in {round(total,2)} seconds")
+    print(f"Throughput: {round(len(ids)/total,2)} boxes per second")
+    print(f"Average time per chunk ({args.chunk_size}): {round(np.mean(deltas),2)} seconds")
+    print(f"Max time per chunk: {round(np.max(deltas),2)} seconds")
+
+    # Check that marks are contiguous within each element.
+    for elemental_id in elemental_ids[:10]:
+        marks = sorted(
+            loc.mark
+            for loc in api.get_localization_list(
+                project, elemental_id=elemental_id, show_all_marks=1
+            )
+        )
+        assert marks == list(range(len(marks))), f"Marks of {elemental_id} are not contiguous!"